@@ -1,30 +1,51 @@
 # FAST API
 from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Body
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 
 # CORE
-from core.analyze_tender import analyze_tender
+from core.analyze_tender import analyze_tender_pages
 from core.extract_to_excel import generate_excel_from_result
-from core.downloader import download_prozorro_tenders
+from core.jobs import get_job_queue
 from core.claude_client import get_claude_client
-from core.data_extractor import extract_text_from_pdf
-from core.analyze_link import analyze_tender_from_hash
+from core.data_extractor import iter_pdf_pages
+from core.analyze_link import analyze_tender_from_hash, load_link_tender, stream_link_analysis
 from core.uploader import handle_uploaded_tender
 from core.company_profile import CompanyProfile
 from core.generate_template import generate_filled_template
+from core.tender_store import get_tender_store
+from core.prozorro_client import get_prozorro_client
+from core.tender_cache import get_tender_cache
+from core.attachments import get_attachment_store
+from core.llm_cache import get_llm_cache
+from core.llm_usage import usage_stats
+from core.llm_telemetry import current_endpoint, get_llm_telemetry, llm_endpoint
+from core.structured_output import output_stats
+from core.model_cascade import cascade_stats
+from core.long_document import merge_analyses
+from core.near_duplicates import get_analysis_reuse
 
 
 # Libraries
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
 import tempfile
+import json
 import os
 import traceback
 from typing import List, Dict, Any, Optional
 
 
-app = FastAPI(title="AI Tender Optimizer API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Crawl jobs interrupted by the last shutdown/restart continue in the background
+    get_job_queue().recover()
+    yield
+    get_job_queue().shutdown()
+
+
+app = FastAPI(title="AI Tender Optimizer API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -35,6 +56,13 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def llm_endpoint_context(request: Request, call_next):
+    # Claude calls made while handling the request are attributed to its path
+    with llm_endpoint(request.url.path):
+        return await call_next(request)
+
+
 class LinkRequest(BaseModel):
     link: str
 
@@ -45,6 +73,18 @@ class DownloadTendersRequest(BaseModel):
     days_back: int = 30
 
 
+class SyncTendersRequest(BaseModel):
+    topic: str
+    days_back: int = 1
+    max_pages: Optional[int] = None
+
+
+class IngestTopicsRequest(BaseModel):
+    topics: Optional[List[str]] = None
+    total_to_download: int = 10
+    days_back: int = 30
+
+
 class EstimateRequest(BaseModel):
     materials: dict
     labor: dict
@@ -88,20 +128,122 @@ def health():
     return {"ok": True}
 
 
-@app.post("/download_prozorro_tenders")
+@app.get("/prozorro_stats")
+def prozorro_stats():
+    return {
+        **get_prozorro_client().stats(),
+        "tender_cache": get_tender_cache().stats(),
+        "attachments": get_attachment_store().stats(),
+    }
+
+
+@app.get("/llm_cache_stats")
+def llm_cache_stats():
+    return {
+        **get_llm_cache().stats(),
+        "token_usage": usage_stats.snapshot(),
+        "structured_output": output_stats.snapshot(),
+        "cascade": cascade_stats.snapshot(),
+        "analysis_reuse": get_analysis_reuse().stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Claude call totals and latency percentiles per endpoint, stage and model, for Prometheus"""
+    return PlainTextResponse(get_llm_telemetry().prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/download_prozorro_tenders", status_code=202)
 def download_endpoint(request: DownloadTendersRequest):
+    """Queue a crawl job; poll GET /jobs/{job_id} for progress and the tender list"""
     try:
-        tenders = download_prozorro_tenders(
-            topic=request.topic,
-            total_to_download=request.total_to_download,
-            days_back=request.days_back,
-        )
-        return {"count": len(tenders), "tenders": tenders}
+        job_id = get_job_queue().submit("download", request.model_dump())
+        return {"job_id": job_id, "status": "queued"}
     except Exception as e:
         print("❌ Error in download_endpoint:", str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/sync_prozorro_tenders", status_code=202)
+def sync_endpoint(request: SyncTendersRequest):
+    try:
+        job_id = get_job_queue().submit("sync", request.model_dump())
+        return {"job_id": job_id, "status": "queued"}
+    except Exception as e:
+        print("❌ Error in sync_endpoint:", str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/ingest_prozorro_topics", status_code=202)
+def ingest_endpoint(request: IngestTopicsRequest):
+    """One feed scan for several topics (all of keywords.json when topics is omitted)"""
+    try:
+        job_id = get_job_queue().submit("ingest", request.model_dump())
+        return {"job_id": job_id, "status": "queued"}
+    except Exception as e:
+        print("❌ Error in ingest_endpoint:", str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/jobs")
+def list_jobs(limit: int = 20):
+    return {"jobs": get_job_queue().list_jobs(limit)}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/tenders")
+def list_tenders(
+    page: int = 1,
+    page_size: int = 50,
+    cpv: Optional[str] = None,
+    region: Optional[str] = None,
+    min_budget: Optional[float] = None,
+    max_budget: Optional[float] = None,
+    modified_since: Optional[str] = None,
+):
+    return get_tender_store().list_tenders(
+        page=page,
+        page_size=page_size,
+        cpv=cpv,
+        region=region,
+        min_budget=min_budget,
+        max_budget=max_budget,
+        modified_since=modified_since,
+    )
+
+
+@app.get("/tenders/{tender_id}")
+def get_tender(tender_id: str):
+    tender = get_tender_store().get(tender_id)
+    if tender is None:
+        raise HTTPException(status_code=404, detail="Tender not found")
+    return tender
+
+
+@app.post("/tenders/{tender_id}/attachments")
+def fetch_attachments(tender_id: str):
+    """
+    Download a stored tender's documents (deduplicated by SHA-256) and extract
+    their text; later analyses of the tender include it (ANALYSIS_ATTACHMENTS)
+    """
+    tender = get_tender_store().get(tender_id)
+    if tender is None:
+        raise HTTPException(status_code=404, detail="Tender not found")
+    attachments = get_attachment_store().fetch_attachments(tender)
+    for attachment in attachments:
+        text = attachment.pop("text", None)
+        attachment["text_chars"] = len(text) if text else 0
+    return {"tender_id": tender["id"], "attachments": attachments}
+
+
 @app.post("/upload_tenders")
 async def upload_tenders(files: List[UploadFile] = File(...)):
     # 1) enforce max 5
@@ -132,9 +274,9 @@ async def upload_tenders(files: List[UploadFile] = File(...)):
             tmp_path = tmp.name
 
         try:
-            text = extract_text_from_pdf(tmp_path)
+            # Map calls of a long document start while later pages are still read
             client = get_claude_client()
-            analysis = analyze_tender(text, client)
+            analysis = analyze_tender_pages(iter_pdf_pages(tmp_path), client)
             all_results.append(
                 {"status": "success", "source": filename, "analysis": analysis}
             )
@@ -147,32 +289,7 @@ async def upload_tenders(files: List[UploadFile] = File(...)):
 
 
 def merge_single_tender(raw: list[dict]) -> dict:
-    analyses = [item["analysis"] for item in raw]
-    merged: dict = {}
-
-    keys = analyses[0].keys()
-
-    for key in keys:
-        vals = [a.get(key) for a in analyses]
-        example = vals[0]
-
-        if isinstance(example, list):
-            merged[key] = list({v for sub in vals for v in sub})
-        elif isinstance(example, bool):
-            merged[key] = any(vals)
-        else:
-            picked = next(
-                (
-                    v
-                    for v in vals
-                    if isinstance(v, str)
-                    and v.strip()
-                    and not v.lower().startswith("не вказано")
-                ),
-                None,
-            )
-            merged[key] = picked if picked is not None else vals[0]
-
+    merged = merge_analyses([item["analysis"] for item in raw])
     merged["filename"] = "; ".join(item["source"] for item in raw)
     return merged
 
@@ -207,6 +324,33 @@ def analyze_tender_endpoint(request: TenderHashRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/analyze_tender/stream")
+def analyze_tender_stream(request: TenderHashRequest):
+    """
+    /analyze_tender as Server-Sent Events: one "field" event per field as
+    soon as it is known, then "done" with the whole analysis (or "error").
+    """
+    try:
+        known, text, tender = load_link_tender(request.tender_hash)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # The middleware's endpoint context ends before the body is streamed
+    analysis = stream_link_analysis(known, text, tender=tender, endpoint=current_endpoint.get())
+    events = (sse_event(event, data) for event, data in analysis)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/get_company_profile")
 def get_company_profile():
     profile = CompanyProfile()
@@ -0,0 +1,62 @@
+"""
+Wall-clock time for analysing N tenders: the old sequential loop
+(analyze_tender + 1.5 s sleep) vs the async AnalysisExecutor, against the
+local fake Anthropic API.
+
+    python -m benchmarks.bench_analysis_executor [--tenders 20] [--latency 2.0] [--concurrency 8] [--tpm 80000]
+
+The LLM cache is disabled so every item reaches the API.
+"""
+import argparse
+import os
+import time
+
+os.environ["LLM_CACHE_ENABLED"] = "0"
+
+from benchmarks.fake_anthropic import FakeAnthropicServer, SimpleAsyncMessagesClient, SimpleMessagesClient  # noqa: E402
+from benchmarks.fake_prozorro import make_tender  # noqa: E402
+from core.analysis_executor import run_analysis  # noqa: E402
+from core.analyze_tender import analyze_tender  # noqa: E402
+from core.claude_text_extractor import build_tender_text  # noqa: E402
+
+LEGACY_DELAY = 1.5
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenders", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=2.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tpm", type=int, default=80_000)
+    parser.add_argument("--sequential-sample", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = {f"t{i}": build_tender_text(make_tender(i)) for i in range(args.tenders)}
+
+    with FakeAnthropicServer(latency=args.latency) as server:
+        sync_client = SimpleMessagesClient(server.base_url)
+        start = time.perf_counter()
+        for key in list(texts)[:args.sequential_sample]:
+            analyze_tender(texts[key], sync_client)
+            time.sleep(LEGACY_DELAY)
+        per_item = (time.perf_counter() - start) / args.sequential_sample
+
+        first = []
+        start = time.perf_counter()
+        results = run_analysis(
+            texts.items(),
+            client=SimpleAsyncMessagesClient(server.base_url),
+            on_result=lambda key, result, done, total: first.append(time.perf_counter() - start),
+            max_concurrency=args.concurrency,
+            tokens_per_minute=args.tpm,
+        )
+        elapsed = time.perf_counter() - start
+
+    errors = sum("error" in r for r in results.values())
+    print(f"{'Sequential + sleep:':<28}{per_item * args.tenders:8.2f} s  (measured {per_item:.2f} s/tender)")
+    print(f"{f'Executor x{args.concurrency}, {args.tpm} tpm:':<28}{elapsed:8.2f} s  first result after {first[0]:.2f} s, {errors} errors")
+    print(f"{'Speed-up:':<28}{per_item * args.tenders / elapsed:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
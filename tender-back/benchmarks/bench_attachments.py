@@ -0,0 +1,68 @@
+"""
+Attachment download throughput against the local fake ProZorro server.
+
+    python -m benchmarks.bench_attachments [--tenders 50] [--documents 4] [--size 262144] [--latency 0.05]
+
+Compares fetching every document one by one into memory with the
+AttachmentStore (bounded parallel streaming, SHA-256 dedup, text
+extraction), then re-runs the store to show that known documents are skipped.
+"""
+import argparse
+import tempfile
+import time
+
+import requests
+
+from benchmarks.fake_prozorro import FakeProzorroServer
+from core.attachments import AttachmentStore, latest_documents
+from core.prozorro_client import ProzorroClient
+
+
+def sequential(tenders):
+    start = time.perf_counter()
+    total = 0
+    with requests.Session() as session:
+        for tender in tenders:
+            for doc in latest_documents(tender):
+                total += len(session.get(doc["url"], timeout=30).content)
+    return total, time.perf_counter() - start
+
+
+def stored(store, tenders):
+    start = time.perf_counter()
+    results = [a for tender in tenders for a in store.iter_attachments(tender)]
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenders", type=int, default=50)
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--size", type=int, default=256 * 1024)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with FakeProzorroServer(args.tenders, args.latency, documents=args.documents, document_size=args.size) as server:
+        client = ProzorroClient(server.api_url, pool_size=args.workers, requests_per_second=0)
+        tenders = [client.get_tender(t["id"]) for t in server.tenders]
+        store = AttachmentStore(tempfile.mkdtemp(prefix="bench_attachments_"), client=client, max_workers=args.workers)
+
+        total_bytes, seq_time = sequential(tenders)
+        first, first_time = stored(store, tenders)
+        counters = store.stats()
+        second, second_time = stored(store, tenders)
+
+    documents = len(first)
+    print()
+    print(f"{'Documents:':<30}{documents:>8}  ({total_bytes / 2**20:.1f} MiB)")
+    print(f"{'Sequential, in memory:':<30}{seq_time:8.2f} s")
+    print(f"{f'Store x{args.workers}, first run:':<30}{first_time:8.2f} s  downloaded {counters['downloaded']}, "
+          f"skipped {counters['skipped']}, {counters['bytes'] / 2**20:.1f} MiB on disk")
+    print(f"{'Store, second run:':<30}{second_time:8.2f} s  skipped {sum(a['skipped'] for a in second)}")
+    print(f"{'Speed-up vs sequential:':<30}{seq_time / first_time:8.1f}x")
+    print(f"{'With extracted text:':<30}{sum(bool(a.get('text')) for a in first):>8}")
+
+
+if __name__ == "__main__":
+    main()
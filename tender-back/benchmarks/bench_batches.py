@@ -0,0 +1,68 @@
+"""
+Bulk extraction: one request per tender (async executor) vs a single
+Message Batch, against the local fake Anthropic API.
+
+    python -m benchmarks.bench_batches [--tenders 1000] [--sync-tenders 40] [--latency 1.0] [--batch-delay 5]
+                                       [--invalid-every 10]
+
+The per-request path is bounded by the tokens-per-minute budget, so it is
+run on a sample and extrapolated. The LLM cache is disabled so both paths
+really call the API. Both paths use forced tool calls; every
+--invalid-every-th answer breaks a field, which is re-asked.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="bench_batches_")
+os.environ["TENDER_DB_PATH"] = os.path.join(WORKDIR, "tenders.db")
+os.environ["LLM_CACHE_ENABLED"] = "0"
+os.environ.setdefault("CLAUDE_BATCH_POLL_SECONDS", "0.5")
+
+import anthropic  # noqa: E402
+
+from benchmarks.fake_anthropic import FakeAnthropicServer, SimpleAsyncMessagesClient  # noqa: E402
+from benchmarks.fake_prozorro import make_tender  # noqa: E402
+from core import claude_text_extractor  # noqa: E402
+from core.structured_output import output_stats  # noqa: E402
+from core.tender_store import get_tender_store  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenders", type=int, default=1000)
+    parser.add_argument("--sync-tenders", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--batch-delay", type=float, default=5.0)
+    parser.add_argument("--invalid-every", type=int, default=10)
+    args = parser.parse_args()
+
+    get_tender_store().upsert_many(make_tender(i) for i in range(args.tenders))
+
+    with FakeAnthropicServer(latency=args.latency, batch_delay=args.batch_delay,
+                             invalid_every=args.invalid_every) as server:
+        client = anthropic.Anthropic(api_key="test", base_url=server.base_url)
+
+        start = time.perf_counter()
+        claude_text_extractor.run_bulk_extraction(
+            limit=args.sync_tenders, async_client=SimpleAsyncMessagesClient(server.base_url),
+            output_path=os.path.join(WORKDIR, "sync.xlsx"))
+        per_tender = (time.perf_counter() - start) / args.sync_tenders
+
+        start = time.perf_counter()
+        claude_text_extractor.run_bulk_extraction(
+            use_batch=True, limit=None, batch_client=client, output_path=os.path.join(WORKDIR, "batch.xlsx"))
+        batch = time.perf_counter() - start
+
+    print()
+    print(f"{'Per request, per tender:':<32}{per_tender:8.2f} s  (x{args.tenders} ≈ {per_tender * args.tenders / 60:.1f} min)")
+    print(f"{f'Batch, {args.tenders} tenders:':<32}{batch:8.2f} s  (incl. {args.batch_delay:g} s simulated batch processing)")
+    for label, stats in sorted(output_stats.snapshot().items()):
+        print(f"{label + ':':<32}{stats['responses']:8} answers, {stats['invalid_fields']} invalid fields, "
+              f"{stats['repaired']}/{stats['reasks']} repaired by re-ask")
+    print(f"{'Excel:':<32}{os.path.join(WORKDIR, 'batch.xlsx')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+One feed scan for several topics vs one download_prozorro_tenders call per topic.
+
+    python -m benchmarks.bench_ingest [--tenders 2000] [--per-topic 200] [--latency 0.02]
+
+Reports wall time, feed pages and detail GETs for each approach.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.fake_prozorro import FakeProzorroServer
+from core import downloader
+from core.prozorro_client import ProzorroClient
+from core.tender_store import TenderStore
+
+TOPICS = ["Construction", "IT", "Medicine"]
+
+
+def new_run(server, workers):
+    client = ProzorroClient(server.api_url, pool_size=workers, requests_per_second=0)
+    store = TenderStore(os.path.join(tempfile.mkdtemp(prefix="bench_ingest_"), "tenders.db"))
+    return client, store
+
+
+def requests_made(client):
+    endpoints = client.stats()["endpoints"]
+    return (
+        endpoints.get("tenders", {}).get("requests", 0),
+        endpoints.get("tenders/{id}", {}).get("requests", 0),
+    )
+
+
+def per_topic(server, total, workers):
+    client, store = new_run(server, workers)
+    start = time.perf_counter()
+    found = {
+        topic: downloader.download_prozorro_tenders(
+            topic=topic, total_to_download=total, max_workers=workers, store=store, client=client
+        )
+        for topic in TOPICS
+    }
+    return found, requests_made(client), time.perf_counter() - start
+
+
+def single_pass(server, total, workers):
+    client, store = new_run(server, workers)
+    start = time.perf_counter()
+    found = downloader.ingest_prozorro_topics(
+        topics=TOPICS, total_to_download=total, max_workers=workers, store=store, client=client
+    )
+    return found, requests_made(client), time.perf_counter() - start
+
+
+def report(label, found, requests, elapsed):
+    pages, details = requests
+    counts = "  ".join(f"{topic} {len(found[topic]):>4}" for topic in TOPICS)
+    print(f"{label:<22}{elapsed:8.2f} s  pages {pages:>4}  detail GETs {details:>5}  {counts}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenders", type=int, default=2000)
+    parser.add_argument("--per-topic", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, default=downloader.MAX_WORKERS)
+    args = parser.parse_args()
+
+    with FakeProzorroServer(args.tenders, args.latency) as server:
+        separate = per_topic(server, args.per_topic, args.workers)
+        single = single_pass(server, args.per_topic, args.workers)
+
+    print()
+    report("One call per topic:", *separate)
+    report("Single pass:", *single)
+    print(f"{'Speed-up:':<22}{separate[2] / single[2]:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
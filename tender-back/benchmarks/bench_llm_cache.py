@@ -0,0 +1,60 @@
+"""
+Lookup latency of the LLM response cache against a simulated Claude call.
+
+    python -m benchmarks.bench_llm_cache [--entries 10000] [--latency 2.0]
+"""
+import argparse
+import tempfile
+import time
+from types import SimpleNamespace
+
+from core.llm_cache import LLMCache, cached_completion
+
+ANSWER = '{"title": "Капітальний ремонт покрівлі", "required_documents": ["Довідка"]}' * 10
+
+
+class SlowClient:
+    """Stands in for anthropic.Anthropic: a fixed-latency messages.create"""
+
+    def __init__(self, latency):
+        self.calls = 0
+        self.messages = SimpleNamespace(create=self._create)
+        self.latency = latency
+
+    def _create(self, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        return SimpleNamespace(content=[SimpleNamespace(text=ANSWER)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=10_000)
+    parser.add_argument("--latency", type=float, default=2.0)
+    args = parser.parse_args()
+
+    cache = LLMCache(tempfile.mkdtemp(prefix="bench_llm_cache_") + "/llm_cache.db")
+    client = SlowClient(0)
+    prompts = [f"Tender Text: {i} " + "текст тендеру " * 500 for i in range(args.entries)]
+    start = time.perf_counter()
+    for prompt in prompts:
+        cached_completion(client, "claude-3-5-sonnet-20241022", prompt, 1024, cache=cache)
+    fill = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for prompt in prompts:
+        cached_completion(client, "claude-3-5-sonnet-20241022", prompt, 1024, cache=cache)
+    hit = (time.perf_counter() - start) / len(prompts)
+
+    slow = SlowClient(args.latency)
+    start = time.perf_counter()
+    cached_completion(slow, "claude-3-5-sonnet-20241022", "нова закупівля", 1024, cache=cache)
+    miss = time.perf_counter() - start
+
+    print(f"{'Filled entries:':<26}{args.entries:>8}  ({fill:.1f} s)")
+    print(f"{'Miss (simulated Claude):':<26}{miss * 1000:8.1f} ms")
+    print(f"{'Hit:':<26}{hit * 1000:8.3f} ms  {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
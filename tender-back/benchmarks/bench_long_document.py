@@ -0,0 +1,89 @@
+"""
+Coverage and latency of analyze_tender on a long tender document: the old
+single call on text[:15000] against section-aware map-reduce, on the local
+fake Anthropic API. Coverage is the share of facts planted in the relevant
+sections (documents list, technical specification, payment terms) that
+reach the model.
+
+    python -m benchmarks.bench_long_document [--pages 300] [--prefill 0.5]
+"""
+import argparse
+import os
+import time
+
+os.environ["LLM_CACHE_ENABLED"] = "0"
+
+from benchmarks.fake_anthropic import FakeAnthropicServer, SimpleMessagesClient  # noqa: E402
+from core.analyze_tender import ANALYSIS_MODEL, ANALYSIS_SYSTEM, build_analysis_prompt, parse_analysis  # noqa: E402
+from core.llm_cache import cached_completion  # noqa: E402
+from core.long_document import analyze_long_tender, map_chunks  # noqa: E402
+
+PAGE_CHARS = 2500
+FILLER = "Учасник процедури закупівлі повинен дотримуватися вимог законодавства та цієї документації. "
+# (heading, planted fact prefix, share of the document)
+SECTIONS = [
+    ("РОЗДІЛ 1. ЗАГАЛЬНІ ПОЛОЖЕННЯ", None, 0.10),
+    ("РОЗДІЛ 2. ПОРЯДОК ПОДАННЯ ТЕНДЕРНОЇ ПРОПОЗИЦІЇ", None, 0.10),
+    ("Додаток 1. Кваліфікаційні вимоги", "fact-qualification", 0.03),
+    ("Додаток 2. Перелік документів, які вимагаються від учасника", "fact-documents", 0.03),
+    ("Додаток 3. Технічна специфікація", "fact-specs", 0.08),
+    ("Додаток 4. Проєкт договору про закупівлю", "fact-payment", 0.06),
+    ("Додаток 5. Креслення та відомості", None, 0.60),
+]
+
+
+def make_document(pages):
+    """Intro page, then the sections sized by their share of the remaining pages"""
+    lines = ["Оголошення про проведення відкритих торгів: Капітальний ремонт даху школи",
+             "Замовник: Сільська рада. Очікувана вартість: 2 400 000 грн."]
+    lines += [FILLER] * (PAGE_CHARS // len(FILLER))
+    facts = []
+    for heading, fact, share in SECTIONS:
+        lines.append(heading)
+        body = [FILLER] * int((pages - 1) * PAGE_CHARS * share / len(FILLER))
+        if fact:
+            # Facts spread over the whole section, not just its start
+            for i in range(0, len(body), max(1, len(body) // 4)):
+                facts.append(f"{fact}-{i}")
+                body[i] = f"{facts[-1]}: {FILLER}"
+        lines += body
+    return "\n".join(lines), facts
+
+
+def coverage(prompts, facts):
+    sent = "\n".join(prompts)
+    return sum(fact in sent for fact in facts) / len(facts)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--prefill", type=float, default=0.5, help="seconds per 1k uncached input tokens")
+    args = parser.parse_args()
+
+    text, facts = make_document(args.pages)
+    chunks = map_chunks(text)
+    with FakeAnthropicServer(latency=args.latency, prefill_per_1k_tokens=args.prefill) as server:
+        client = SimpleMessagesClient(server.base_url)
+
+        start = time.perf_counter()
+        parse_analysis(cached_completion(client, model=ANALYSIS_MODEL, max_tokens=1024, system=ANALYSIS_SYSTEM,
+                                         prompt=build_analysis_prompt(text), label="single"))
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = analyze_long_tender(text, client)
+        mapped = time.perf_counter() - start
+
+    print()
+    print(f"Document: {args.pages} pages, {len(text)} chars, {len(facts)} planted facts")
+    print(f"{'':<22}{'calls':>8}{'chars sent':>12}{'coverage':>10}{'latency':>10}")
+    print(f"{'Single text[:15000]':<22}{1:>8}{15000:>12}{coverage([text[:15000]], facts):>10.0%}{single:>9.2f}s")
+    print(f"{'Map-reduce':<22}{len(chunks):>8}{sum(map(len, chunks)):>12}{coverage(chunks, facts):>10.0%}"
+          f"{mapped:>9.2f}s")
+    print(f"Merged fields: {len(result)}, error: {result.get('error')}")
+
+
+if __name__ == "__main__":
+    main()
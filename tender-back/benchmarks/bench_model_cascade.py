@@ -0,0 +1,85 @@
+"""
+Fast/large model cascade against the large model alone, on the local fake
+Anthropic API: the fast model answers sooner but leaves fields blank for
+every n-th (hard) tender, which the confidence check escalates. Reports
+median and p95 latency per tender, cost, escalation rate and how many
+final answers still have blank fields.
+
+    python -m benchmarks.bench_model_cascade [--tenders 40] [--hard-every 5]
+"""
+import argparse
+import os
+import time
+
+os.environ["LLM_CACHE_ENABLED"] = "0"
+
+import core.model_cascade as model_cascade  # noqa: E402
+from benchmarks.fake_anthropic import FakeAnthropicServer, SimpleMessagesClient  # noqa: E402
+from benchmarks.fake_prozorro import make_tender  # noqa: E402
+from core.analyze_tender import analyze_tender  # noqa: E402
+from core.claude_client import ANALYSIS_MODEL, FAST_MODEL  # noqa: E402
+from core.llm_usage import usage_cost, usage_stats  # noqa: E402
+from core.model_cascade import CONFIDENCE_FIELDS, cascade_stats, is_blank  # noqa: E402
+from core.tender_fields import build_tender_text  # noqa: E402
+
+
+def run_cost():
+    """USD of every analyze_tender call so far, priced by the tier in its label"""
+    total = 0.0
+    for label, values in usage_stats.snapshot().items():
+        if label.startswith("analyze_tender"):
+            total += usage_cost(FAST_MODEL if "@fast" in label else ANALYSIS_MODEL, values)
+    return total
+
+
+def run(texts, client, cascade):
+    model_cascade.CASCADE_ENABLED = cascade
+    spent = run_cost()
+    latencies, results = [], []
+    for text in texts:
+        start = time.perf_counter()
+        results.append(analyze_tender(text, client))
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    blank = sum(any(is_blank(result.get(field)) for field in CONFIDENCE_FIELDS) for result in results)
+    return {
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "cost": run_cost() - spent,
+        "blank": blank,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenders", type=int, default=40)
+    parser.add_argument("--hard-every", type=int, default=5)
+    parser.add_argument("--fast-latency", type=float, default=0.15)
+    parser.add_argument("--large-latency", type=float, default=0.6)
+    parser.add_argument("--invalid-every", type=int, default=6, help="every n-th answer breaks a field (re-asked)")
+    args = parser.parse_args()
+
+    texts = [build_tender_text(make_tender(i)) for i in range(args.tenders)]
+    latency = {FAST_MODEL: args.fast_latency, ANALYSIS_MODEL: args.large_latency}
+    with FakeAnthropicServer(model_latency=latency, hard_every=args.hard_every,
+                             invalid_every=args.invalid_every) as server:
+        client = SimpleMessagesClient(server.base_url)
+        large = run(texts, client, cascade=False)
+        cascade = run(texts, client, cascade=True)
+
+    snapshot = cascade_stats.snapshot()
+    routes = snapshot["routes"]["analyze_tender"]
+    tiers = {label: tier for label, tier in snapshot["tiers"].items() if label.startswith("analyze_tender@")}
+    print()
+    print(f"{'':<26}{'large only':>12}{'cascade':>12}")
+    print(f"{'Latency p50, s:':<26}{large['p50']:>12.2f}{cascade['p50']:>12.2f}")
+    print(f"{'Latency p95, s:':<26}{large['p95']:>12.2f}{cascade['p95']:>12.2f}")
+    print(f"{'Cost, USD:':<26}{large['cost']:>12.4f}{cascade['cost']:>12.4f}")
+    print(f"{'Answers with blank fields:':<26}{large['blank']:>12}{cascade['blank']:>12}")
+    print(f"{'Kept on fast / escalated:':<26}{'':>12}{routes['fast']:>7} / {routes['escalated']}")
+    print(f"{'Tier cost incl. re-asks:':<26}{'':>12}{sum(tier['cost_usd'] for tier in tiers.values()):>12.4f}  "
+          + ", ".join(f"{label.split('@')[1]} {tier['cost_usd']:.4f}" for label, tier in sorted(tiers.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+MinHash/LSH near-duplicate index over signature_text: build and query
+time on a synthetic corpus where a share of the tenders are re-posts of
+earlier ones (same purchase, other budget, deadline and village, a few
+words changed), recall of those re-posts, and a brute-force scan for
+comparison. Every tender carries the same standard exclusion criteria,
+as on ProZorro; the similarity of unrelated tenders is also shown when
+signed on their whole build_tender_text. Then the reuse path end to end: analyze_tender_json on the
+local fake Anthropic API, counting Claude calls and output tokens.
+
+    python -m benchmarks.bench_near_duplicates [--tenders 100000] [--duplicates 0.3]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="bench_near_dup_")
+os.environ["ANALYSIS_REUSE_PATH"] = os.path.join(WORKDIR, "analysis_reuse.db")
+os.environ["LLM_CACHE_ENABLED"] = "0"
+os.environ["CLAUDE_CASCADE"] = "0"
+
+import core.near_duplicates as near_duplicates  # noqa: E402
+from benchmarks.fake_anthropic import FakeAnthropicServer, SimpleMessagesClient  # noqa: E402
+from benchmarks.fake_prozorro import make_tender  # noqa: E402
+from core.analyze_tender import analyze_tender_json  # noqa: E402
+from core.llm_usage import usage_stats  # noqa: E402
+from core.near_duplicates import MinHashLSH, get_analysis_reuse, minhash, shingles, signature_text, similarity  # noqa: E402
+from core.tender_fields import build_tender_text  # noqa: E402
+
+SYLLABLES = ["ко", "ро", "ва", "ли", "на", "ст", "пр", "ми", "те", "за", "бу", "ді", "ре", "мо", "нт", "ка"]
+VILLAGES = [f"Село {i}" for i in range(500)]
+# Article 17 exclusion grounds, present in nearly every open tender
+STANDARD_CRITERIA = [
+    "Обґрунтована підстава для відмови в участі у процедурі закупівлі: учасник або посадова особа вчинили корупційне правопорушення",
+    "Учасник процедури закупівлі не має заборгованості зі сплати податків і зборів (обов'язкових платежів)",
+    "Службова (посадова) особа учасника не була засуджена за кримінальне правопорушення, вчинене з корисливих мотивів",
+    "Учасник процедури закупівлі не визнаний у встановленому законом порядку банкрутом та стосовно нього не відкрита ліквідаційна процедура",
+    "Учасник процедури закупівлі не притягувався до відповідальності за вчинення правопорушення, пов'язаного з використанням дитячої праці",
+    "Учасник процедури закупівлі або кінцевий бенефіціарний власник не є особою, до якої застосовано санкцію",
+    "Тендерна пропозиція подана учасником, який мав порушення зобов'язань за раніше укладеним договором про закупівлю",
+]
+
+
+def synthetic_tenders(count, duplicate_share, seed=0):
+    """ProZorro-shaped tenders; duplicate_share of them re-post an earlier one. Returns (tenders, {copy: original})"""
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(20000)]
+    tenders, originals = [], {}
+    for i in range(count):
+        tender = make_tender(i)
+        tender["criteria"] = [
+            {"requirementGroups": [{"requirements": [{"title": title, "expectedValue": True}]}]}
+            for title in STANDARD_CRITERIA
+        ]
+        if i and rng.random() < duplicate_share:
+            source = tenders[rng.randrange(len(tenders))]
+            words = source["description"].split()
+            for _ in range(rng.randint(0, 2)):
+                words[rng.randrange(len(words))] = rng.choice(vocabulary)
+            tender.update(title=source["title"], items=source["items"], description=" ".join(words))
+            # Lots of one purchase: budgets within ±20% of each other
+            tender["value"] = {**source["value"], "amount": round(source["value"]["amount"] * rng.uniform(0.8, 1.2))}
+            tender["procuringEntity"] = {**source["procuringEntity"],
+                                         "address": {"locality": rng.choice(VILLAGES), "region": "Київська"}}
+            originals[tender["id"]] = originals.get(source["id"], source["id"])
+        else:
+            tender["description"] = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(60, 200)))
+        tenders.append(tender)
+    return tenders, originals
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def index_benchmark(tenders, originals, queries):
+    texts = [signature_text(tender) for tender in tenders]
+    start = time.perf_counter()
+    signatures = [minhash(text) for text in texts]
+    signed = time.perf_counter() - start
+    index = MinHashLSH()
+    start = time.perf_counter()
+    for tender, signature in zip(tenders, signatures):
+        index.add(tender["id"], signature)
+    inserted = time.perf_counter() - start
+
+    # A re-post is found when any other tender of its family (same original) matches
+    family = {tender["id"]: originals.get(tender["id"], tender["id"]) for tender in tenders}
+    sample = [i for i, tender in enumerate(tenders) if tender["id"] in originals][:queries]
+    latencies, found = [], 0
+    for i in sample:
+        tender_id = tenders[i]["id"]
+        start = time.perf_counter()
+        matches = index.matches(minhash(texts[i]))
+        latencies.append(time.perf_counter() - start)
+        found += any(key != tender_id and family[key] == family[tender_id] for key, _ in matches)
+
+    # Tenders that are no re-post, queried against an index of the first half only
+    half = len(tenders) // 2
+    first_half = MinHashLSH()
+    for tender, signature in zip(tenders[:half], signatures[:half]):
+        first_half.add(tender["id"], signature)
+    fresh = [i for i in range(half, len(tenders)) if tenders[i]["id"] not in originals][:queries]
+    false_matches = sum(first_half.query(signatures[i]) is not None for i in fresh)
+    # How much of unrelated tenders' signatures the shared criteria would make equal
+    pairs = list(zip(fresh, fresh[1:]))
+    unrelated = [similarity(signatures[i], signatures[j]) for i, j in pairs]
+    whole = {i: minhash(build_tender_text(tenders[i])) for i in fresh}
+    unrelated_whole = [similarity(whole[i], whole[j]) for i, j in pairs]
+
+    sets = [shingles(text) for text in texts]
+    start = time.perf_counter()
+    brute_queries = sample[:20]
+    for i in brute_queries:
+        max(len(sets[i] & other) / len(sets[i] | other) for j, other in enumerate(sets) if j != i)
+    brute = (time.perf_counter() - start) / max(1, len(brute_queries))
+
+    print()
+    print(f"{'Tenders indexed:':<34}{len(tenders):>10}")
+    print(f"{'MinHash signatures:':<34}{signed:>9.2f}s  ({signed / len(tenders) * 1e6:.0f} µs each)")
+    print(f"{'LSH inserts:':<34}{inserted:>9.2f}s  ({inserted / len(tenders) * 1e6:.0f} µs each)")
+    print(f"{'Query p50 / p99 (sign + lookup):':<34}{percentile(latencies, 0.5) * 1000:>8.2f} / "
+          f"{percentile(latencies, 0.99) * 1000:.2f} ms")
+    print(f"{'Brute-force Jaccard scan:':<34}{brute * 1000:>8.0f} ms per query")
+    print(f"{'Re-posts found:':<34}{found:>10} / {len(sample)}")
+    print(f"{'False matches (fresh tenders):':<34}{false_matches:>10} / {len(fresh)}")
+    print(f"{'Unrelated pairs, mean / max sim:':<34}{sum(unrelated) / len(pairs):>10.2f} / {max(unrelated):.2f}")
+    print(f"{'  signed on build_tender_text:':<34}{sum(unrelated_whole) / len(pairs):>10.2f} / "
+          f"{max(unrelated_whole):.2f}")
+
+
+def analyze_all(tenders, client, reuse):
+    near_duplicates.ANALYSIS_REUSE_ENABLED = reuse
+    before = usage_stats.snapshot().get("analyze_tender_json", {"requests": 0, "output_tokens": 0})
+    start = time.perf_counter()
+    for tender in tenders:
+        analyze_tender_json(tender, client)
+    elapsed = time.perf_counter() - start
+    after = usage_stats.snapshot()["analyze_tender_json"]
+    return after["requests"] - before["requests"], after["output_tokens"] - before["output_tokens"], elapsed
+
+
+def reuse_benchmark(count, duplicate_share, latency):
+    tenders, originals = synthetic_tenders(count, duplicate_share, seed=1)
+    with FakeAnthropicServer(latency=latency, output_tokens_per_second=400) as server:
+        client = SimpleMessagesClient(server.base_url)
+        baseline = analyze_all(tenders, client, reuse=False)
+        reused = analyze_all(tenders, client, reuse=True)
+    print()
+    print(f"{'analyze_tender_json tenders:':<34}{count:>10}  ({len(originals)} re-posts, "
+          f"{get_analysis_reuse().stats()['reused']} reused)")
+    print(f"{'':<34}{'calls':>10}{'output tok':>12}{'time, s':>10}")
+    print(f"{'Every tender from scratch:':<34}{baseline[0]:>10}{baseline[1]:>12}{baseline[2]:>10.2f}")
+    print(f"{'Near duplicates reused:':<34}{reused[0]:>10}{reused[1]:>12}{reused[2]:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenders", type=int, default=100_000)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="share of tenders that re-post an earlier one")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--analyze", type=int, default=200, help="tenders for the end-to-end reuse run")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Claude latency, seconds")
+    args = parser.parse_args()
+
+    tenders, originals = synthetic_tenders(args.tenders, args.duplicates)
+    index_benchmark(tenders, originals, args.queries)
+    reuse_benchmark(args.analyze, args.duplicates, args.latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Pages per second of extract_text_from_pdf on large generated tender packs
+(Cyrillic text, the section layout of bench_long_document): the old
+page-by-page loop (string += and a print per page, stdout sent to
+/dev/null) against the new extractor in-process and with the process
+pool, cold (pool start included) and warm. Checks that every variant
+returns the same text.
+
+    python -m benchmarks.bench_pdf_extract [--pages 300] [--docs 3] [--workers 4]
+"""
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+
+import fitz
+
+from benchmarks.bench_long_document import PAGE_CHARS, make_document
+from core import data_extractor
+from core.data_extractor import extract_text_from_pdf
+
+
+def make_pdf(path, pages):
+    text, _ = make_document(pages)
+    doc = fitz.open()
+    for start in range(0, len(text), PAGE_CHARS):
+        page = doc.new_page()
+        body = text[start:start + PAGE_CHARS].replace("\n", "<br>")
+        page.insert_htmlbox(fitz.Rect(36, 36, 560, 806), f"<p style='font-size:7pt'>{body}</p>")
+    doc.save(path, garbage=3, deflate=True)
+    return doc.page_count
+
+
+def legacy_extract(path):
+    """The extractor before the rewrite, minus the side file"""
+    doc = fitz.open(path)
+    full_text = ""
+    for page_num, page in enumerate(doc):
+        text = page.get_text("text")
+        print(f"Page {page_num+1} text:\n{text}")
+        full_text += text + "\n"
+    return full_text.strip()
+
+
+def timed(extract, paths):
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        texts = [extract(path) for path in paths]
+    return time.perf_counter() - start, texts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--docs", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=data_extractor.PDF_WORKERS)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_pdf_")
+    paths = [os.path.join(workdir, f"pack_{i}.pdf") for i in range(args.docs)]
+    pages = sum(make_pdf(path, args.pages) for path in paths)
+
+    runs = [
+        ("Old loop (+=, print per page)", legacy_extract),
+        ("In-process", lambda path: extract_text_from_pdf(path, workers=1)),
+        (f"Pool of {args.workers}, cold", lambda path: extract_text_from_pdf(path, workers=args.workers)),
+        (f"Pool of {args.workers}, warm", lambda path: extract_text_from_pdf(path, workers=args.workers)),
+    ]
+    results = [(label, *timed(extract, paths)) for label, extract in runs]
+    data_extractor.get_pdf_pool(args.workers).shutdown()
+
+    reference = results[0][2]
+    print()
+    print(f"{args.docs} PDFs, {pages} pages, {sum(map(len, reference))} chars, {os.cpu_count()} CPUs")
+    print(f"{'':<32}{'seconds':>10}{'pages/s':>10}  same text")
+    for label, elapsed, texts in results:
+        print(f"{label:<32}{elapsed:>10.2f}{pages / elapsed:>10.0f}  {texts == reference}")
+
+    text, offsets = extract_text_from_pdf(paths[0], with_offsets=True, workers=1)
+    page_texts = [page.get_text("text").strip() for page in fitz.open(paths[0])]
+    bounds = zip(offsets, offsets[1:] + [len(text)])
+    print(f"Page offsets: {len(offsets)}, every page found at its offset: "
+          f"{all(text[start:end].strip() == page for page, (start, end) in zip(page_texts, bounds))}")
+
+
+if __name__ == "__main__":
+    main()
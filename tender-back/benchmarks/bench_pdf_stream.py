@@ -0,0 +1,111 @@
+"""
+Time to first Claude call, total time and peak RSS of analysing a tender
+PDF as packs grow: extract_text_from_pdf followed by analyze_tender (the
+whole text in memory before the first map call) against
+analyze_tender_pages over iter_pdf_pages (map calls go out while later
+pages are still being read). Each run is a fresh process, so peak RSS is
+its own; Claude is the local fake API.
+
+    python -m benchmarks.bench_pdf_stream [--pages 50 150 300 600] [--latency 0.3]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+RESULT_PREFIX = "STREAM_RESULT "
+
+
+def peak_rss_mb():
+    """VmHWM of this process; ru_maxrss on Linux carries the parent's peak across fork and exec"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(mode, pdf, base_url):
+    """Analyse pdf in this process; prints first-call and total seconds and peak RSS"""
+    from benchmarks.fake_anthropic import SimpleMessagesClient
+    from core.analyze_tender import analyze_tender, analyze_tender_pages
+    from core.data_extractor import extract_text_from_pdf, iter_pdf_pages
+
+    class FirstCallClient(SimpleMessagesClient):
+        first_call = None
+
+        def _create(self, **params):
+            if self.first_call is None:
+                self.first_call = time.perf_counter()
+            return super()._create(**params)
+
+    client = FirstCallClient(base_url)
+    start = time.perf_counter()
+    if mode == "whole":
+        analysis = analyze_tender(extract_text_from_pdf(pdf), client)
+    else:
+        analysis = analyze_tender_pages(iter_pdf_pages(pdf), client)
+    total = time.perf_counter() - start
+    print(RESULT_PREFIX + json.dumps({
+        "first_call": client.first_call - start,
+        "total": total,
+        "rss_mb": peak_rss_mb(),
+        "fields": len(analysis),
+        "error": analysis.get("error"),
+    }))
+
+
+def measure(mode, pdf, base_url):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_pdf_stream", "--run", mode, "--pdf", pdf, "--base-url", base_url],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(next(line for line in output.splitlines()[::-1] if line.startswith(RESULT_PREFIX))
+                      [len(RESULT_PREFIX):])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 150, 300, 600])
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--run", choices=["whole", "streamed"], help=argparse.SUPPRESS)
+    parser.add_argument("--pdf", help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(args.run, args.pdf, args.base_url)
+        return
+
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    os.environ["LLM_TELEMETRY_ENABLED"] = "0"
+    from benchmarks.bench_pdf_extract import make_pdf
+    from benchmarks.fake_anthropic import FakeAnthropicServer
+
+    workdir = tempfile.mkdtemp(prefix="bench_pdf_stream_")
+    rows = []
+    with FakeAnthropicServer(latency=args.latency) as server:
+        for pages in args.pages:
+            pdf = os.path.join(workdir, f"pack_{pages}.pdf")
+            make_pdf(pdf, pages)
+            rows.append((pages, measure("whole", pdf, server.base_url), measure("streamed", pdf, server.base_url)))
+
+    print()
+    print(f"{'':<8}{'first Claude call, s':>24}{'total, s':>20}{'peak RSS, MB':>20}")
+    print(f"{'pages':<8}" + f"{'whole':>12}{'streamed':>12}" * 3)
+    for pages, whole, streamed in rows:
+        print(f"{pages:<8}" + "".join(f"{whole[key]:>12.2f}{streamed[key]:>12.2f}"
+                                      for key in ("first_call", "total", "rss_mb")))
+    errors = [result["error"] for _, *results in rows for result in results if result["error"]]
+    print(f"Errors: {errors or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Input-token split and latency of analyze_tender with the instructions in a
+cache_control'd system block, against the local fake Anthropic API (which
+reports cache writes/reads like the real one, and caches nothing below the
+model's minimum prefix length). First the prefix is measured with
+count_tokens for each model of the cascade: with the full tool, with the tool of a ProZorro
+tender (structured fields left out) and without a tool.
+
+    python -m benchmarks.bench_prompt_cache [--tenders 50] [--prefill 0.5] [--api]
+
+--api measures the prefix with the real count_tokens endpoint (free; needs
+ANTHROPIC_API_KEY) instead of the fake's estimate.
+Relative input prices: uncached 1.0, cache write 1.25, cache read 0.1.
+"""
+import argparse
+import os
+import time
+
+os.environ["LLM_CACHE_ENABLED"] = "0"
+
+from benchmarks.fake_anthropic import FakeAnthropicServer, SimpleMessagesClient  # noqa: E402
+from benchmarks.fake_prozorro import make_tender  # noqa: E402
+from core.analyze_tender import ANALYSIS_SYSTEM, analyze_tender  # noqa: E402
+from core.claude_client import ANALYSIS_MODEL, FAST_MODEL, get_claude_client  # noqa: E402
+from core.llm_usage import prefix_tokens, prompt_cache_min_tokens, usage_stats  # noqa: E402
+from core.structured_output import ANALYSIS_TOOL, analysis_tool  # noqa: E402
+from core.tender_fields import STRUCTURED_FIELDS, build_tender_text, inference_fields  # noqa: E402
+
+PREFIX_TOOLS = (
+    ("full tool", [ANALYSIS_TOOL]),
+    ("ProZorro tool", [analysis_tool(inference_fields(dict.fromkeys(STRUCTURED_FIELDS)))]),
+    ("without tool", None),
+)
+
+
+def prefix_report(client):
+    print(f"{'Cached prefix (count_tokens)':<46}{'tokens':>8}{'minimum':>9}")
+    for model in dict.fromkeys((FAST_MODEL, ANALYSIS_MODEL)):
+        for label, tools in PREFIX_TOOLS:
+            tokens = prefix_tokens(client, model, ANALYSIS_SYSTEM, tools)
+            minimum = prompt_cache_min_tokens(model)
+            print(f"  {model + ', ' + label:<44}{tokens:>8}{minimum:>9}  "
+                  f"{'cached' if tokens >= minimum else 'BELOW MINIMUM, not cached'}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenders", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--prefill", type=float, default=0.5, help="seconds per 1k uncached input tokens")
+    parser.add_argument("--api", action="store_true", help="measure the prefix with the real API")
+    args = parser.parse_args()
+
+    with FakeAnthropicServer(latency=args.latency, prefill_per_1k_tokens=args.prefill) as server:
+        client = SimpleMessagesClient(server.base_url)
+        prefix_report(get_claude_client() if args.api else client)
+        latencies = []
+        for i in range(args.tenders):
+            start = time.perf_counter()
+            analyze_tender(build_tender_text(make_tender(i)), client)
+            latencies.append(time.perf_counter() - start)
+
+    print()
+    for label, totals in sorted(usage_stats.snapshot().items()):
+        if not label.startswith("analyze_tender"):
+            continue
+        uncached, write, read = (totals["input_tokens"], totals["cache_creation_input_tokens"],
+                                 totals["cache_read_input_tokens"])
+        without_cache = uncached + write + read
+        with_cache = uncached + 1.25 * write + 0.1 * read
+        print(f"{label} ({totals['requests']} requests)")
+        print(f"  {'Input tokens:':<28}{without_cache:>8}  (cache read {read}, cache write {write}, uncached {uncached})")
+        print(f"  {'Cache read ratio:':<28}{totals['cache_read_ratio']:8.1%}")
+        print(f"  {'Relative input cost:':<28}{with_cache / without_cache:8.1%} of uncached")
+    print(f"{'First call latency:':<30}{latencies[0] * 1000:8.0f} ms")
+    print(f"{'Later calls, mean:':<30}{sum(latencies[1:]) / (len(latencies) - 1) * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
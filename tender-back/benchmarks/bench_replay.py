@@ -0,0 +1,178 @@
+"""
+Record/replay of the ProZorro and Claude traffic of the whole pipeline:
+download_prozorro_tenders, analyze_tender_from_hash, upload_tenders (a PDF)
+and run_bulk_extraction. One run against the local fakes records the
+fixtures; the replays then run with both fakes stopped and the base URLs
+pointing nowhere, under the recorded latency, no latency, and injected
+errors. Every run is a fresh process with empty stores and caches; the
+digest of its outputs shows whether it reproduced the recording (and,
+with errors injected, whether two runs with one seed fail alike).
+
+    python -m benchmarks.bench_replay [--tenders 20] [--analyze 5] [--error-rate 0.1]
+
+The same switches work on the API or the Streamlit app:
+HTTP_FIXTURES_MODE=record|replay, HTTP_FIXTURES_DIR, REPLAY_LATENCY,
+REPLAY_LATENCY_SCALE, REPLAY_JITTER, REPLAY_ERROR_RATE, REPLAY_SEED.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RESULT_PREFIX = "REPLAY_RESULT "
+STAGES = ("download", "analyze_link", "upload", "bulk_extract")
+
+
+def tender_pdf(tender):
+    """One-page PDF of the tender text, as a user would upload it"""
+    import fitz
+    from core.tender_fields import build_tender_text
+
+    doc = fitz.open()
+    page = doc.new_page()
+    html = "".join(f"<p>{line}</p>" for line in build_tender_text(tender).splitlines() if line.strip())
+    page.insert_htmlbox(fitz.Rect(36, 36, 560, 800), html)
+    return doc.tobytes()
+
+
+def simple_transport(is_async, api_key, base_url, timeout, max_retries):
+    """Fake-API clients (any SDK version) with their session routed through the fixtures"""
+    from benchmarks.fake_anthropic import SimpleAsyncMessagesClient, SimpleMessagesClient
+    from core.http_fixtures import mount_fixtures
+
+    client = (SimpleAsyncMessagesClient if is_async else SimpleMessagesClient)(base_url)
+    mount_fixtures(client.session, "claude")
+    return client
+
+
+def scenario(tenders, analyze, workdir):
+    """The pipeline in this process, as configured by the environment; prints timings and outputs"""
+    from io import BytesIO
+
+    from fastapi import UploadFile
+    from openpyxl import load_workbook
+
+    from api import upload_tenders
+    from core.analyze_link import analyze_tender_from_hash
+    from core.claude_client import set_claude_transport
+    from core.claude_text_extractor import run_bulk_extraction
+    from core.downloader import download_prozorro_tenders
+
+    set_claude_transport(simple_transport)
+    timings, outputs = {}, {}
+
+    start = time.perf_counter()
+    downloaded = download_prozorro_tenders(topic="Construction", total_to_download=tenders)
+    timings["download"] = time.perf_counter() - start
+    outputs["download"] = sorted(tender["id"] for tender in downloaded)
+
+    start = time.perf_counter()
+    analyses = []
+    for tender_id in outputs["download"][:analyze]:
+        try:
+            analyses.append(analyze_tender_from_hash(tender_id))
+        except RuntimeError as e:
+            analyses.append({"error": str(e)})
+    timings["analyze_link"] = time.perf_counter() - start
+    outputs["analyze_link"] = analyses
+
+    filename = "replay_benchmark_tender.pdf"
+    pdf = tender_pdf(downloaded[0])
+    start = time.perf_counter()
+    uploaded = asyncio.run(upload_tenders([UploadFile(file=BytesIO(pdf), filename=filename)]))
+    timings["upload"] = time.perf_counter() - start
+    outputs["upload"] = uploaded
+    from core.uploader import UPLOAD_DIR
+    os.remove(os.path.join(UPLOAD_DIR, filename))
+
+    output_path = os.path.join(workdir, "extracted.xlsx")
+    start = time.perf_counter()
+    run_bulk_extraction(limit=analyze, output_path=output_path)
+    timings["bulk_extract"] = time.perf_counter() - start
+    rows = load_workbook(output_path).active.iter_rows(values_only=True)
+    outputs["bulk_extract"] = sorted(list(row) for row in rows)
+
+    digest = hashlib.sha256(json.dumps(outputs, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()
+    print(RESULT_PREFIX + json.dumps({"timings": timings, "digest": digest[:12],
+                                      "errors": json.dumps(outputs, default=str).count('"error')}))
+
+
+def run_phase(args, fixtures, mode, prozorro_url, claude_url, **replay):
+    """Run the scenario in a fresh process; returns its result dict"""
+    workdir = tempfile.mkdtemp(prefix="bench_replay_")
+    env = {
+        **os.environ,
+        "HTTP_FIXTURES_MODE": mode,
+        "HTTP_FIXTURES_DIR": fixtures,
+        "PROZORRO_API_URL": prozorro_url,
+        "CLAUDE_BASE_URL": claude_url,
+        "PROZORRO_REQUESTS_PER_SECOND": "1000",
+        "TENDER_DB_PATH": os.path.join(workdir, "tenders.db"),
+        "TENDER_CACHE_PATH": os.path.join(workdir, "tender_cache.db"),
+        "LLM_CACHE_ENABLED": "0",
+        "ANALYSIS_REUSE_ENABLED": "0",
+        "LLM_TELEMETRY_ENABLED": "0",
+        **{name: str(value) for name, value in replay.items()},
+    }
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_replay", "--scenario", "--tenders", str(args.tenders),
+         "--analyze", str(args.analyze), "--workdir", workdir],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    lines = [line for line in output.splitlines() if line.startswith(RESULT_PREFIX)]
+    if not lines:
+        raise RuntimeError(f"Scenario printed no result:\n{output[-2000:]}")
+    return json.loads(lines[-1][len(RESULT_PREFIX):])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenders", type=int, default=20, help="tenders to download")
+    parser.add_argument("--analyze", type=int, default=5, help="tenders for analyze_link and bulk extraction")
+    parser.add_argument("--prozorro-latency", type=float, default=0.05)
+    parser.add_argument("--claude-latency", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--scenario", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        scenario(args.tenders, args.analyze, args.workdir)
+        return
+
+    from benchmarks.fake_anthropic import FakeAnthropicServer
+    from benchmarks.fake_prozorro import FakeProzorroServer
+
+    fixtures = tempfile.mkdtemp(prefix="bench_fixtures_")
+    with FakeProzorroServer(total_tenders=args.tenders * 20, latency=args.prozorro_latency) as prozorro, \
+            FakeAnthropicServer(latency=args.claude_latency) as claude:
+        runs = [("Recording (live fakes)", run_phase(args, fixtures, "record", prozorro.api_url, claude.base_url))]
+
+    # Nothing listens there: any request missing from the fixtures fails
+    offline = ("http://replay.invalid/api/2.5", "http://replay.invalid")
+    runs.append(("Replay, recorded latency", run_phase(args, fixtures, "replay", *offline)))
+    runs.append(("Replay, no latency", run_phase(args, fixtures, "replay", *offline, REPLAY_LATENCY=0)))
+    for seed in ("1", "1", "2"):
+        runs.append((f"Replay, {args.error_rate:.0%} errors, seed {seed}",
+                     run_phase(args, fixtures, "replay", *offline, REPLAY_LATENCY=0,
+                               REPLAY_ERROR_RATE=args.error_rate, REPLAY_SEED=seed)))
+
+    exchanges = {name: sum(1 for _ in open(os.path.join(fixtures, name))) for name in sorted(os.listdir(fixtures))}
+    print()
+    print("Fixtures: " + ", ".join(f"{name} ({count} exchanges)" for name, count in exchanges.items()))
+    print(f"{'':<34}" + "".join(f"{stage:>14}" for stage in STAGES) + f"{'total, s':>10}{'errors':>8}  digest")
+    recorded = runs[0][1]["digest"]
+    for label, result in runs:
+        timings = result["timings"]
+        same = "= recording" if result["digest"] == recorded else ""
+        print(f"{label:<34}" + "".join(f"{timings[stage]:>14.2f}" for stage in STAGES)
+              + f"{sum(timings.values()):>10.2f}{result['errors']:>8}  {result['digest']} {same}")
+
+
+if __name__ == "__main__":
+    main()
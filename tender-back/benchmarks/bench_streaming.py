@@ -0,0 +1,65 @@
+"""
+Time to first useful data for the tender-link analysis: the blocking
+/analyze_tender path against the SSE path (stream_link_analysis), on the
+local fake Anthropic API generating at a realistic tokens/s. Both send the
+forced tool call through the model cascade; the stream parses the tool
+input as it arrives.
+
+    python -m benchmarks.bench_streaming [--tenders 5] [--tps 40]
+"""
+import argparse
+import os
+import time
+
+os.environ["LLM_CACHE_ENABLED"] = "0"
+
+from benchmarks.fake_anthropic import FakeAnthropicServer, SimpleMessagesClient  # noqa: E402
+from benchmarks.fake_prozorro import make_tender  # noqa: E402
+from core.analyze_link import stream_link_analysis  # noqa: E402
+from core.analyze_tender import infer_fields  # noqa: E402
+from core.tender_fields import build_tender_text, structured_fields  # noqa: E402
+
+
+def mean(values):
+    return sum(values) / len(values)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenders", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.6, help="time to first token, seconds")
+    parser.add_argument("--tps", type=float, default=40, help="output tokens per second")
+    args = parser.parse_args()
+
+    blocking, first_structured, first_inferred, done = [], [], [], []
+    with FakeAnthropicServer(latency=args.latency, output_tokens_per_second=args.tps) as server:
+        client = SimpleMessagesClient(server.base_url)
+        for i in range(args.tenders):
+            tender = make_tender(i)
+            known = structured_fields(tender)
+            text = build_tender_text(tender)
+
+            start = time.perf_counter()
+            infer_fields(text, known, client, "blocking")
+            blocking.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            inferred = None
+            for event, data in stream_link_analysis(known, text, client):
+                elapsed = time.perf_counter() - start
+                if event == "field" and not first_structured[i:]:
+                    first_structured.append(elapsed)
+                if event == "field" and data["key"] not in known and inferred is None:
+                    inferred = elapsed
+            first_inferred.append(inferred)
+            done.append(time.perf_counter() - start)
+
+    print()
+    print(f"{'Blocking /analyze_tender:':<34}{mean(blocking):8.2f} s until any data")
+    print(f"{'SSE, first structured field:':<34}{mean(first_structured) * 1000:8.2f} ms")
+    print(f"{'SSE, first Claude field:':<34}{mean(first_inferred):8.2f} s")
+    print(f"{'SSE, done:':<34}{mean(done):8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
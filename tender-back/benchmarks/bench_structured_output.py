@@ -0,0 +1,64 @@
+"""
+Schema-enforced analysis (forced tool call) with targeted re-asks, on the
+local fake Anthropic API breaking one field's type in every n-th answer
+and answering in prose without the tool call in every m-th. Compares the re-ask token cost with rerunning the whole prompt, which is
+what a failed answer used to cost.
+
+    python -m benchmarks.bench_structured_output [--tenders 50] [--invalid-every 5] [--prose-every 13]
+"""
+import argparse
+import os
+
+os.environ["LLM_CACHE_ENABLED"] = "0"
+# One model per call, so the "analyze_tender" label covers every answer
+os.environ["CLAUDE_CASCADE"] = "0"
+
+from benchmarks.fake_anthropic import FakeAnthropicServer, SimpleAsyncMessagesClient, SimpleMessagesClient  # noqa: E402
+from benchmarks.fake_prozorro import make_tender  # noqa: E402
+from core.analysis_executor import run_analysis  # noqa: E402
+from core.analyze_tender import analyze_tender  # noqa: E402
+from core.llm_usage import usage_stats  # noqa: E402
+from core.structured_output import ANALYSIS_TOOL, invalid_fields, output_stats  # noqa: E402
+from core.tender_fields import build_tender_text  # noqa: E402
+
+
+def prompt_tokens(values):
+    return values["input_tokens"] + values["cache_creation_input_tokens"] + values["cache_read_input_tokens"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenders", type=int, default=50)
+    parser.add_argument("--invalid-every", type=int, default=5)
+    parser.add_argument("--prose-every", type=int, default=13)
+    args = parser.parse_args()
+
+    texts = {f"t{i}": build_tender_text(make_tender(i)) for i in range(args.tenders)}
+    with FakeAnthropicServer(latency=0.01, invalid_every=args.invalid_every,
+                            prose_every=args.prose_every) as server:
+        sync_results = [analyze_tender(text, SimpleMessagesClient(server.base_url)) for text in texts.values()]
+        async_results = run_analysis(texts.items(), client=SimpleAsyncMessagesClient(server.base_url))
+
+    usage = usage_stats.snapshot()
+    stats = output_stats.snapshot()["analyze_tender"]
+    main_calls = usage["analyze_tender"]
+    reask = usage.get("analyze_tender_reask", dict.fromkeys(main_calls, 0))
+    per_call = (prompt_tokens(main_calls) + main_calls["output_tokens"]) / main_calls["requests"]
+    reask_total = prompt_tokens(reask) + reask["output_tokens"]
+    results = [*sync_results, *async_results.values()]
+    still_invalid = sum(bool(invalid_fields(r, ANALYSIS_TOOL)) for r in results)
+
+    print()
+    print(f"{'Answers:':<34}{stats['responses']:>8}")
+    print(f"{'Parse-failure rate:':<34}{stats['parse_failure_rate']:>8.1%}")
+    print(f"{'Answers without a tool call:':<34}{stats['no_tool_calls']:>8}")
+    print(f"{'Re-asks / repaired:':<34}{stats['reasks']:>8} / {stats['repaired']}")
+    print(f"{'Still invalid after re-ask:':<34}{still_invalid:>8}")
+    print(f"{'Re-ask tokens:':<34}{reask_total:>8}  ({reask['output_tokens']} output)")
+    print(f"{'Full reruns would cost:':<34}{round(per_call * stats['reasks']):>8}")
+    print(f"{'Re-ask output vs full output:':<34}"
+          f"{reask['output_tokens'] / max(1, main_calls['output_tokens'] / main_calls['requests'] * stats['reasks']):>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Fetch latency of GET /tenders/{hash}: uncached, revalidated (304) and fresh.
+
+    python -m benchmarks.bench_tender_cache [--latency 0.05] [--repeat 50]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.fake_prozorro import FakeProzorroServer
+from core.prozorro_client import ProzorroClient
+from core.tender_cache import TenderCache
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with FakeProzorroServer(total_tenders=10, latency=args.latency) as server:
+        client = ProzorroClient(server.api_url, requests_per_second=0)
+        tender_hash = server.tenders[3]["id"]
+        path = os.path.join(tempfile.mkdtemp(prefix="bench_cache_"), "cache.db")
+
+        uncached = timed(lambda: client.get_tender(tender_hash), args.repeat)
+
+        stale = TenderCache(path, client=client, fresh_seconds=0)
+        stale.get_tender(tender_hash)
+        revalidated = timed(lambda: stale.get_tender(tender_hash), args.repeat)
+
+        fresh = TenderCache(path, client=client)
+        fresh.get_tender(tender_hash)
+        served = timed(lambda: fresh.get_tender(tender_hash), args.repeat * 100)
+
+        cold = TenderCache(path, client=client, memory_items=0)
+        from_disk = timed(lambda: cold.get_tender(tender_hash), args.repeat * 10)
+
+    print(f"Uncached GET:                 {uncached * 1000:8.3f} ms")
+    print(f"Conditional GET (304):        {revalidated * 1000:8.3f} ms  {stale.stats()}")
+    print(f"Fresh, from disk:             {from_disk * 1000:8.3f} ms")
+    print(f"Fresh, from memory:           {served * 1000:8.3f} ms  {fresh.stats()}")
+
+
+if __name__ == "__main__":
+    main()
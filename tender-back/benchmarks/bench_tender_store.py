@@ -0,0 +1,82 @@
+"""
+Listing cost of the SQLite tender store vs. parsing a folder of JSON files.
+
+    python -m benchmarks.bench_tender_store [--tenders 100000] [--files 2000]
+
+The JSON-folder baseline is measured on --files files and extrapolated.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.fake_prozorro import make_tender
+from core.tender_store import TenderStore
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def parse_json_dir(directory):
+    tenders = []
+    for filename in os.listdir(directory):
+        with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        tenders.append({"id": data["id"], "title": data.get("title"), "budget": data.get("value", {}).get("amount", 0)})
+    return tenders
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenders", type=int, default=100_000)
+    parser.add_argument("--files", type=int, default=2_000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_store_")
+    store = TenderStore(os.path.join(workdir, "tenders.db"))
+
+    start = time.perf_counter()
+    batch = []
+    for i in range(args.tenders):
+        batch.append(make_tender(i))
+        if len(batch) == 1000:
+            store.upsert_many(batch)
+            batch = []
+    store.upsert_many(batch)
+    load_time = time.perf_counter() - start
+    db_size = os.path.getsize(store.db_path)
+
+    json_dir = os.path.join(workdir, "json")
+    os.makedirs(json_dir)
+    for i in range(args.files):
+        with open(os.path.join(json_dir, f"ProZorro_{i:032x}.json"), "w", encoding="utf-8") as f:
+            json.dump(make_tender(i), f, ensure_ascii=False, indent=2)
+    _, dir_time = timed(lambda: parse_json_dir(json_dir), repeat=1)
+    dir_estimate = dir_time * args.tenders / args.files
+
+    _, first_page = timed(lambda: store.list_tenders(page=1, page_size=50))
+    _, deep_page = timed(lambda: store.list_tenders(page=args.tenders // 100, page_size=50))
+    _, by_region = timed(lambda: store.list_tenders(region="Київська область", min_budget=1_000_000))
+    _, by_cpv = timed(lambda: store.list_tenders(cpv="45000000-7"))
+    _, get_one = timed(lambda: store.get(f"{args.tenders // 2:032x}"))
+
+    print(f"Stored tenders:                  {store.count()}")
+    print(f"Bulk upsert:                     {load_time:8.2f} s  ({args.tenders / load_time:,.0f} tenders/s)")
+    print(f"Database size:                   {db_size / 2**20:8.1f} MiB")
+    print(f"JSON folder parse (extrapolated): {dir_estimate:8.2f} s  ({dir_time:.2f} s for {args.files} files)")
+    print(f"List first page:                 {first_page * 1000:8.2f} ms")
+    print(f"List page {args.tenders // 100}:                  {deep_page * 1000:8.2f} ms")
+    print(f"Filter region + budget:          {by_region * 1000:8.2f} ms")
+    print(f"Filter CPV:                      {by_cpv * 1000:8.2f} ms")
+    print(f"Get one tender:                  {get_one * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
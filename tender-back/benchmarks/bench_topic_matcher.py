@@ -0,0 +1,87 @@
+"""
+Throughput of the compiled topic matcher vs. the old substring check.
+
+    python -m benchmarks.bench_topic_matcher [--titles 100000] [--extra-keywords 200]
+
+Titles are synthetic, mixing inflected forms, compounds and apostrophe
+variants; the hit counts show what the substring check misses, and every
+title the substring check matches must also be matched by the matcher. The second pass pads
+every topic with --extra-keywords synthetic keywords: the substring check
+grows with the keyword count, the matcher does not.
+"""
+import argparse
+import random
+import time
+
+from core.topic_matcher import TopicMatcher, get_topic_matcher
+
+FRAGMENTS = [
+    "Капітальний ремонт", "капітального ремонту", "Реконструкція", "реконструкції",
+    "будівництва", "монтажу", "комп’ютерної техніки", "комп'ютерів", "компʼютерне обладнання",
+    "програмного забезпечення", "серверів", "інформаційної системи", "медичного обладнання",
+    "лікарні", "охорони здоров'я", "медичних послуг", "фармацевтичних", "продуктів харчування",
+    "паливно-мастильних матеріалів", "послуги з прибирання", "канцелярського приладдя",
+    "Електромонтажні роботи", "Капремонт даху", "Відеосистема", "школи", "дитячого садка", "вулиці", "покрівлі", "у місті Києві", "для потреб", "сільської ради",
+]
+
+
+def make_titles(count, seed=42):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(3, 8))) for _ in range(count)]
+
+
+def padded_keywords(topic_keywords, extra, seed=7):
+    rng = random.Random(seed)
+    letters = "абвгґдеєжзиіїйклмнопрстуфхцчшщьюя"
+    return {
+        topic: keywords + ["".join(rng.choice(letters) for _ in range(rng.randint(6, 12))) for _ in range(extra)]
+        for topic, keywords in topic_keywords.items()
+    }
+
+
+def substring_classify(topic_keywords, text):
+    """The check download_prozorro_tenders used before the matcher"""
+    text = text.lower()
+    return {topic: any(kw.lower() in text for kw in keywords) for topic, keywords in topic_keywords.items()}
+
+
+def compare(titles, matcher, label):
+    start = time.perf_counter()
+    old = [substring_classify(matcher.topic_keywords, t) for t in titles]
+    old_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new = [matcher.classify(t) for t in titles]
+    new_time = time.perf_counter() - start
+
+    keywords = sum(len(k) for k in matcher.topic_keywords.values())
+    print(f"{label} ({keywords} keywords)")
+    print(f"  Substring check:      {old_time:6.2f} s  ({len(titles) / old_time:10,.0f} titles/s)")
+    print(f"  Compiled matcher:     {new_time:6.2f} s  ({len(titles) / new_time:10,.0f} titles/s)")
+    return old, new
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", type=int, default=100_000)
+    parser.add_argument("--extra-keywords", type=int, default=200)
+    args = parser.parse_args()
+
+    titles = make_titles(args.titles)
+    matcher = get_topic_matcher()
+    print(f"Titles: {args.titles}")
+
+    old, new = compare(titles, matcher, "keywords.json")
+    for topic in matcher.topics:
+        old_hits = sum(r[topic] for r in old)
+        new_hits = sum(1 for r in new if r[topic])
+        missed = sum(1 for o, n in zip(old, new) if o[topic] and not n[topic])
+        print(f"    {topic:<14} titles matched: substring {old_hits:>7}  matcher {new_hits:>7}  "
+              f"missed by matcher {missed:>5}")
+
+    padded = TopicMatcher(padded_keywords(matcher.topic_keywords, args.extra_keywords))
+    compare(titles, padded, f"keywords.json + {args.extra_keywords} per topic")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+"""
+Local fake of the Anthropic Messages and Message Batches APIs.
+Point anthropic.Anthropic(base_url=server.base_url, api_key="test") at it to
+exercise the Claude call paths without network access or spend: messages
+answer after a fixed latency, batches end batch_delay seconds after
+submission and serve their results as JSONL.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+import requests
+
+from core.llm_usage import prompt_cache_min_tokens
+
+TEXT_RE = re.compile(r'"""(.*?)"""', re.DOTALL)
+# build_inference_prompt's list of the keys to return
+KEYS_RE = re.compile(r"лише з ключами: ([\w, ]+)\.")
+
+
+def fake_answer(prompt):
+    """Deterministic extraction-shaped JSON derived from the prompt"""
+    match = TEXT_RE.search(prompt)
+    text = (match.group(1) if match else prompt).strip()
+    first_line = text.splitlines()[0] if text else ""
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+    answer = {
+        "title": first_line.split(":", 1)[-1].strip()[:200] or f"Tender {digest}",
+        "issuer": "Сільська рада",
+        "deadline": "2025-02-01",
+        "budget": "100000",
+        "location": "Київська область",
+        "project_type": "ремонт",
+        "required_documents": ["Довідка про відсутність заборгованості"],
+        "avk5_required": False,
+        "technical_specs": f"Специфікація {digest}",
+        "payment_terms": "Оплата після виконання",
+        "resource_requirements": "Бригада",
+        "timeline_feasibility": "реалістичні",
+        "profitability": "прибутковий",
+    }
+    keys = KEYS_RE.search(prompt)
+    if keys:
+        wanted = keys.group(1).split(", ")
+        answer = {key: value for key, value in answer.items() if key in wanted}
+    return json.dumps(answer, ensure_ascii=False)
+
+
+def block_text(content):
+    if isinstance(content, list):
+        return "".join(block.get("text", "") for block in content)
+    return content or ""
+
+
+def fake_tokens(text):
+    """Rough token count: about 4 characters per token for Latin text, 2.5 for Cyrillic"""
+    wide = len(text.encode("utf-8")) - len(text)
+    return int((len(text) - wide) / 4 + wide / 2.5)
+
+
+def request_tokens(params):
+    prompt = block_text(params["messages"][-1]["content"])
+    tools = json.dumps(params.get("tools") or "", ensure_ascii=False)
+    return fake_tokens(tools) + fake_tokens(block_text(params.get("system"))) + fake_tokens(prompt)
+
+
+def cached_prefix(params):
+    """Tools and system text up to and including the last system block marked with cache_control"""
+    system = params.get("system")
+    if not isinstance(system, list):
+        return ""
+    marked = [i for i, block in enumerate(system) if block.get("cache_control")]
+    if not marked:
+        return ""
+    # Tools come first in the prompt, so they are part of the cached prefix
+    tools = json.dumps(params["tools"], ensure_ascii=False) if params.get("tools") else ""
+    return tools + block_text(system[:marked[-1] + 1])
+
+
+def tool_use_content(params, text, invalid=False, weak=False):
+    """Forced tool call answer: the fake JSON restricted to the tool's schema"""
+    tool = params["tools"][0]
+    properties = tool["input_schema"]["properties"]
+    answer = {key: value for key, value in json.loads(text).items() if key in properties}
+    if weak:
+        # What a small model does with a hard tender: leaves the substance blank
+        answer.update({key: "не вказано" for key in ("project_type", "technical_specs") if key in answer})
+    answer.update({key: "" for key in properties if key not in answer})
+    if invalid and "required_documents" in answer:
+        # A typical schema slip: the list comes back as one string
+        answer["required_documents"] = "; ".join(answer["required_documents"])
+    return [{"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:24]}", "name": tool["name"], "input": answer}]
+
+
+def message_body(params, prefix_cache=None, invalid=False, hard_every=0, prose=False):
+    """
+    Message for params. With a prefix_cache set, a cache_control'd system
+    prefix is reported as cache_creation the first time and cache_read after,
+    provided it reaches the model's minimum cacheable length.
+    Requests with tools get a tool_use block; invalid breaks one of its fields,
+    prose answers with the JSON in text instead of calling the tool.
+    With hard_every, haiku models leave fields blank for every n-th prompt.
+    """
+    prompt = block_text(params["messages"][-1]["content"])
+    text = fake_answer(prompt)
+    if params.get("tools") and prose:
+        text = f"Ось результат аналізу: {json.dumps(tool_use_content(params, text)[0]['input'], ensure_ascii=False)}"
+        content = [{"type": "text", "text": text}]
+    elif params.get("tools"):
+        weak = (bool(hard_every) and "haiku" in params.get("model", "")
+                and int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16) % hard_every == 0)
+        content = tool_use_content(params, text, invalid, weak)
+        text = json.dumps(content[0]["input"], ensure_ascii=False)
+    else:
+        content = [{"type": "text", "text": text}]
+    prefix = cached_prefix(params)
+    total = request_tokens(params)
+    cached = fake_tokens(prefix)
+    usage = {"input_tokens": total, "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0,
+             "output_tokens": fake_tokens(text)}
+    if prefix and prefix_cache is not None and cached >= prompt_cache_min_tokens(params.get("model", "")):
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        usage["input_tokens"] = total - cached
+        usage["cache_read_input_tokens" if key in prefix_cache else "cache_creation_input_tokens"] = cached
+        prefix_cache.add(key)
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": params.get("model", "claude-fake"),
+        "content": content,
+        "stop_reason": "tool_use" if content[0]["type"] == "tool_use" else "end_turn",
+        "stop_sequence": None,
+        "usage": usage,
+    }
+
+
+def iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z") if ts else None
+
+
+class SimpleMessagesClient:
+    """
+    Minimal stand-in for anthropic.Anthropic().messages.create that posts the
+    kwargs as-is, so the sync call paths can be driven against the fake
+    regardless of the installed SDK's signature.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.messages = SimpleNamespace(create=self._create, stream=self._stream, count_tokens=self._count_tokens)
+
+    def _create(self, **params):
+        response = self.session.post(f"{self.base_url}/v1/messages", json=params, timeout=60)
+        response.raise_for_status()
+        body = response.json()
+        return SimpleNamespace(
+            content=[SimpleNamespace(**block) for block in body["content"]],
+            usage=SimpleNamespace(**body["usage"]),
+            model=body["model"],
+        )
+
+    def _count_tokens(self, **params):
+        response = self.session.post(f"{self.base_url}/v1/messages/count_tokens", json=params, timeout=60)
+        response.raise_for_status()
+        return SimpleNamespace(**response.json())
+
+    @contextmanager
+    def _stream(self, **params):
+        """
+        messages.stream shape: iterating yields the stream events (tool input
+        as input_json_delta), .text_stream the text deltas, then .get_final_message()
+        """
+        response = self.session.post(f"{self.base_url}/v1/messages", json={**params, "stream": True},
+                                     stream=True, timeout=60)
+        response.raise_for_status()
+        final = SimpleNamespace(content=[], usage=None, model=params.get("model"))
+
+        def events():
+            block, parts = None, []
+            for line in response.iter_lines():
+                if not line.startswith(b"data: "):
+                    continue
+                event = json.loads(line[len(b"data: "):].decode("utf-8"))
+                if event["type"] == "message_start":
+                    final.usage = SimpleNamespace(**event["message"]["usage"])
+                elif event["type"] == "content_block_start":
+                    block, parts = dict(event["content_block"]), []
+                elif event["type"] == "content_block_delta":
+                    delta = event["delta"]
+                    parts.append(delta.get("text", delta.get("partial_json", "")))
+                elif event["type"] == "content_block_stop":
+                    if block["type"] == "tool_use":
+                        block["input"] = json.loads("".join(parts) or "{}")
+                    else:
+                        block["text"] = "".join(parts)
+                    final.content.append(SimpleNamespace(**block))
+                elif event["type"] == "message_delta":
+                    final.usage.output_tokens = event["usage"]["output_tokens"]
+                yield SimpleNamespace(**{key: SimpleNamespace(**value) if key == "delta" else value
+                                         for key, value in event.items()})
+
+        stream_events = events()
+        text_stream = (event.delta.text for event in stream_events
+                       if event.type == "content_block_delta" and event.delta.type == "text_delta")
+        try:
+            yield FakeMessageStream(stream_events, text_stream, final)
+        finally:
+            response.close()
+
+
+class FakeMessageStream:
+    """What messages.stream() enters: iterable over the events, like the SDK's MessageStream"""
+
+    def __init__(self, events, text_stream, final):
+        self._events = events
+        self.text_stream = text_stream
+        self._final = final
+
+    def __iter__(self):
+        return self._events
+
+    def get_final_message(self):
+        for _ in self._events:
+            pass
+        return self._final
+
+
+class SimpleAsyncMessagesClient(SimpleMessagesClient):
+    """Async variant (anthropic.AsyncAnthropic shape) running the sync client in threads"""
+
+    def __init__(self, base_url):
+        super().__init__(base_url)
+        self.messages = SimpleNamespace(create=self._create_async)
+
+    async def _create_async(self, **params):
+        return await asyncio.to_thread(self._create, **params)
+
+
+class FakeAnthropicServer:
+    def __init__(self, latency=0.5, batch_delay=1.0, error_every=0, prefill_per_1k_tokens=0.0,
+                 output_tokens_per_second=0.0, invalid_every=0, model_latency=None, hard_every=0, prose_every=0):
+        self.latency = latency
+        # {model name prefix: latency} overriding latency for those models
+        self.model_latency = model_latency or {}
+        # Haiku answers to every n-th prompt come back with blank fields (0: never)
+        self.hard_every = hard_every
+        # Extra latency per 1k uncached input tokens, to model time-to-first-token
+        self.prefill_per_1k_tokens = prefill_per_1k_tokens
+        # Generation speed; 0 answers instantly after the latency above
+        self.output_tokens_per_second = output_tokens_per_second
+        self.prefix_cache = set()
+        self.batch_delay = batch_delay
+        # Every n-th request in a batch errors (0: never)
+        self.error_every = error_every
+        # Every n-th tool-use message breaks a field's type (0: never)
+        self.invalid_every = invalid_every
+        # Every n-th tool-use message answers in prose instead of calling the tool (0: never)
+        self.prose_every = prose_every
+        self.message_requests = 0
+        self.batches = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def latency_for(self, model):
+        return next((latency for prefix, latency in self.model_latency.items() if model.startswith(prefix)),
+                    self.latency)
+
+    def batch_object(self, batch_id):
+        batch = self.batches[batch_id]
+        ended = time.time() >= batch["ends_at"]
+        total = len(batch["requests"])
+        errored = sum(1 for r in batch["results"] if r["result"]["type"] == "errored")
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else total,
+                "succeeded": total - errored if ended else 0,
+                "errored": errored if ended else 0,
+                "canceled": 0,
+                "expired": 0,
+            },
+            "created_at": iso(batch["created_at"]),
+            "expires_at": iso(batch["created_at"] + 86400),
+            "ended_at": iso(batch["ends_at"]) if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{self.base_url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def create_batch(self, body):
+        batch_id = f"msgbatch_{uuid.uuid4().hex[:24]}"
+        results = []
+        for i, request in enumerate(body["requests"], start=1):
+            if self.error_every and i % self.error_every == 0:
+                result = {"type": "errored", "error": {"type": "error", "error": {"type": "api_error", "message": "fake"}}}
+            else:
+                invalid = bool(self.invalid_every) and i % self.invalid_every == 0
+                result = {"type": "succeeded", "message": message_body(request["params"], self.prefix_cache, invalid)}
+            results.append({"custom_id": request["custom_id"], "result": result})
+        now = time.time()
+        with self._lock:
+            self.batches[batch_id] = {
+                "requests": body["requests"],
+                "results": results,
+                "created_at": now,
+                "ends_at": now + self.batch_delay,
+            }
+        return self.batch_object(batch_id)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def send_json(self, body, status=200, content_type="application/json"):
+                payload = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def send_stream(self, message, tokens_per_delta=5):
+                """message as Messages API server-sent events, paced at output_tokens_per_second"""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                def send(event):
+                    self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                                     .encode("utf-8"))
+                    self.wfile.flush()
+
+                block = message["content"][0]
+                if block["type"] == "tool_use":
+                    text, delta_type, delta_key = json.dumps(block["input"], ensure_ascii=False), "input_json_delta", "partial_json"
+                    start = {**block, "input": {}}
+                else:
+                    text, delta_type, delta_key = block["text"], "text_delta", "text"
+                    start = {"type": "text", "text": ""}
+                send({"type": "message_start",
+                      "message": {**message, "content": [], "usage": {**message["usage"], "output_tokens": 1}}})
+                send({"type": "content_block_start", "index": 0, "content_block": start})
+                step = tokens_per_delta * 4
+                for i in range(0, len(text), step):
+                    if server.output_tokens_per_second:
+                        time.sleep(tokens_per_delta / server.output_tokens_per_second)
+                    send({"type": "content_block_delta", "index": 0,
+                          "delta": {"type": delta_type, delta_key: text[i:i + step]}})
+                send({"type": "content_block_stop", "index": 0})
+                send({"type": "message_delta", "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+                      "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+                send({"type": "message_stop"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                path = urlparse(self.path).path.rstrip("/")
+                if path == "/v1/messages":
+                    with server._lock:
+                        server.message_requests += 1
+                        count = server.message_requests
+                    invalid = bool(server.invalid_every) and count % server.invalid_every == 0
+                    prose = bool(server.prose_every) and count % server.prose_every == 0
+                    message = message_body(body, server.prefix_cache, invalid, server.hard_every, prose)
+                    uncached = message["usage"]["input_tokens"] + message["usage"]["cache_creation_input_tokens"]
+                    time.sleep(server.latency_for(body.get("model", "")) + server.prefill_per_1k_tokens * uncached / 1000)
+                    if body.get("stream"):
+                        self.send_stream(message)
+                        return
+                    if server.output_tokens_per_second:
+                        time.sleep(message["usage"]["output_tokens"] / server.output_tokens_per_second)
+                    self.send_json(message)
+                elif path == "/v1/messages/count_tokens":
+                    self.send_json({"input_tokens": request_tokens(body)})
+                elif path == "/v1/messages/batches":
+                    self.send_json(server.create_batch(body))
+                else:
+                    self.send_json({"type": "error", "error": {"type": "not_found_error"}}, 404)
+
+            def do_GET(self):
+                parts = urlparse(self.path).path.rstrip("/").split("/")
+                batch_id = parts[4] if len(parts) > 4 else None
+                if batch_id not in server.batches:
+                    self.send_json({"type": "error", "error": {"type": "not_found_error"}}, 404)
+                elif parts[-1] == "results":
+                    lines = "\n".join(json.dumps(r, ensure_ascii=False) for r in server.batches[batch_id]["results"])
+                    self.send_json(lines.encode("utf-8"), content_type="application/binary")
+                else:
+                    self.send_json(server.batch_object(batch_id))
+
+        return Handler
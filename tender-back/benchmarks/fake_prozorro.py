@@ -0,0 +1,180 @@
+"""
+Local fake of the ProZorro public API used by the benchmarks.
+Serves a deterministic feed of synthetic tenders with a configurable
+per-request latency, so throughput can be measured without network access.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+TITLES = [
+    "Капітальний ремонт покрівлі школи",
+    "Закупівля комп'ютерної техніки",
+    "Поточний ремонт доріг комунальної власності",
+    "Медичні вироби для лікарні",
+    "Послуги з прибирання приміщень",
+    "Реконструкція системи водопостачання",
+    "Програмне забезпечення для обліку",
+    "Продукти харчування для дитячого садка",
+]
+REGIONS = ["Київська область", "Львівська область", "Одеська область", "Харківська область", "Чернівецька область"]
+CPV_CODES = [("45000000-7", "Будівельні роботи"), ("30200000-1", "Комп'ютерне обладнання"), ("33100000-1", "Медичне обладнання")]
+
+
+def make_tender(index):
+    rng = random.Random(index)
+    tender_id = f"{index:032x}"
+    cpv, cpv_description = rng.choice(CPV_CODES)
+    return {
+        "id": tender_id,
+        "tenderID": f"UA-2025-01-01-{index:06d}-a",
+        "title": rng.choice(TITLES),
+        "description": "Опис предмета закупівлі " * 20,
+        "dateModified": f"2025-01-01T00:00:00.{index:06d}+02:00",
+        "value": {"amount": rng.randint(10_000, 5_000_000), "currency": "UAH"},
+        "procuringEntity": {
+            "name": "Сільська рада",
+            "address": {"locality": "Село", "region": rng.choice(REGIONS)},
+        },
+        "tenderPeriod": {"endDate": "2025-02-01T00:00:00+02:00"},
+        "items": [{"description": "Товар", "classification": {"id": cpv, "description": cpv_description}}],
+    }
+
+
+SHARED_DOCUMENT = "Типова форма договору про закупівлю.\n".encode("utf-8")
+
+
+def document_body(name, size):
+    """Deterministic attachment bytes; "shared" documents are identical across tenders"""
+    if name.startswith("shared"):
+        line = SHARED_DOCUMENT
+    else:
+        line = f"Технічна специфікація {name}. Перелік документів.\n".encode("utf-8")
+    return (line * (size // len(line) + 1))[:size]
+
+
+class FakeProzorroServer:
+    def __init__(self, total_tenders=1000, latency=0.05, page_size=100, opt_fields=True,
+                 documents=0, document_size=64 * 1024):
+        self.tenders = [make_tender(i) for i in range(total_tenders)]
+        self.document_size = document_size
+        if documents:
+            self._add_documents(documents)
+        self.latency = latency
+        self.page_size = page_size
+        self.opt_fields = opt_fields
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def api_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api/2.5"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server.request_count += 1
+                time.sleep(server.latency)
+                url = urlparse(self.path)
+                parts = url.path.rstrip("/").split("/")
+                etag = None
+                if len(parts) >= 2 and parts[-2] == "documents":
+                    payload = document_body(parts[-1], server.document_size)
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                if parts[-1] == "tenders":
+                    body = server.listing(parse_qs(url.query))
+                else:
+                    body = server.detail(parts[-1])
+                    etag = body and f'"{body["data"]["dateModified"]}"'
+                    if etag and self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                if etag:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def _add_documents(self, per_tender):
+        """One shared boilerplate document plus unique ones per tender, served under /documents/"""
+        for tender in self.tenders:
+            names = ["shared-" + tender["id"]] + [f"{tender['id']}-{k}" for k in range(1, per_tender)]
+            tender["documents"] = [
+                {
+                    "id": f"{tender['id']}{k:02d}",
+                    "title": f"{name}.txt",
+                    "format": "text/plain",
+                    "url": f"{{base}}/documents/{name}",
+                    "hash": "md5:" + hashlib.md5(document_body(name, self.document_size)).hexdigest(),
+                    "dateModified": tender["dateModified"],
+                }
+                for k, name in enumerate(names)
+            ]
+
+    def listing(self, query):
+        """
+        Feed page in dateModified order. The cursor is the position in the
+        feed; any non-numeric offset (e.g. an ISO date) starts from the top.
+        """
+        descending = query.get("descending", ["0"])[0] == "1"
+        ordered = list(reversed(self.tenders)) if descending else self.tenders
+        offset = query.get("offset", ["0"])[0]
+        start = int(offset) if offset.isdigit() else 0
+        page = ordered[start: start + self.page_size]
+        opt_fields = [f for f in query.get("opt_fields", [""])[0].split(",") if f]
+        fields = ["id", "dateModified"] + opt_fields if self.opt_fields else ["id", "dateModified"]
+        data = [{f: t[f] for f in fields if f in t} for t in page]
+        next_offset = str(start + len(page))
+        return {"data": data, "next_page": {"offset": next_offset}}
+
+    def detail(self, tender_id):
+        try:
+            tender = self.tenders[int(tender_id, 16)]
+        except (ValueError, IndexError):
+            return None
+        if "documents" in tender:
+            base = self.api_url.rsplit("/api/", 1)[0]
+            tender = dict(tender, documents=[dict(d, url=d["url"].format(base=base)) for d in tender["documents"]])
+        return {"data": tender}
@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import asyncio
+
+from core.analyze_tender import ANALYSIS_MODEL, ANALYSIS_SYSTEM, build_analysis_prompt, build_inference_prompt, parse_analysis
+from core.llm_cache import LLM_CACHE_ENABLED, cache_key, get_llm_cache, response_text
+from core.llm_telemetry import create_message_async
+from core.model_cascade import CASCADE_FAST_MAX_CHARS, FAST_MODEL, low_confidence, run_cascade_async
+from core.long_document import LONG_DOCUMENT_CHARS, map_chunks, merge_analyses
+from core.attachments import tender_analysis_text
+from core.tender_fields import inference_fields, structured_fields, with_structured_fields
+from core.near_duplicates import reused_fields
+from core.structured_output import (ANALYSIS_TOOL, analysis_tool, invalid_fields, merge_repaired, missing_tool_call,
+                                    output_stats, reask_request, tool_choice, tool_input)
+
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "8"))
+# Input + output tokens per minute across the run (0: unlimited)
+ANALYSIS_TOKENS_PER_MINUTE = int(os.getenv("ANALYSIS_TOKENS_PER_MINUTE", "80000"))
+ANALYSIS_ITEM_TIMEOUT = float(os.getenv("ANALYSIS_ITEM_TIMEOUT", "120"))
+# Rough chars-per-token for Ukrainian/English prompts, used to reserve budget up front
+CHARS_PER_TOKEN = 3
+
+
+def system_text(system):
+    """system as a plain string, whether given as text or as content blocks"""
+    if isinstance(system, list):
+        return "".join(block.get("text", "") for block in system)
+    return system or ""
+
+
+def estimate_tokens(request):
+    return (len(system_text(request["system"])) + len(request["prompt"])) // CHARS_PER_TOKEN + request["max_tokens"]
+
+
+def analysis_request(text):
+    """analyze_tender's request for one text"""
+    return {
+        "model": ANALYSIS_MODEL,
+        "system": ANALYSIS_SYSTEM,
+        "prompt": build_analysis_prompt(text),
+        "max_tokens": 1024,
+        "temperature": 0.0,
+        "tool": ANALYSIS_TOOL,
+        "label": "analyze_tender",
+    }
+
+
+def tender_analysis_request(tender_json):
+    """
+    analyze_tender_json's request for one ProZorro tender, attachments
+    included (tender_analysis_text). The executor merges the answer with
+    "known": the structured fields plus whatever is reused from an analysed
+    near duplicate. A text too long for one prompt is sent as the map calls
+    of analyze_long_tender ("chunks"), merged by the executor's reduce().
+    """
+    known = structured_fields(tender_json)
+    known = reused_fields(tender_json, known) or known
+    text = tender_analysis_text(tender_json)
+    request = {
+        **analysis_request(""),
+        "prompt": build_inference_prompt(text, known),
+        "tool": analysis_tool(inference_fields(known)),
+        "label": "analyze_tender_json",
+        "known": known,
+    }
+    if len(text) > LONG_DOCUMENT_CHARS and inference_fields(known):
+        request["chunks"] = [{**analysis_request(chunk), "label": "analyze_tender_map"} for chunk in map_chunks(text)]
+    return request
+
+
+class TokenBudget:
+    """
+    Tokens-per-minute bucket for asyncio tasks. Callers reserve an estimate
+    before a request and settle with the real usage afterwards, so the
+    budget tracks what the API actually counted.
+    """
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = tokens_per_minute
+        self.tokens = tokens_per_minute
+        self.rate = tokens_per_minute / 60
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def reserve(self, tokens):
+        if self.capacity <= 0:
+            return
+        # A single request larger than the whole budget waits for a full bucket
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def settle(self, reserved, used):
+        if self.capacity <= 0 or used is None:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + min(reserved, self.capacity) - used)
+
+
+class AnalysisExecutor:
+    """
+    Runs many Claude analyses concurrently on the async Anthropic client:
+    at most max_concurrency items and requests in flight, a shared
+    tokens-per-minute budget, a timeout per item, and results yielded as
+    each one completes.
+    Answers go through the same LLM cache as the synchronous path.
+    Long texts are split by split() into map calls that share the same
+    limits and are merged back by reduce(). Tool requests go to fast_model
+    first and to the request's own model when that answer fails the
+    confidence check (None: always the request's model).
+    """
+
+    def __init__(self, client, max_concurrency=ANALYSIS_CONCURRENCY, tokens_per_minute=ANALYSIS_TOKENS_PER_MINUTE,
+                 item_timeout=ANALYSIS_ITEM_TIMEOUT, build_request=analysis_request, parse=parse_analysis, cache=None,
+                 split=map_chunks, reduce=merge_analyses, fast_model=FAST_MODEL):
+        self.client = client
+        self.fast_model = fast_model
+        self.split = split
+        self.reduce = reduce
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.item_timeout = item_timeout
+        self.build_request = build_request
+        self.parse = parse
+        self.cache = cache or (get_llm_cache() if LLM_CACHE_ENABLED else None)
+
+    async def _complete(self, request, semaphore, budget):
+        """(answer text, usage counts or None when cached); tool answers come back as their JSON input"""
+        tool = request.get("tool")
+        system = [request["system"] or "", tool] if tool else request["system"]
+        key = cache_key(request["model"], system, request["prompt"], request["temperature"], request["max_tokens"])
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached, None
+
+        reserved = estimate_tokens(request)
+        async with semaphore:
+            await budget.reserve(reserved)
+            kwargs = {"system": request["system"]} if request["system"] else {}
+            if tool:
+                kwargs.update(tool_choice(tool))
+            response, counts = await create_message_async(
+                self.client,
+                request.get("label", "executor"),
+                model=request["model"],
+                max_tokens=request["max_tokens"],
+                temperature=request["temperature"],
+                messages=[{"role": "user", "content": request["prompt"]}],
+                **kwargs,
+            )
+        # Cache reads do not count towards the input tokens-per-minute limit
+        budget.settle(reserved, counts["input_tokens"] + counts["cache_creation_input_tokens"] + counts["output_tokens"])
+        if tool:
+            data = tool_input(response, tool["name"])
+            text = json.dumps(data, ensure_ascii=False) if data is not None else ""
+        else:
+            text = response_text(response)
+        if self.cache is not None and text:
+            self.cache.put(key, request["model"], text)
+        return text, counts
+
+    async def _validated(self, request, semaphore, budget):
+        """
+        Parsed answer to request; for tool requests only the invalid fields
+        are asked for again, all of them when the answer had no tool call.
+        """
+        answer, _ = await self._complete(request, semaphore, budget)
+        result = self.parse(answer)
+        tool = request.get("tool")
+        if tool and isinstance(result, dict):
+            if not answer or "error" in result:
+                result, invalid = {}, missing_tool_call(tool)
+            else:
+                invalid = invalid_fields(result, tool)
+            reask_counts = None
+            if invalid:
+                fixed, reask_counts = await self._complete(reask_request(request, invalid), semaphore, budget)
+                merge_repaired(result, invalid, self.parse(fixed))
+            output_stats.record(request.get("label", "executor"), invalid, reask_counts,
+                                repaired=bool(invalid) and not invalid_fields(result, tool))
+            if not result and invalid:
+                return {"error": "Claude returned no tool call."}
+        return result
+
+    async def _analyze_one(self, text, semaphore, budget):
+        try:
+            request = self.build_request(text)
+            if request.get("chunks"):
+                # Map calls use the large model, as analyze_long_tender does
+                partials = await asyncio.gather(*(self._validated(chunk, semaphore, budget)
+                                                  for chunk in request["chunks"]))
+                result = self.reduce(partials) or next((p for p in partials if "error" in p), {})
+            else:
+                result = await self._routed(request, semaphore, budget)
+            if request.get("known") is not None:
+                result = with_structured_fields(result, request["known"])
+            return result
+        except Exception as e:
+            return {"error": str(e)}
+
+    async def _routed(self, request, semaphore, budget):
+        tool = request.get("tool")
+        if tool is not None and not tool["input_schema"]["required"]:
+            # Everything is known already (reused near duplicate); nothing to ask
+            return {}
+        if not tool or not self.fast_model:
+            return await self._validated(request, semaphore, budget)
+
+        async def call(model, label):
+            return await self._validated({**request, "model": model, "label": label}, semaphore, budget)
+
+        direct = "long_input" if len(request["prompt"]) > CASCADE_FAST_MAX_CHARS else None
+        return await run_cascade_async(request.get("label", "executor"), call,
+                                       lambda result: low_confidence(result, tool),
+                                       self.fast_model, request["model"], direct)
+
+    async def _analyze_item(self, text, semaphore, budget):
+        chunks = self.split(text) if self.split else [text]
+        if len(chunks) == 1:
+            return await self._analyze_one(chunks[0], semaphore, budget)
+        partials = await asyncio.gather(*(self._analyze_one(chunk, semaphore, budget) for chunk in chunks))
+        return self.reduce(partials) or next((p for p in partials if "error" in p), {})
+
+    async def _analyze(self, key, text, slots, semaphore, budget):
+        """
+        (key, result) for one item. item_timeout covers all of its calls (map
+        chunks, cascade tiers, re-asks) from the moment it gets one of the
+        max_concurrency item slots, so queueing behind other items is not counted.
+        """
+        async with slots:
+            try:
+                return key, await asyncio.wait_for(self._analyze_item(text, semaphore, budget), self.item_timeout)
+            except asyncio.TimeoutError:
+                return key, {"error": f"Timed out after {self.item_timeout:g}s"}
+            except Exception as e:
+                return key, {"error": str(e)}
+
+    async def stream(self, items):
+        """Yield (key, result) for (key, text) items in completion order"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        slots = asyncio.Semaphore(self.max_concurrency)
+        budget = TokenBudget(self.tokens_per_minute)
+        tasks = [asyncio.create_task(self._analyze(key, text, slots, semaphore, budget)) for key, text in items]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def run_analysis(items, client=None, on_result=None, **options):
+    """
+    Blocking wrapper for Streamlit and scripts: analyses (key, text) items
+    and returns {key: result}. on_result(key, result, done, total) is called
+    as each item completes. Without a client, the shared provider's async
+    client for this run's event loop is used.
+    """
+    items = list(items)
+
+    async def run():
+        nonlocal client
+        if client is None:
+            from core.claude_client import get_async_claude_client
+            client = get_async_claude_client()
+            if client is None:
+                raise RuntimeError("❌ Claude API key is missing.")
+        results = {}
+        async for key, result in AnalysisExecutor(client, **options).stream(items):
+            results[key] = result
+            if on_result:
+                on_result(key, result, len(results), len(items))
+        return results
+
+    return asyncio.run(run())
@@ -1,86 +1,94 @@
 import re
-import json
-import requests
 from core.claude_client import get_claude_client
-from anthropic.types import TextBlock
+from core.tender_cache import get_tender_cache
+from core.analyze_tender import infer_fields, stream_inferred_fields
+from core.attachments import tender_analysis_text
+from core.tender_fields import inference_fields, structured_fields, with_structured_fields
+from core.near_duplicates import remember_analysis, reused_fields
 
-def analyze_tender_from_hash(tender_hash: str) -> dict:
+def load_link_tender(tender_hash: str):
     """
-    Given only the 32‐character ProZorro hash, fetch the tender data
-    from the public API v2.5 and return Claude’s JSON analysis.
+    Fetch a tender by its 32-character ProZorro hash through the local tender
+    cache (conditional GET on the shared ProZorro client). Returns the
+    known fields (structured ones, plus those reused from an analysed near
+    duplicate), the text to analyse (attachments included) and the tender.
     """
     # 1) Validate the hash format (32 hex characters)
     if not re.fullmatch(r"[a-f0-9]{32}", tender_hash):
         raise ValueError("❌ Invalid tender hash format. Expected 32 hex characters.")
     
-    # 2) Build the v2.5 API URL
-    api_url = f"https://public-api.prozorro.gov.ua/api/2.5/tenders/{tender_hash}"
-    
-    # 3) Fetch tender data
+    # 2) Fetch tender data
     try:
-        resp = requests.get(api_url)
-        resp.raise_for_status()
-        tender_data = resp.json().get("data", {})
+        tender_data = get_tender_cache().get_tender(tender_hash)
     except Exception as e:
         raise RuntimeError(f"❌ Failed to fetch tender data: {e}")
     
-    # 4) Prepare the text snippet for the prompt
-    text = f"""
-Назва тендеру: {tender_data.get('title', '')}
-Замовник: {tender_data.get('procuringEntity', {}).get('name', '')}
-Опис: {tender_data.get('description', '')}
-Місце реалізації: {tender_data.get('procuringEntity', {}).get('address', {}).get('locality', '')}, {tender_data.get('procuringEntity', {}).get('address', {}).get('region', '')}
-Очікувана вартість: {tender_data.get('value', {}).get('amount', '')} {tender_data.get('value', {}).get('currency', 'UAH')}
-Кінцевий термін: {tender_data.get('tenderPeriod', {}).get('endDate', '')}
-"""
-    
-    # 5) Build Claude prompt (same as before)
-    prompt = f"""
-Ви — експерт з державних закупівель в Україні. На основі наданого JSON-вмісту тендеру з системи ProZorro проаналізуйте та витягніть відповідні поля. Якщо деяка інформація відсутня, заповніть лише ті поля, які можна визначити. Якщо можливо — зробіть обґрунтовані висновки щодо строків та прибутковості.
+    # 3) Title, issuer, budget, deadline and location come typed from the JSON
+    known = structured_fields(tender_data)
+    known = reused_fields(tender_data, known) or known
+    return known, tender_analysis_text(tender_data), tender_data
+
+
+def analyze_tender_from_hash(tender_hash: str) -> dict:
+    """
+    Given only the 32‐character ProZorro hash, fetch the tender data
+    and return Claude’s JSON analysis.
+    """
+    known, text, tender_data = load_link_tender(tender_hash)
 
-Поверніть **лише коректний JSON-об'єкт** з такими ключами:
+    # 4) Call Claude, unless a near duplicate already answered everything
+    result = {}
+    if inference_fields(known):
+        client = get_claude_client()
+        if client is None:
+            raise RuntimeError("❌ Claude API key is missing.")
+        try:
+            # Schema-enforced tool call (map-reduce for long texts); identical
+            # tender text is answered from the LLM cache
+            result = infer_fields(text, known, client, "analyze_link")
+        except Exception as e:
+            raise RuntimeError(f"❌ Claude error: {e}")
+    analysis = with_structured_fields(result, known)
+    remember_analysis(tender_data, analysis)
+    return analysis
 
-- title (string): Повна назва тендеру.
-- issuer (string): Назва замовника або організатора закупівлі.
-- deadline (string): Дедлайн подачі пропозицій або кінцева дата.
-- budget (string): Очікувана вартість закупівлі або гранична сума контракту.
-- location (string): Місце реалізації або виконання робіт.
-- project_type (string): Тип проєкту (наприклад: будівництво, IT-послуги, ремонт).
-- required_documents (list of strings): Усі документи, що вимагаються для участі або кваліфікації. Орієнтуйтесь на поля, де згадуються: “Кваліфікаційні вимоги”, “Перелік документів” тощо.
-- avk5_required (boolean): Чи прямо зазначено, що потрібно надати кошторис у форматі АВК-5.
-- technical_specs (string): Стислий виклад технічного завдання — що потрібно зробити, які матеріали чи стандарти використати.
-- payment_terms (string): Умови оплати — аванс, поетапна, після виконання, строки та порядок.
-- resource_requirements (string): Які ресурси чи матеріали має надати підрядник: персонал, техніка, матеріали тощо.
-- timeline_feasibility (string): Чи строки виконання виглядають реалістичними: “реалістичні”, “обмежені, але можливі”, “нереалістичні”.
-- profitability (string): Чи участь у тендері виглядає прибутковою: “прибутковий”, “ризикований”, “збитковий” — з коротким поясненням.
 
-❗Поверніть **тільки** JSON-об’єкт без жодних коментарів чи пояснень.
+def stream_link_analysis(known, text, client=None, tender=None, endpoint=None):
+    """
+    Streaming counterpart of analyze_tender_from_hash for the output of
+    load_link_tender. Yields (event, data): a "field" event per field, the
+    structured ones immediately and the others as soon as Claude has
+    finished writing each one (a field repaired by the re-ask or answered
+    again by the large model comes again), then "done" with the whole
+    analysis, or "error". The analysis of tender is kept for its near
+    duplicates. The Claude calls are recorded under endpoint, since a
+    streaming response runs this generator after the request's own context
+    is gone.
+    """
+    for key, value in known.items():
+        yield "field", {"key": key, "value": value}
 
-Tender Content:
-\"\"\"{text[:15000]}\"\"\"
-"""
-    
-    # 6) Call Claude
-    client = get_claude_client()
-    if client is None:
-        raise RuntimeError("❌ Claude API key is missing.")
-    
-    try:
-        completion = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=1024,
-            temperature=0.0,
-            system="Ви — аналітик державних закупівель. Поверніть тільки валідний JSON.",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        # Extract JSON blob from Claude’s reply
-        raw_parts = []
-        if completion.content:
-            for block in completion.content:
-                if isinstance(block, TextBlock):
-                    raw_parts.append(block.text)
-        raw = "".join(raw_parts)
-        match = re.search(r"(\{.*\})", raw, re.DOTALL)
-        return json.loads(match.group(1)) if match else {}
-    except Exception as e:
-        raise RuntimeError(f"❌ Claude error: {e}")
+    # A near duplicate may have answered every field already
+    result = {}
+    if inference_fields(known):
+        client = client or get_claude_client()
+        if client is None:
+            yield "error", {"detail": "❌ Claude API key is missing."}
+            return
+        try:
+            inferred = stream_inferred_fields(text, known, client, "analyze_link_stream", endpoint)
+            while True:
+                try:
+                    key, value = next(inferred)
+                except StopIteration as done:
+                    result = done.value
+                    break
+                if key not in known:
+                    yield "field", {"key": key, "value": value}
+        except Exception as e:
+            yield "error", {"detail": f"❌ Claude error: {e}"}
+            return
+    analysis = with_structured_fields(result, known)
+    if tender is not None and result:
+        remember_analysis(tender, analysis)
+    yield "done", analysis
@@ -1,48 +1,181 @@
 import json
-import re
-import streamlit as st
+from core.structured_output import ANALYSIS_TOOL, analysis_tool, normalize_analysis
+from core.model_cascade import cascade_completion, cascade_stream
+from core.llm_telemetry import current_endpoint, llm_endpoint
+from core.near_duplicates import remember_analysis, reused_fields
+from core.claude_client import ANALYSIS_MODEL
+from core.attachments import tender_analysis_text
+from core.tender_fields import inference_fields, structured_fields, with_structured_fields
 
 
-
-def analyze_tender(text, client):
-    prompt = f"""
-Ви — експерт з державних закупівель в Україні. Проаналізуйте наведений нижче текст тендеру та всі додаткові файли, які завантажив користувач (наприклад «Додаток 1», списки необхідних документів, технічні специфікації тощо). Поверніть тільки валідний JSON-об'єкт з такими ключами:
+# Static instructions, identical for every tender; the per-field rules are the
+# descriptions in the tool's input schema (FIELD_DESCRIPTIONS). Tool and system
+# block form the prefix marked with cache_control, so repeated calls read it from
+# the prompt cache; the per-tender text follows in the user message. Together they
+# have to stay above the cache minimum of every model that gets them
+# (PROMPT_CACHE_MIN_TOKENS): 2048 tokens on Haiku, the cascade's first tier.
+ANALYSIS_INSTRUCTIONS = """
+Ви — експерт з державних закупівель в Україні. Проаналізуйте наведений нижче текст тендеру та всі додаткові файли, які завантажив користувач (наприклад «Додаток 1», списки необхідних документів, технічні специфікації тощо). Запишіть результат інструментом record_tender_analysis. Повна схема аналізу (у запиті інструмент може містити лише частину цих полів; кожне поле схеми має ще й опис з правилами заповнення):
 - title (string): Повна назва тендеру.
 - issuer (string): Назва замовника або організатора закупівлі.
-- deadline (string): Дедлайн подачі пропозицій або кінцева дата.
-- budget (string): Очікувана вартість закупівлі або гранична сума контракту.
+- deadline (string): Кінцевий строк подання пропозицій у форматі ISO 8601 зі зміщенням від UTC.
+- budget (string або number): Очікувана вартість закупівлі або гранична сума контракту.
 - location (string): Місце реалізації або виконання робіт.
 - project_type (string): Тип проєкту (наприклад: будівництво, IT‑послуги, ремонт).
-- required_documents (list of strings): Укажіть усі документи, які вимагаються для участі або кваліфікації — беріть інформацію як із основного тексту, так і зі всіх завантажених файлів.
+- required_documents (list of strings): Усі документи, які вимагаються для участі або кваліфікації — з основного тексту та з усіх завантажених файлів.
 - avk5_required (boolean): Чи прямо зазначена вимога подати кошторис у форматі АВК‑5 (true або false).
-- technical_specs (string): Стисле резюме технічних вимог — що потрібно виконати, які матеріали, стандарти, обладнання. Орієнтуйтесь на розділи та відповідні вкладені файли з назвами “Технічна специфікація”, “Технічне завдання”, “Опис предмету закупівлі” тощо.
-- pyment_terms (string): Умови оплати — аванс, поетапна, після виконання, строки та порядок.
-- resource_requirements (string): Які ресурси та матеріали повинен надати підрядник: робітники, інженери, техніка, будматеріали, ПММ тощо. Беріть дані з розділів “Обсяг робіт”, “Вимоги до ресурсів”, а також зі всіх доданих файлів “Відомість ресурсів” тощо.
+- technical_specs (string): Стисле резюме технічних вимог — що потрібно виконати, які матеріали, стандарти, обладнання.
+- payment_terms (string): Умови оплати — аванс, поетапна, після виконання, строки та порядок.
+- resource_requirements (string): Які ресурси та матеріали повинен надати підрядник: робітники, інженери, техніка, будматеріали, ПММ тощо.
 - timeline_feasibility (string): Чи виглядають строки виконання реалістичними (наприклад: “реалістичні”, “обмежені, але можливі”, “нереалістичні”).
-- profitability (string): Чи виглядає участь у тендері прибутковою з урахуванням бюджету, обсягу робіт та витрат. (Наприклад: “прибутковий”, “ризикований”, “збитковий” — з коротким поясненням.)
+- profitability (string): Чи виглядає участь у тендері прибутковою з урахуванням бюджету, обсягу робіт та витрат (“прибутковий”, “ризикований”, “збитковий” — з коротким поясненням).
 
-❗Якщо виявите в завантажених файлах додаткові релевантні поля (наприклад “compliance_requirements”, “subcontractor_rules” тощо), додайте відповідні ключі в JSON. Не додавайте ніяких пояснень або коментарів — поверніть лише коректний JSON.
+❗Якщо виявите в завантажених файлах додаткові релевантні поля (наприклад “compliance_requirements”, “subcontractor_rules” тощо), додайте відповідні ключі.
 
+Загальні правила:
+1. Беріть значення лише з наданого тексту. Не вигадуйте дат, сум, назв чи вимог, яких у тексті немає. Якщо інформації немає, для рядкових полів пишіть «не вказано», для required_documents — порожній список, для avk5_required — false.
+2. Пишіть українською, навіть якщо частину документації подано іншою мовою. Власні назви, коди ДК 021:2015 та позначення нормативних документів (ДБН, ДСТУ, ISO) залишайте так, як у тексті.
+3. Дати й суми переносьте точно, без округлень; дати — у форматі ISO 8601, як у структурованих даних ProZorro.
+4. Поля, вже взяті зі структурованих даних ProZorro, у запиті не повертайте: схема інструменту містить лише ті поля, які потрібно заповнити.
+
+Де шукати дані в тендерній документації:
+- Оголошення та основна частина документації: назва, замовник, очікувана вартість, строк подання пропозицій, місце виконання.
+- Кваліфікаційні критерії (стаття 16 Закону): досвід аналогічних договорів, обладнання, працівники, фінансова спроможність — джерело для required_documents і resource_requirements.
+- Підстави для відмови (стаття 17 або пункт 47 Особливостей): довідки та інформація, які подають учасник і переможець.
+- Технічна специфікація, технічне завдання, медико‑технічні вимоги, опис предмета закупівлі, відомості обсягів робіт і ресурсів — джерело для technical_specs і resource_requirements.
+- Проєкт договору: умови оплати, строки виконання, гарантії, штрафні санкції — основа для payment_terms, timeline_feasibility і profitability.
+- Кошторисна документація та договірна ціна: вимога щодо АВК‑5 і структура ціни.
+"""
+ANALYSIS_SYSTEM = [{"type": "text", "text": ANALYSIS_INSTRUCTIONS.strip(), "cache_control": {"type": "ephemeral"}}]
+
+
+def build_analysis_prompt(text):
+    return f"""
 Tender Text:
 \"\"\"{text[:15000]}\"\"\"
 """
 
+
+def build_inference_prompt(text, known):
+    """
+    build_analysis_prompt for a tender whose structured fields are already
+    known: they are passed as context and only the other keys are asked for.
+    """
+    return f"""
+Поля, вже взяті зі структурованих даних ProZorro (не повертайте їх): {json.dumps(known, ensure_ascii=False)}
+Поверніть JSON лише з ключами: {", ".join(inference_fields(known))}.
+{build_analysis_prompt(text)}"""
+
+
+def parse_analysis(result):
+    """Answer text (a tool call's input as JSON) as a dict; an error when it is not one"""
+    try:
+        data = json.loads(result) if result else None
+    except json.JSONDecodeError:
+        data = None
+    if not isinstance(data, dict):
+        return {"error": "Claude returned invalid JSON."}
+    return normalize_analysis(data)
+
+
+def analyze_tender(text, client):
+    if len(text) > 15000:
+        # Whole-document coverage instead of cutting at 15000 characters
+        from core.long_document import analyze_long_tender
+        return analyze_long_tender(text, client)
     try:
-        response = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
+        # Forced tool call validated against the schema; the fast model answers
+        # first and the large one only when that answer fails the confidence check
+        return cascade_completion(
+            client,
             max_tokens=1024,
             temperature=0.0,
-            system="...",
-            messages=[{"role": "user", "content": prompt}]
+            system=ANALYSIS_SYSTEM,
+            prompt=build_analysis_prompt(text),
+            tool=ANALYSIS_TOOL,
+            label="analyze_tender",
         )
-        if response.content:
-            result = ''.join(block.text for block in response.content if hasattr(block, 'text'))
-            try:
-                return json.loads(result)
-            except json.JSONDecodeError:
-                match = re.search(r'({.*})', result, re.DOTALL)
-                if match:
-                    return json.loads(match.group(1))
-        return {"error": "Claude returned invalid JSON."}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def analyze_tender_pages(pages, client):
+    """
+    analyze_tender for page texts as they are extracted (iter_pdf_pages):
+    a long document's map calls start before its last page has been read.
+    """
+    from core.long_document import analyze_page_stream
+    return analyze_page_stream(pages, client)
+
+
+def infer_fields(text, known, client, label):
+    """
+    Claude's answer for the fields not in known: one schema-enforced call,
+    or map-reduce over the whole text when it is longer than one prompt
+    carries (attachments included). {} when everything is known.
+    """
+    fields = inference_fields(known)
+    if not fields:
+        return {}
+    if len(text) > 15000:
+        from core.long_document import analyze_long_tender
+        result = analyze_long_tender(text, client)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        return result
+    return cascade_completion(
+        client,
+        max_tokens=1024,
+        temperature=0.0,
+        system=ANALYSIS_SYSTEM,
+        prompt=build_inference_prompt(text, known),
+        tool=analysis_tool(fields),
+        label=label,
+    )
+
+
+def stream_inferred_fields(text, known, client, label, endpoint=None):
+    """
+    infer_fields for use with yield from: yields (key, value) for each field
+    not in known as soon as Claude has finished writing it (streamed forced
+    tool call through the cascade), and returns the dict. A text longer than
+    one prompt goes through map-reduce; its fields follow the reduce step.
+    """
+    fields = inference_fields(known)
+    if not fields:
+        return {}
+    if len(text) > 15000:
+        # No yield inside, so the endpoint context cannot leak across requests
+        with llm_endpoint(endpoint or current_endpoint.get()):
+            result = infer_fields(text, known, client, label)
+        yield from ((key, value) for key, value in result.items() if key not in known)
+        return result
+    return (yield from cascade_stream(
+        client,
+        max_tokens=1024,
+        temperature=0.0,
+        system=ANALYSIS_SYSTEM,
+        prompt=build_inference_prompt(text, known),
+        tool=analysis_tool(fields),
+        label=label,
+        endpoint=endpoint,
+    ))
+
+
+def analyze_tender_json(tender_json, client):
+    """
+    analyze_tender for a ProZorro tender: title, issuer, budget, currency,
+    deadline and location come typed from the JSON, Claude fills the rest
+    from the tender text and its attachments (tender_analysis_text).
+    A near duplicate of an analysed tender reuses that analysis and only
+    the fields depending on a changed budget or deadline are asked for.
+    """
+    known = structured_fields(tender_json)
+    known = reused_fields(tender_json, known) or known
+    try:
+        result = infer_fields(tender_analysis_text(tender_json), known, client, "analyze_tender_json")
+        analysis = with_structured_fields(result, known)
+        remember_analysis(tender_json, analysis)
+        return analysis
     except Exception as e:
         return {"error": str(e)}
@@ -0,0 +1,276 @@
+import os
+import time
+import hashlib
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+
+from core.prozorro_client import get_prozorro_client
+from core.tender_fields import build_tender_text
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ATTACHMENTS_DIR = os.getenv("TENDER_ATTACHMENTS_DIR", os.path.join(BASE_DIR, "../data/attachments"))
+ATTACHMENT_WORKERS = int(os.getenv("ATTACHMENT_WORKERS", "4"))
+# Attachments in the ProZorro analysis prompt: "stored" (what POST /tenders/{id}/attachments
+# already fetched, no download), "fetch" (download the missing ones first) or "off"
+ANALYSIS_ATTACHMENTS = os.getenv("ANALYSIS_ATTACHMENTS", "stored")
+CHUNK_SIZE = 64 * 1024
+# Formats we can hand to text extraction, by extension
+TEXT_FORMATS = {
+    "application/pdf": ".pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ".docx",
+    "text/plain": ".txt",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256     TEXT PRIMARY KEY,
+    md5        TEXT,
+    size       INTEGER NOT NULL,
+    path       TEXT NOT NULL,
+    text       TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_blobs_md5 ON blobs(md5);
+CREATE TABLE IF NOT EXISTS documents (
+    tender_id     TEXT NOT NULL,
+    document_id   TEXT NOT NULL,
+    date_modified TEXT NOT NULL,
+    title         TEXT,
+    url           TEXT,
+    sha256        TEXT NOT NULL,
+    PRIMARY KEY (tender_id, document_id, date_modified)
+);
+"""
+
+
+def latest_documents(tender_data):
+    """Newest version of every tender-level document that has a download url"""
+    latest = {}
+    for doc in tender_data.get("documents") or []:
+        if not doc.get("url"):
+            continue
+        doc_id = doc.get("id") or doc["url"]
+        if doc_id not in latest or (doc.get("dateModified") or "") >= (latest[doc_id].get("dateModified") or ""):
+            latest[doc_id] = doc
+    return list(latest.values())
+
+
+def document_extension(doc):
+    ext = os.path.splitext(doc.get("title") or "")[1].lower()
+    return ext or TEXT_FORMATS.get(doc.get("format"), "")
+
+
+def prozorro_md5(doc):
+    """ProZorro publishes "hash": "md5:..." for uploaded documents"""
+    value = doc.get("hash") or ""
+    return value[4:] if value.startswith("md5:") else None
+
+
+def extract_text(path):
+    """Plain text of a stored attachment, None for formats we do not read"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf":
+        from core.data_extractor import extract_text_from_pdf
+        return extract_text_from_pdf(path)
+    if ext == ".docx":
+        from docx import Document
+        return "\n".join(p.text for p in Document(path).paragraphs).strip()
+    if ext == ".txt":
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read().strip()
+    return None
+
+
+class AttachmentStore:
+    """
+    Content-addressed store for tender attachments.
+    Files are streamed to disk and kept once per SHA-256 under
+    objects/<2 hex>/<sha256><ext>, so boilerplate shared across tenders is
+    stored once. A document already seen at the same dateModified, or whose
+    ProZorro md5 matches a stored file, is not downloaded again. Extracted
+    text is kept next to the hash, so each file is extracted once.
+    """
+
+    def __init__(self, root=ATTACHMENTS_DIR, client=None, max_workers=ATTACHMENT_WORKERS):
+        self.root = root
+        self.client = client
+        self.max_workers = max_workers
+        self._local = threading.local()
+        # Serialises extraction per hash when two tenders share a file
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self.counters = {"downloaded": 0, "deduplicated": 0, "skipped": 0, "bytes": 0}
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, "attachments.db"), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, key, value=1):
+        with self._locks_lock:
+            self.counters[key] += value
+
+    def _hash_lock(self, sha256):
+        with self._locks_lock:
+            return self._locks.setdefault(sha256, threading.Lock())
+
+    def known_sha256(self, tender_id, doc):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT sha256 FROM documents WHERE tender_id = ? AND document_id = ? AND date_modified = ?",
+            (tender_id, doc.get("id") or doc["url"], doc.get("dateModified") or ""),
+        ).fetchone()
+        if row is None and prozorro_md5(doc):
+            row = conn.execute("SELECT sha256 FROM blobs WHERE md5 = ?", (prozorro_md5(doc),)).fetchone()
+        return row[0] if row else None
+
+    def blob(self, sha256):
+        row = self._connect().execute("SELECT path, size, text FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        return {"path": row[0], "size": row[1], "text": row[2]} if row else None
+
+    def download(self, url, extension=""):
+        """Stream url to disk while hashing it; returns the stored file's sha256"""
+        client = self.client or get_prozorro_client()
+        sha256, md5, size = hashlib.sha256(), hashlib.md5(), 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, "objects"), suffix=".part")
+        try:
+            response = client.request("GET", url, endpoint="documents", stream=True)
+            with os.fdopen(fd, "wb") as f, response:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    sha256.update(chunk)
+                    md5.update(chunk)
+                    size += len(chunk)
+            digest = sha256.hexdigest()
+            if self.blob(digest) is not None:
+                # Same bytes under another url: keep the stored copy
+                self._count("deduplicated")
+                os.remove(tmp_path)
+                return digest
+            path = os.path.join(self.root, "objects", digest[:2], digest + extension)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR IGNORE INTO blobs (sha256, md5, size, path, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (digest, md5.hexdigest(), size, path, time.time()),
+                )
+            self._count("downloaded")
+            self._count("bytes", size)
+            return digest
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def text(self, sha256):
+        """Extracted text of a stored file, extracting it on first use"""
+        with self._hash_lock(sha256):
+            blob = self.blob(sha256)
+            if blob is None:
+                return None
+            if blob["text"] is None:
+                text = extract_text(blob["path"])
+                if text is None:
+                    return None
+                with self._connect() as conn:
+                    conn.execute("UPDATE blobs SET text = ? WHERE sha256 = ?", (text, sha256))
+                return text
+            return blob["text"]
+
+    def fetch_document(self, tender_id, doc, extract=True):
+        sha256 = self.known_sha256(tender_id, doc)
+        skipped = sha256 is not None
+        if skipped:
+            self._count("skipped")
+        else:
+            sha256 = self.download(doc["url"], document_extension(doc))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (tender_id, document_id, date_modified, title, url, sha256) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (tender_id, doc.get("id") or doc["url"], doc.get("dateModified") or "",
+                 doc.get("title"), doc["url"], sha256),
+            )
+        blob = self.blob(sha256)
+        return {
+            "document_id": doc.get("id"),
+            "title": doc.get("title"),
+            "document_type": doc.get("documentType"),
+            "sha256": sha256,
+            "size": blob["size"],
+            "path": blob["path"],
+            "skipped": skipped,
+            "text": self.text(sha256) if extract else None,
+        }
+
+    def iter_attachments(self, tender_data, extract=True):
+        """
+        Download (or reuse) every attachment of a tender with bounded
+        concurrency and yield each one with its extracted text as soon as
+        it is ready, in completion order.
+        """
+        docs = latest_documents(tender_data)
+        if not docs:
+            return
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.fetch_document, tender_data["id"], doc, extract): doc for doc in docs}
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    doc = futures[future]
+                    print(f"⚠️ Attachment {doc.get('title')} failed: {e}")
+                    yield {"document_id": doc.get("id"), "title": doc.get("title"), "error": str(e)}
+
+    def fetch_attachments(self, tender_data, extract=True):
+        return list(self.iter_attachments(tender_data, extract))
+
+    def stored_attachments(self, tender_data):
+        """Titles and texts of the tender's documents already in the store; downloads nothing"""
+        stored = []
+        for doc in latest_documents(tender_data):
+            sha256 = self.known_sha256(tender_data["id"], doc)
+            if sha256 is not None:
+                stored.append({"title": doc.get("title"), "text": self.text(sha256)})
+        return stored
+
+    def stats(self):
+        with self._locks_lock:
+            return dict(self.counters)
+
+
+def attachments_text(attachments):
+    """One text block per attachment, titled, for the analysis prompt"""
+    return "\n\n".join(
+        f"=== {a['title']} ===\n{a['text']}" for a in attachments if a.get("text")
+    )
+
+
+@lru_cache(maxsize=None)
+def get_attachment_store():
+    return AttachmentStore()
+
+
+def tender_analysis_text(tender_data, mode=ANALYSIS_ATTACHMENTS):
+    """build_tender_text followed by the text of the tender's attachments (see ANALYSIS_ATTACHMENTS)"""
+    text = build_tender_text(tender_data)
+    if mode not in ("stored", "fetch") or not latest_documents(tender_data):
+        return text
+    store = get_attachment_store()
+    try:
+        attachments = store.fetch_attachments(tender_data) if mode == "fetch" else store.stored_attachments(tender_data)
+    except Exception as e:
+        print(f"⚠️ Attachments of {tender_data.get('id')} skipped: {e}")
+        return text
+    extra = attachments_text(attachments)
+    return f"{text}\n\n{extra}" if extra else text
@@ -0,0 +1,168 @@
+import os
+import re
+import json
+import time
+
+from core.llm_cache import LLM_CACHE_ENABLED, cache_key, get_llm_cache, response_text
+from core.llm_telemetry import record_call
+from core.structured_output import (REASK_MAX_TOKENS, analysis_tool, invalid_fields, merge_repaired,
+                                    normalize_analysis, output_stats, reask_prompt, tool_choice, tool_input)
+
+BATCH_POLL_SECONDS = float(os.getenv("CLAUDE_BATCH_POLL_SECONDS", "30"))
+# Message Batches accept up to 100k requests per batch
+BATCH_MAX_REQUESTS = 100_000
+# Re-asks are billed through record_call("batch"); nothing per request to add to output_stats
+NO_COUNTS = dict.fromkeys(("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"), 0)
+CUSTOM_ID_RE = re.compile(r"^[a-zA-Z0-9_-]{1,64}$")
+
+
+def batch_request(custom_id, model, prompt, max_tokens, temperature=0.0, system=None, tool=None):
+    """One Message Batches entry; params are the same as for messages.create (tool: forced tool call)"""
+    if not CUSTOM_ID_RE.match(custom_id):
+        raise ValueError(f"❌ Invalid batch custom_id: {custom_id}")
+    params = {
+        "model": model,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "messages": [{"role": "user", "content": prompt}],
+    }
+    if system:
+        params["system"] = system
+    if tool:
+        params.update(tool_choice(tool))
+    return {"custom_id": custom_id, "params": params}
+
+
+def request_tool(request):
+    tools = request["params"].get("tools")
+    return tools[0] if tools else None
+
+
+def request_cache_key(request):
+    """Same key as the executor's for the same request, tool included"""
+    params = request["params"]
+    tool = request_tool(request)
+    return cache_key(
+        params["model"], [params.get("system") or "", tool] if tool else params.get("system"),
+        params["messages"][0]["content"], params["temperature"], params["max_tokens"],
+    )
+
+
+def answer_text(message, tool=None):
+    """Text of a batch answer; a tool call's input as JSON"""
+    if tool is None:
+        return response_text(message)
+    data = tool_input(message, tool["name"])
+    return json.dumps(data, ensure_ascii=False) if data is not None else ""
+
+
+def wait_for_batch(client, batch_id, poll_interval=BATCH_POLL_SECONDS, timeout=None):
+    start = time.monotonic()
+    while True:
+        batch = client.messages.batches.retrieve(batch_id)
+        if batch.processing_status == "ended":
+            return batch
+        counts = batch.request_counts
+        print(f"⏳ Batch {batch_id}: {counts.processing} processing, {counts.succeeded} succeeded, {counts.errored} errored")
+        if timeout is not None and time.monotonic() - start > timeout:
+            raise TimeoutError(f"❌ Batch {batch_id} still {batch.processing_status} after {timeout}s")
+        time.sleep(poll_interval)
+
+
+def run_message_batch(client, requests, poll_interval=BATCH_POLL_SECONDS, timeout=None, cache=None,
+                      cacheable=None):
+    """
+    Run requests (from batch_request) through the Message Batches API.
+    Requests already answered in the LLM cache are not submitted; new answers
+    are written to it, only those passing cacheable(request, text) when given.
+    Returns {custom_id: answer text} (a tool call's input as JSON), with None
+    for requests that errored, expired or were canceled.
+    """
+    cache = cache or (get_llm_cache() if LLM_CACHE_ENABLED else None)
+    results, pending = {}, []
+    for request in requests:
+        cached = cache.get(request_cache_key(request)) if cache is not None else None
+        if cached is not None:
+            results[request["custom_id"]] = cached
+        else:
+            pending.append(request)
+    if results:
+        print(f"♻️ {len(results)} answers served from the LLM cache")
+
+    by_id = {request["custom_id"]: request for request in pending}
+    for i in range(0, len(pending), BATCH_MAX_REQUESTS):
+        chunk = pending[i:i + BATCH_MAX_REQUESTS]
+        batch = client.messages.batches.create(requests=chunk)
+        print(f"📨 Submitted batch {batch.id} with {len(chunk)} requests")
+        wait_for_batch(client, batch.id, poll_interval, timeout)
+
+        for entry in client.messages.batches.results(batch.id):
+            if entry.result.type != "succeeded":
+                print(f"⚠️ Batch request {entry.custom_id}: {entry.result.type}")
+                results[entry.custom_id] = None
+                continue
+            # No per-request wall time in a batch; only tokens are recorded
+            record_call("batch", entry.result.message.model, getattr(entry.result.message, "usage", None))
+            text = answer_text(entry.result.message, request_tool(by_id[entry.custom_id]) if entry.custom_id in by_id else None)
+            results[entry.custom_id] = text
+            request = by_id.get(entry.custom_id)
+            if cache is not None and text and request and (cacheable is None or cacheable(request, text)):
+                cache.put(request_cache_key(request), request["params"]["model"], text)
+
+    for request in pending:
+        results.setdefault(request["custom_id"], None)
+    return results
+
+
+def parse_tool_answer(answer):
+    try:
+        data = json.loads(answer) if answer else None
+    except json.JSONDecodeError:
+        data = None
+    return normalize_analysis(data) if isinstance(data, dict) else {}
+
+
+def valid_tool_answer(request, answer):
+    return not invalid_fields(parse_tool_answer(answer), request_tool(request))
+
+
+def run_structured_batch(client, requests, poll_interval=BATCH_POLL_SECONDS, timeout=None, cache=None, label="batch"):
+    """
+    run_message_batch for forced tool calls (batch_request with tool):
+    {custom_id: dict, or None when the request failed}. Answers are checked
+    with invalid_fields, and the failing fields alone are re-asked in one
+    follow-up batch, as structured_completion does for single calls. Only
+    answers that validate, directly or after the re-ask, are cached.
+    """
+    cache = cache or (get_llm_cache() if LLM_CACHE_ENABLED else None)
+    answers = run_message_batch(client, requests, poll_interval, timeout, cache, cacheable=valid_tool_answer)
+    results, invalid, followups = {}, {}, []
+    for request in requests:
+        custom_id, params = request["custom_id"], request["params"]
+        if answers.get(custom_id) is None:
+            results[custom_id] = None
+            continue
+        results[custom_id] = parse_tool_answer(answers[custom_id])
+        invalid[custom_id] = invalid_fields(results[custom_id], request_tool(request))
+        if invalid[custom_id]:
+            followups.append(batch_request(
+                custom_id, params["model"], reask_prompt(params["messages"][0]["content"], invalid[custom_id]),
+                REASK_MAX_TOKENS, params["temperature"], params.get("system"), analysis_tool(list(invalid[custom_id])),
+            ))
+    if followups:
+        print(f"🔁 Re-asking invalid fields of {len(followups)} answers")
+        fixed = run_message_batch(client, followups, poll_interval, timeout, cache, cacheable=valid_tool_answer)
+    for request in requests:
+        custom_id = request["custom_id"]
+        fields = invalid.get(custom_id)
+        if fields is None:
+            continue
+        repaired = False
+        if fields:
+            merge_repaired(results[custom_id], fields, parse_tool_answer(fixed.get(custom_id)))
+            repaired = not invalid_fields(results[custom_id], request_tool(request))
+            if repaired and cache is not None:
+                cache.put(request_cache_key(request), request["params"]["model"],
+                          json.dumps(results[custom_id], ensure_ascii=False))
+        output_stats.record(label, fields, NO_COUNTS if fields else None, repaired=repaired)
+    return results
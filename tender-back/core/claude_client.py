@@ -1,10 +1,107 @@
 import os
+import asyncio
+import threading
+import weakref
+
 import anthropic
-import streamlit as st
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from core.http_fixtures import HTTP_FIXTURES_MODE, fixture_transport  # noqa: E402
+
+# Model names used across the backend; override per deployment via .env
+ANALYSIS_MODEL = os.getenv("CLAUDE_ANALYSIS_MODEL", "claude-3-5-sonnet-20241022")
+EXTRACTION_MODEL = os.getenv("CLAUDE_EXTRACTION_MODEL", ANALYSIS_MODEL)
+# First tier of the model cascade; answers failing its confidence check go to ANALYSIS_MODEL
+FAST_MODEL = os.getenv("CLAUDE_FAST_MODEL", "claude-3-5-haiku-20241022")
+TEMPLATE_MODEL = os.getenv("CLAUDE_TEMPLATE_MODEL", "claude-3-opus-20240229")
+
+# None talks to api.anthropic.com; point at a proxy or a local fake otherwise
+CLAUDE_BASE_URL = os.getenv("CLAUDE_BASE_URL") or None
+CLAUDE_CONNECT_TIMEOUT = float(os.getenv("CLAUDE_CONNECT_TIMEOUT", "10"))
+CLAUDE_TIMEOUT = float(os.getenv("CLAUDE_TIMEOUT", "120"))
+# The SDK retries connection errors, 408/409/429 and 5xx with exponential backoff
+CLAUDE_MAX_RETRIES = int(os.getenv("CLAUDE_MAX_RETRIES", "3"))
+
+
+def anthropic_transport(is_async, api_key, base_url, timeout, max_retries):
+    """Default transport: the Anthropic SDK clients"""
+    cls = anthropic.AsyncAnthropic if is_async else anthropic.Anthropic
+    return cls(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=max_retries)
+
+
+class ClaudeClients:
+    """
+    Process-wide Claude clients, independent of Streamlit/FastAPI.
+    One sync client is shared by every thread (keeping its HTTP connection
+    pool warm); async clients are bound to their event loop, so one is kept
+    per running loop. transport(is_async, api_key, base_url, timeout,
+    max_retries) builds the clients and can be swapped for a local fake.
+    """
+
+    def __init__(self, api_key=None, base_url=CLAUDE_BASE_URL, timeout=CLAUDE_TIMEOUT,
+                 connect_timeout=CLAUDE_CONNECT_TIMEOUT, max_retries=CLAUDE_MAX_RETRIES,
+                 transport=anthropic_transport):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = anthropic.Timeout(timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.transport = transport
+        self._sync = None
+        self._async = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _options(self, is_async):
+        api_key = self.api_key or os.getenv("CLAUDE_API_KEY")
+        if not api_key and self.transport is anthropic_transport:
+            print("❌ Claude API key not found (CLAUDE_API_KEY in .env)")
+            return None
+        return {"is_async": is_async, "api_key": api_key, "base_url": self.base_url,
+                "timeout": self.timeout, "max_retries": self.max_retries}
+
+    def sync_client(self):
+        with self._lock:
+            if self._sync is None:
+                options = self._options(is_async=False)
+                self._sync = options and self.transport(**options)
+            return self._sync
+
+    def async_client(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        with self._lock:
+            client = self._async.get(loop) if loop else None
+            if client is None:
+                options = self._options(is_async=True)
+                client = options and self.transport(**options)
+                if loop and client:
+                    self._async[loop] = client
+            return client
+
+    def use_transport(self, transport):
+        """Swap the transport (e.g. a local fake); clients are rebuilt on next use"""
+        with self._lock:
+            self.transport = transport
+            self._sync = None
+            self._async = weakref.WeakKeyDictionary()
+
+
+# HTTP_FIXTURES_MODE=record/replay: SDK traffic captured to or served from the fixtures
+claude_clients = ClaudeClients(transport=fixture_transport() if HTTP_FIXTURES_MODE else anthropic_transport)
+
 
 def get_claude_client():
-    api_key = os.getenv("CLAUDE_API_KEY")
-    if not api_key:
-        st.error("❌ Ключ API Claude не знайдено у файлі .env")
-        return None
-    return anthropic.Anthropic(api_key=api_key)
\ No newline at end of file
+    """Shared sync client; None when no API key is configured"""
+    return claude_clients.sync_client()
+
+
+def get_async_claude_client():
+    """Async client for the running event loop; None when no API key is configured"""
+    return claude_clients.async_client()
+
+
+def set_claude_transport(transport):
+    claude_clients.use_transport(transport)
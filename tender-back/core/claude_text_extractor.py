@@ -1,20 +1,20 @@
 import os
 import json
 import time
-import anthropic
-from dotenv import load_dotenv
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
+from core.tender_store import get_tender_store
+from core.tender_fields import build_tender_text, inference_fields, structured_fields, with_structured_fields
+from core.structured_output import analysis_tool, normalize_analysis, structured_completion
+from core.claude_batches import batch_request, run_structured_batch
+from core.analysis_executor import run_analysis
+from core.claude_client import EXTRACTION_MODEL, get_claude_client
 
-load_dotenv()
-
-client = anthropic.Anthropic(api_key=os.getenv("CLAUDE_API_KEY"))
-
-TEXT_DIR = "../tenders"
 OUTPUT_EXCEL = "../tenders/claude_extracted.xlsx"
 MAX_FILES = 3
 MAX_TOKENS = 8000
+EXTRACTION_SYSTEM = "You are a procurement specialist analyzing Ukrainian tenders. Focus on PC AVK5 compliance and document requirements."
 
 # Columns required
 COLUMNS = [
@@ -24,86 +24,104 @@ COLUMNS = [
     "Timeline Feasibility", "Profitability Assessment", "Filename"
 ]
 
-def build_tender_text(tender_json):
-    title = tender_json.get("title", "")
-    description = tender_json.get("description", "")
-    issuer = tender_json.get("procuringEntity", {}).get("name", "")
-    address = tender_json.get("procuringEntity", {}).get("address", {})
-    location = f"{address.get('locality', '')}, {address.get('region', '')}".strip(", ")
-    budget = tender_json.get("value", {}).get("amount", "N/A")
-    currency = tender_json.get("value", {}).get("currency", "UAH")
-    deadline = tender_json.get("tenderPeriod", {}).get("endDate", "Not specified")
-
-    items = tender_json.get("items", [])
-    item_descriptions = [
-        f"- {item.get('description', '')} ({item.get('classification', {}).get('description', '')})"
-        for item in items
-    ]
-
-    tech_specs = []
-    for criterion in tender_json.get("criteria", []):
-        for group in criterion.get("requirementGroups", []):
-            for req in group.get("requirements", []):
-                title = req.get("title", "")
-                expected = req.get("expectedValues", []) or [req.get("expectedValue", "")]
-                if title:
-                    tech_specs.append(f"{title}: {', '.join(str(v) for v in expected if v)}")
-
+EXTRACTION_EXAMPLES = {
+    "title": '"..."',
+    "issuer": '"..."',
+    "deadline": '"..."',
+    "budget": '"..."',
+    "location": '"..."',
+    "project_type": '"..."',
+    "required_documents": '["doc1", "doc2", ...]',
+    "avk5_required": "true/false",
+    "technical_specs": '"..."',
+    "payment_terms": '"..."',
+    "resource_requirements": '"..."',
+    "timeline_feasibility": '"..."',
+    "profitability": '"..."',
+}
+
+
+def build_extraction_prompt(text, known=None):
+    """known: fields already taken from the ProZorro JSON, left out of the requested keys"""
+    keys = ",\n".join(f'  "{field}": {EXTRACTION_EXAMPLES[field]}' for field in inference_fields(known or {}))
+    context = ""
+    if known:
+        context = f"""
+Already taken from the ProZorro structured data (do not return these keys):
+{json.dumps(known, ensure_ascii=False)}
+"""
     return f"""
-Tender Title: {title}
-Issuer: {issuer}
-Location: {location}
-Budget: {budget} {currency}
-Deadline: {deadline}
-
-Goods/Services:
-{chr(10).join(item_descriptions)}
-
-Description:
-{description}
-
-Technical Requirements:
-{chr(10).join(tech_specs)}
-""".strip()
-
-def ask_claude(text):
-    prompt = f"""
 You are an expert in Ukrainian public procurement tenders. Analyze the tender text and extract the following information:
 
 [...omitted for brevity...]
-
-Return the result STRICTLY in JSON format with these keys:
+{context}
+Record the result with the record_tender_analysis tool, using these keys:
 {{
-  "title": "...",
-  "issuer": "...",
-  "deadline": "...",
-  "budget": "...",
-  "location": "...",
-  "project_type": "...",
-  "required_documents": ["doc1", "doc2", ...],
-  "avk5_required": true/false,
-  "technical_specs": "...",
-  "payment_terms": "...",
-  "resource_requirements": "...",
-  "timeline_feasibility": "...",
-  "profitability": "..."
+{keys}
 }}
 
 Tender Text:
 \"\"\"{text}\"\"\"
 """
 
-    response = client.messages.create(
-        model="claude-3-5-sonnet-20241022",
+
+def ask_claude(text):
+    return structured_completion(
+        get_claude_client(),
+        model=EXTRACTION_MODEL,
         max_tokens=1024,
         temperature=0.0,
-        system="You are a procurement specialist analyzing Ukrainian tenders. Focus on PC AVK5 compliance and document requirements.",
-        messages=[{"role": "user", "content": prompt}]
+        system=EXTRACTION_SYSTEM,
+        prompt=build_extraction_prompt(text),
+        tool=analysis_tool(),
+        label="ask_claude",
     )
-    
-    if response.content:
-        return ''.join(block.text for block in response.content if hasattr(block, 'text'))  # type: ignore
-    return ""
+
+
+def extraction_request(text, known=None):
+    """ask_claude's request, for the async executor"""
+    return {
+        "model": EXTRACTION_MODEL,
+        "system": EXTRACTION_SYSTEM,
+        "prompt": build_extraction_prompt(text, known),
+        "max_tokens": 1024,
+        "temperature": 0.0,
+        "tool": analysis_tool(inference_fields(known or {})),
+        "label": "ask_claude",
+    }
+
+
+def tender_extraction_request(tender_json):
+    """extraction_request for a stored ProZorro tender; its structured fields are not asked for"""
+    return extraction_request(build_tender_text(tender_json)[:MAX_TOKENS], structured_fields(tender_json))
+
+
+def parse_claude_json(result):
+    """Tool-call answer (its input, as JSON) as a dict, {} when there is none"""
+    try:
+        data = json.loads(result)
+    except (json.JSONDecodeError, TypeError):
+        return {}
+    return normalize_analysis(data) if isinstance(data, dict) else {}
+
+
+def extraction_row(parsed, filename):
+    return {
+        "Title": parsed.get("title", "Not extracted"),
+        "Issuer": parsed.get("issuer", "Not extracted"),
+        "Deadline": parsed.get("deadline", "Not specified"),
+        "Budget": parsed.get("budget", "Not specified"),
+        "Location": parsed.get("location", "Not specified"),
+        "Project Type": parsed.get("project_type", "Not specified"),
+        "Required Documents": parsed.get("required_documents", []),
+        "PC AVK5 Required": "Yes" if parsed.get("avk5_required") else "No",
+        "Technical Specifications": parsed.get("technical_specs", "Not specified"),
+        "Payment Terms": parsed.get("payment_terms", "Not specified"),
+        "Resource Requirements": parsed.get("resource_requirements", "Not specified"),
+        "Timeline Feasibility": parsed.get("timeline_feasibility", "Not assessed"),
+        "Profitability Assessment": parsed.get("profitability", "Not assessed"),
+        "Filename": filename
+    }
 
 def format_excel(file_path):
     wb = Workbook()
@@ -137,71 +155,73 @@ def save_to_excel(ws, row_data, row_counter):
         cell.border = Border(left=Side(style='thin'), right=Side(style='thin'), bottom=Side(style='thin'))
 
 # ✅ This function does the full bulk extraction
-def run_bulk_extraction():
+def run_bulk_extraction(use_batch=False, limit=MAX_FILES, batch_client=None, async_client=None,
+                        output_path=OUTPUT_EXCEL):
+    """
+    Extract every stored tender (up to limit; None for all) into output_path.
+    By default tenders are analysed concurrently by the async executor
+    (bounded concurrency and tokens per minute); with use_batch the whole
+    set goes out as one Message Batch instead. Both ask for a forced tool
+    call and re-ask the fields that fail validation. batch_client / async_client
+    override the Anthropic clients (e.g. ones pointed at a local fake).
+    """
     print("⏳ Starting tender extraction with Claude...")
     start_time = time.time()
 
-    wb, ws = format_excel(OUTPUT_EXCEL)
+    wb, ws = format_excel(output_path)
     row_counter = 2
     processed_count = 0
-
-    for filename in os.listdir(TEXT_DIR):
-        if not filename.endswith(".json") or processed_count >= MAX_FILES:
-            continue
-
-        filepath = os.path.join(TEXT_DIR, filename)
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                tender_json = json.load(f)
-
-            print(f"🔍 Processing ({processed_count+1}/{MAX_FILES}): {filename}")
-            text_for_claude = build_tender_text(tender_json)
-            result = ask_claude(text_for_claude[:MAX_TOKENS])
-
-            try:
-                parsed = json.loads(result)
-            except json.JSONDecodeError:
-                try:
-                    start_idx = result.find('{')
-                    end_idx = result.rfind('}') + 1
-                    parsed = json.loads(result[start_idx:end_idx]) if start_idx != -1 else {}
-                except:
-                    parsed = {}
-
-            row_data = {
-                "Title": parsed.get("title", "Not extracted"),
-                "Issuer": parsed.get("issuer", "Not extracted"),
-                "Deadline": parsed.get("deadline", "Not specified"),
-                "Budget": parsed.get("budget", "Not specified"),
-                "Location": parsed.get("location", "Not specified"),
-                "Project Type": parsed.get("project_type", "Not specified"),
-                "Required Documents": parsed.get("required_documents", []),
-                "PC AVK5 Required": "Yes" if parsed.get("avk5_required") else "No",
-                "Technical Specifications": parsed.get("technical_specs", "Not specified"),
-                "Payment Terms": parsed.get("payment_terms", "Not specified"),
-                "Resource Requirements": parsed.get("resource_requirements", "Not specified"),
-                "Timeline Feasibility": parsed.get("timeline_feasibility", "Not assessed"),
-                "Profitability Assessment": parsed.get("profitability", "Not assessed"),
-                "Filename": filename
-            }
-
+    tenders = get_tender_store().iter_tenders(limit=limit)
+
+    if use_batch:
+        requests, filenames, known = [], {}, {}
+        for tender_json in tenders:
+            filenames[tender_json["id"]] = f"ProZorro_{tender_json['id']}.json"
+            known[tender_json["id"]] = structured_fields(tender_json)
+            request = tender_extraction_request(tender_json)
+            requests.append(batch_request(
+                tender_json["id"], EXTRACTION_MODEL, request["prompt"],
+                max_tokens=1024, system=EXTRACTION_SYSTEM, tool=request["tool"],
+            ))
+        answers = run_structured_batch(batch_client or get_claude_client(), requests, label="ask_claude_batch")
+        for tender_id, filename in filenames.items():
+            parsed = answers.get(tender_id)
+            if parsed is None:
+                row_data = {col: "ERROR" for col in COLUMNS}
+                row_data["Filename"] = filename
+            else:
+                row_data = extraction_row(with_structured_fields(parsed, known[tender_id]), filename)
+                processed_count += 1
             save_to_excel(ws, row_data, row_counter)
             row_counter += 1
-            processed_count += 1
-            time.sleep(1.5)
-
-        except Exception as e:
-            print(f"❌ Error processing {filename}: {str(e)}")
-            row_data = {col: "ERROR" for col in COLUMNS}
-            row_data["Filename"] = filename
+    else:
+        stored = {f"ProZorro_{tender_json['id']}.json": tender_json for tender_json in tenders}
+
+        def report(filename, parsed, done, total):
+            print(f"🔍 Processed ({done}/{total}): {filename}")
+
+        # Forced tool calls, re-asked on invalid fields; EXTRACTION_MODEL only, no cascade
+        results = run_analysis(stored.items(), client=async_client, on_result=report,
+                               build_request=tender_extraction_request, parse=parse_claude_json, split=None,
+                               fast_model=None)
+        for filename, tender_json in stored.items():
+            parsed = results.get(filename) or {}
+            if "error" in parsed:
+                print(f"❌ Error processing {filename}: {parsed['error']}")
+                row_data = {col: "ERROR" for col in COLUMNS}
+                row_data["Filename"] = filename
+            else:
+                row_data = extraction_row(with_structured_fields(parsed, structured_fields(tender_json)), filename)
+                processed_count += 1
             save_to_excel(ws, row_data, row_counter)
             row_counter += 1
 
     try:
-        wb.save(OUTPUT_EXCEL)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        wb.save(output_path)
         proc_time = time.time() - start_time
         print(f"\n✅ Processed {processed_count} tenders")
-        print(f"💾 Excel saved to: {OUTPUT_EXCEL}")
+        print(f"💾 Excel saved to: {output_path}")
         print(f"⏱️ Time: {proc_time:.2f}s | ⏳ Avg per tender: {proc_time/processed_count if processed_count else 0:.2f}s")
     except Exception as e:
         print(f"❌ Failed to save Excel: {str(e)}")
@@ -210,4 +230,9 @@ def run_bulk_extraction():
 
 # 🧪 Allow running manually
 if __name__ == "__main__":
-    run_bulk_extraction()
+    import sys
+
+    if "--batch" in sys.argv:
+        run_bulk_extraction(use_batch=True, limit=None)
+    else:
+        run_bulk_extraction()
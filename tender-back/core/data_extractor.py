@@ -1,35 +1,141 @@
 import os
-import fitz
-import pandas as pd
 import pathlib
+import tempfile
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+import fitz
+
+# Copy of every extracted text as a .txt side file; unset to skip writing them
+PDF_TEXT_DIR = os.getenv("PDF_TEXT_DIR") or None
+PDF_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Smaller documents are read in-process: shipping page ranges to the pool costs more than it saves
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "48"))
+# Page ranges per worker, so one slow (image-heavy) range does not hold up the rest
+RANGES_PER_WORKER = 2
+# Upper bound on a range, so iter_pdf_pages hands out its first pages early; also how
+# often the MuPDF object store is emptied
+PDF_RANGE_PAGES = int(os.getenv("PDF_RANGE_PAGES", "16"))
+
+
+@lru_cache(maxsize=None)
+def get_pdf_pool(workers=PDF_WORKERS):
+    """Process pool kept for the life of the process; spawn, since the servers run threads"""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
 
-TENDER_DIR = "C:/Users/tashmatov/tender/uploaded/"
-TEXT_DIR = "C:/Users/tashmatov/tender/extracted/"
-os.makedirs(TEXT_DIR, exist_ok=True)
+def extract_page_range(path, start, stop):
+    """Text of pages [start, stop) of the PDF at path"""
+    with fitz.open(path) as doc:
+        pages = [doc[page_num].get_text("text") for page_num in range(start, stop)]
+    fitz.TOOLS.store_shrink(100)
+    return pages
 
 
-def extract_text_from_pdf(input_pdf) -> str:
+def page_ranges(page_count, parts):
+    step = -(-page_count // parts)
+    return [(start, min(page_count, start + step)) for start in range(0, page_count, step)]
+
+
+def iter_pages(path, doc, workers=PDF_WORKERS):
     """
-    Extracts text from a PDF file using PyMuPDF (fitz).
-    Accepts either file path (str) or bytes.
+    Page texts of doc (opened from path) in order, as they are read. Long
+    documents are read by the pool, with at most workers * RANGES_PER_WORKER
+    page ranges in flight, so memory stays bounded however many pages there are.
+    """
+    page_count = doc.page_count
+    if workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+        for page_num, page in enumerate(doc, start=1):
+            yield page.get_text("text")
+            if page_num % PDF_RANGE_PAGES == 0:
+                # MuPDF caches fonts and images of every page read; without this RSS grows with the pack
+                fitz.TOOLS.store_shrink(100)
+        return
+    window = workers * RANGES_PER_WORKER
+    ranges = page_ranges(page_count, max(window, -(-page_count // PDF_RANGE_PAGES)))
+    pending = deque()
+    done = 0
+    try:
+        pool = get_pdf_pool(workers)
+        for start, stop in ranges:
+            pending.append(pool.submit(extract_page_range, path, start, stop))
+            if len(pending) >= window:
+                for text in pending.popleft().result():
+                    done += 1
+                    yield text
+        while pending:
+            for text in pending.popleft().result():
+                done += 1
+                yield text
+    except BrokenProcessPool:
+        print("⚠️ PDF worker pool broke, extracting in-process")
+        get_pdf_pool.cache_clear()
+        for page_num in range(done, page_count):
+            yield doc[page_num].get_text("text")
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def iter_pdf_pages(input_pdf, workers=PDF_WORKERS):
     """
+    Generator over the page texts of a PDF (path or bytes) as soon as each
+    page is read, for consumers that can start before the last page.
+    """
+    temp_path = None
     if isinstance(input_pdf, str):
         if not os.path.exists(input_pdf):
             raise FileNotFoundError(f"❌ PDF not found at: {input_pdf}")
-        doc = fitz.open(input_pdf)
+        path = input_pdf
+    else:
+        # Assume it's bytes; the workers open it from a temporary file
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+            tmp.write(input_pdf)
+            temp_path = path = tmp.name
+    try:
+        with fitz.open(path) as doc:
+            yield from iter_pages(path, doc, workers)
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+
+def join_pages(pages):
+    """
+    (text, offsets): the page texts joined by newlines and stripped, and
+    the character offset in text at which each page starts.
+    """
+    offsets, position = [], 0
+    for page in pages:
+        offsets.append(position)
+        position += len(page) + 1
+    joined = "\n".join(pages)
+    text = joined.lstrip()
+    lead = len(joined) - len(text)
+    text = text.rstrip()
+    return text, [min(len(text), max(0, offset - lead)) for offset in offsets]
+
+
+def extract_text_from_pdf(input_pdf, with_offsets=False, text_dir=PDF_TEXT_DIR, workers=PDF_WORKERS):
+    """
+    Extracts text from a PDF file using PyMuPDF (fitz).
+    Accepts either file path (str) or bytes. Long documents are read by a
+    process pool, page ranges in parallel. Returns the text, or (text,
+    page start offsets) with with_offsets. The text is also saved to
+    text_dir when one is configured.
+    """
+    if isinstance(input_pdf, str):
         filename = os.path.basename(input_pdf).replace(".pdf", ".txt")
     else:
-        # Assume it's bytes
-        doc = fitz.open(stream=input_pdf, filetype="pdf")
         filename = "extracted_from_bytes.txt"
+    pages = list(iter_pdf_pages(input_pdf, workers))
+    text, offsets = join_pages(pages)
 
-    full_text = ""
-    for page_num, page in enumerate(doc):  # type: ignore
-        text = page.get_text("text")
-        print(f"Page {page_num+1} text:\n{text}")
-        full_text += text + "\n"
-
-    txt_path = os.path.join(TEXT_DIR, filename)
-    pathlib.Path(txt_path).write_text(full_text, encoding="utf-8")
+    if text_dir:
+        os.makedirs(text_dir, exist_ok=True)
+        pathlib.Path(os.path.join(text_dir, filename)).write_text(text, encoding="utf-8")
 
-    return full_text.strip()
+    return (text, offsets) if with_offsets else text
@@ -1,106 +1,335 @@
 import os
 import json
-import time
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import xml.etree.ElementTree as ET
-from urllib.parse import urlencode
 from dotenv import load_dotenv
 
+load_dotenv()
+
+from core.prozorro_client import get_prozorro_client  # noqa: E402
+from core.tender_store import get_tender_store  # noqa: E402
+from core.topic_matcher import get_topic_matcher  # noqa: E402
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-PROZORRO_API_URL = "https://public.api.openprocurement.org/api/2.4/tenders"
-OUTPUT_DIR = "../tenders"
+SYNC_STATE_PATH = os.path.join(BASE_DIR, "../data/sync_state.json")
 MAX_RESULTS = 3
-RATE_LIMIT_DELAY = 1.5
+# Listing entries checked per download; cheap now that the topic match runs on feed pages
+MAX_CHECKED = 5000
+# Fields requested on feed pages so the topic match can run without a full GET
+LISTING_OPT_FIELDS = ("title", "description", "classification", "dateModified", "value")
+MAX_WORKERS = int(os.getenv("PROZORRO_MAX_WORKERS", "8"))
 
-load_dotenv()
 
-def setup_environment():
-    """Create output directory if it doesn't exist"""
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    print(f"📁 Output directory created: {OUTPUT_DIR}")
-def download_prozorro_tenders(topic=None, total_to_download=1, days_back=None):
+def fetch_tender_details(tender_ids, client, executor):
     """
-    Download tenders from ProZorro API based on tender topic (using keywords.json)
+    Fetch full tender documents concurrently.
+    Yields (tender_id, tender_data, error) in the order of tender_ids; the
+    caller may stop iterating early, pending requests are then cancelled.
     """
-    print(f"🔍 Downloading tenders for topic: {topic}")
+    futures = [(tender_id, executor.submit(client.get_tender, tender_id)) for tender_id in tender_ids]
+    try:
+        for tender_id, future in futures:
+            try:
+                yield tender_id, future.result(), None
+            except Exception as e:
+                yield tender_id, None, e
+    finally:
+        for _, future in futures:
+            future.cancel()
 
-    # Load topic keywords
-    keywords_path = os.path.join(BASE_DIR, "../data/keywords.json")
-    if not os.path.exists(keywords_path):
-        raise FileNotFoundError("❌ keywords.json not found!")
 
-    with open(keywords_path, "r", encoding="utf-8") as f:
-        topic_keywords = json.load(f).get(topic, [])
-    
-    if not topic_keywords:
+def load_topic_matcher(topic):
+    """Shared keywords.json matcher, checked to know the topic"""
+    matcher = get_topic_matcher()
+    if not matcher.topic_keywords.get(topic):
         raise ValueError(f"❌ No keywords found for topic '{topic}' in keywords.json")
+    return matcher
+
+
+def tender_match_text(tender_data):
+    """Works on both full tenders and opt_fields feed entries"""
+    cpv = (tender_data.get("classification") or {}).get("description", "")
+    return " ".join((tender_data.get("title", ""), tender_data.get("description", ""), cpv))
+
+
+def matches_topic(tender_data, topic, matcher):
+    return matcher.matches(tender_match_text(tender_data), topic)
+
+
+def has_listing_fields(entry):
+    """False when the API ignored opt_fields and the entry is only id + dateModified"""
+    return "title" in entry or "description" in entry
+
+
+def prefilter_ids(entries, topic, matcher):
+    """IDs from a feed page that need a full GET"""
+    return [
+        entry["id"] for entry in entries
+        if not has_listing_fields(entry) or matches_topic(entry, topic, matcher)
+    ]
+
+
+def tender_summary(tender_data):
+    return {
+        "id": tender_data["id"],
+        "title": tender_data.get("title", "Без назви"),
+        "date": tender_data.get("dateModified", ""),
+        "budget": tender_data.get("value", {}).get("amount", 0),
+        "file": f"ProZorro_{tender_data['id']}.json"
+    }
+
+
+def save_tenders(store, tenders):
+    """Bulk upsert one page worth of matched tenders into the tender store"""
+    if tenders:
+        store.upsert_many(tenders)
+        print(f"✅ Saved {len(tenders)} tenders")
+    return [tender_summary(t) for t in tenders]
+
+
+def download_prozorro_tenders(topic=None, total_to_download=1, days_back=None,
+                              max_workers=MAX_WORKERS, stats=None, store=None, client=None, progress=None):
+    """
+    Download tenders from ProZorro API based on tender topic (using the keywords.json topic matcher).
+    Walks the feed newest-first by following next_page.offset and runs the
+    topic match on the opt_fields listing, so only matching tenders are
+    fetched in full. Details are fetched by a bounded thread pool through the
+    shared ProZorro client (pooled session, retries, process-wide rate limit).
+    Matches are bulk-upserted into the tender store page by page.
+    If a stats dict is passed it receives checked/fetched/matched counts;
+    progress, if given, is called with the same counts after every page.
+    """
+    print(f"🔍 Downloading tenders for topic: {topic}")
+    matcher = load_topic_matcher(topic)
+    store = store or get_tender_store()
+    client = client or get_prozorro_client()
 
-    setup_environment()
-    
     downloaded = []
-    offset_time = datetime.now()
+    offset = None
     checked = 0
+    fetched = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while len(downloaded) < total_to_download and checked < MAX_CHECKED:
+            try:
+                tenders, next_offset = client.feed_page(offset, descending=True, opt_fields=LISTING_OPT_FIELDS)
+                if not tenders:
+                    print("🚫 No more tenders found.")
+                    break
 
-    while len(downloaded) < total_to_download and checked < 500:
-        params = {
-            "descending": 1,
-            "limit": 100,
-            "offset": offset_time.strftime("%Y-%m-%dT%H:%M:%S")
-        }
-
-        try:
-            response = requests.get(PROZORRO_API_URL, params=params)
-            response.raise_for_status()
-            tenders = response.json().get("data", [])
-            if not tenders:
-                print("🚫 No more tenders found.")
+                tenders = tenders[:MAX_CHECKED - checked]
+                checked += len(tenders)
+                tender_ids = prefilter_ids(tenders, topic, matcher)
+                matched = []
+                for tender_id, tender_data, error in fetch_tender_details(tender_ids, client, executor):
+                    fetched += 1
+                    if error is not None:
+                        print(f"⚠️ Error for {tender_id}: {error}")
+                        continue
+
+                    if matches_topic(tender_data, topic, matcher):
+                        matched.append(tender_data)
+                        if len(downloaded) + len(matched) >= total_to_download:
+                            break
+                downloaded.extend(save_tenders(store, matched))
+                if progress:
+                    progress({"checked": checked, "fetched": fetched, "matched": len(downloaded), "saved": len(downloaded)})
+
+                if not next_offset or next_offset == offset:
+                    break
+                offset = next_offset
+
+            except Exception as e:
+                print(f"❌ API error: {e}")
                 break
 
-            for tender in tenders:
-                tender_id = tender["id"]
-                try:
-                    tender_url = f"{PROZORRO_API_URL}/{tender_id}"
-                    tender_response = requests.get(tender_url)
-                    tender_response.raise_for_status()
-                    tender_data = tender_response.json()["data"]
-
-                    title = tender_data.get("title", "").lower()
-                    description = tender_data.get("description", "").lower()
-
-                    # Check if any keyword matches
-                    if any(kw.lower() in title or kw.lower() in description for kw in topic_keywords):
-                        filename = f"ProZorro_{tender_id}.json"
-                        filepath = os.path.join(OUTPUT_DIR, filename)
-
-                        with open(filepath, "w", encoding="utf-8") as f:
-                            json.dump(tender_data, f, ensure_ascii=False, indent=2)
-
-                        downloaded.append({
-                            "id": tender_id,
-                            "title": tender_data.get("title", "Без назви"),
-                            "date": tender_data.get("dateModified", ""),
-                            "budget": tender_data.get("value", {}).get("amount", 0),
-                            "file": filename
-                        })
-                        print(f"✅ Saved: {filename}")
-
-                        if len(downloaded) >= total_to_download:
+    print(f"\n💾 Total downloaded tenders: {len(downloaded)} for topic: {topic} ({checked} checked, {fetched} fetched)")
+    if stats is not None:
+        stats.update({"checked": checked, "fetched": fetched, "matched": len(downloaded)})
+    return downloaded
+
+
+def resolve_topics(topics, matcher):
+    """Requested topics checked against keywords.json; None or empty means all of them"""
+    if not topics:
+        return [topic for topic in matcher.topics if matcher.topic_keywords[topic]]
+    unknown = [topic for topic in topics if not matcher.topic_keywords.get(topic)]
+    if unknown:
+        raise ValueError(f"❌ No keywords found for topics {unknown} in keywords.json")
+    return list(dict.fromkeys(topics))
+
+
+def route_topics(tender_data, topics, matcher):
+    """Topics from the requested set that a tender (or feed entry) matches"""
+    hits = matcher.classify(tender_match_text(tender_data))
+    return [topic for topic in topics if hits.get(topic)]
+
+
+def ingest_prozorro_topics(topics=None, total_to_download=1, days_back=None,
+                           max_workers=MAX_WORKERS, stats=None, store=None, client=None, progress=None):
+    """
+    Download tenders for several topics with a single feed scan.
+    Same walk as download_prozorro_tenders, but every listing entry is
+    classified against all requested topics at once (all of keywords.json
+    when topics is None) and a tender matching several topics is fetched
+    and stored once, then routed to each of them. Stops when every topic
+    has total_to_download tenders or after MAX_CHECKED entries.
+    Returns {topic: [tender summaries]}.
+    """
+    matcher = get_topic_matcher()
+    topics = resolve_topics(topics, matcher)
+    print(f"🔍 Downloading tenders for topics: {', '.join(topics)}")
+    store = store or get_tender_store()
+    client = client or get_prozorro_client()
+
+    routed = {topic: [] for topic in topics}
+    offset = None
+    checked = 0
+    fetched = 0
+    saved = 0
+
+    def open_topics():
+        return [topic for topic in topics if len(routed[topic]) < total_to_download]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while open_topics() and checked < MAX_CHECKED:
+            try:
+                tenders, next_offset = client.feed_page(offset, descending=True, opt_fields=LISTING_OPT_FIELDS)
+                if not tenders:
+                    print("🚫 No more tenders found.")
+                    break
+
+                tenders = tenders[:MAX_CHECKED - checked]
+                checked += len(tenders)
+                wanted = open_topics()
+                tender_ids = [
+                    entry["id"] for entry in tenders
+                    if not has_listing_fields(entry) or route_topics(entry, wanted, matcher)
+                ]
+                matched = []
+                for tender_id, tender_data, error in fetch_tender_details(tender_ids, client, executor):
+                    fetched += 1
+                    if error is not None:
+                        print(f"⚠️ Error for {tender_id}: {error}")
+                        continue
+
+                    tender_topics = route_topics(tender_data, open_topics(), matcher)
+                    if tender_topics:
+                        matched.append(tender_data)
+                        summary = tender_summary(tender_data)
+                        for topic in tender_topics:
+                            routed[topic].append(summary)
+                        if not open_topics():
                             break
+                saved += len(save_tenders(store, matched))
+                if progress:
+                    progress({"checked": checked, "fetched": fetched, "matched": sum(map(len, routed.values())), "saved": saved})
+
+                if not next_offset or next_offset == offset:
+                    break
+                offset = next_offset
+
+            except Exception as e:
+                print(f"❌ API error: {e}")
+                break
 
-                    checked += 1
-                    time.sleep(RATE_LIMIT_DELAY)
+    counts = ", ".join(f"{topic}: {len(found)}" for topic, found in routed.items())
+    print(f"\n💾 Saved {saved} tenders in one scan ({counts}; {checked} checked, {fetched} fetched)")
+    if stats is not None:
+        stats.update({"checked": checked, "fetched": fetched, "matched": sum(map(len, routed.values())), "saved": saved})
+    return routed
 
-                except Exception as e:
-                    print(f"⚠️ Error for {tender_id}: {e}")
+
+def load_sync_state(path=SYNC_STATE_PATH):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_sync_state(state, path=SYNC_STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def sync_prozorro_tenders(topic=None, days_back=1, max_pages=None, state_path=SYNC_STATE_PATH,
+                          max_workers=MAX_WORKERS, stats=None, store=None, client=None, progress=None):
+    """
+    Incremental, resumable sync for one topic.
+    Follows the feed oldest-first from the saved next_page.offset cursor (or
+    from now - days_back on the first run), fetches only tenders that pass
+    the listing topic match and whose dateModified differs from the stored
+    revision, and checkpoints the cursor and the ids to retry after every
+    page, so an interrupted run resumes where it stopped. progress, if
+    given, is called with checked/fetched/matched counts after every page.
+    """
+    print(f"🔄 Syncing tenders for topic: {topic}")
+    matcher = load_topic_matcher(topic)
+    store = store or get_tender_store()
+    client = client or get_prozorro_client()
+
+    state = load_sync_state(state_path)
+    topic_state = state.setdefault(topic, {"offset": None})
+    # State files written before the cursor-only format kept every id ever read
+    topic_state.pop("seen", None)
+    offset = topic_state["offset"]
+    if offset is None:
+        offset = (datetime.now() - timedelta(days=days_back or 1)).isoformat()
+    # Tenders that failed to fetch last time sit behind the cursor already
+    retry = {tender_id: None for tender_id in topic_state.get("retry", [])}
+    topic_state["retry"] = []
+
+    downloaded = []
+    checked = 0
+    fetched = 0
+    pages = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while max_pages is None or pages < max_pages:
+            try:
+                tenders, next_offset = client.feed_page(offset, opt_fields=LISTING_OPT_FIELDS)
+            except Exception as e:
+                print(f"❌ API error: {e}")
+                topic_state["retry"].extend(retry)
+                save_sync_state(state, state_path)
+                break
+            pages += 1
+            checked += len(tenders)
+
+            # The cursor only moves forward, so a tender shows up again only when it
+            # changed or on overlapping pages; the store tells the two apart
+            wanted = {t["id"]: t.get("dateModified") for t in tenders}
+            wanted = {tender_id: wanted[tender_id] for tender_id in prefilter_ids(tenders, topic, matcher)}
+            stored = store.date_modified(wanted)
+            changed = {tender_id: modified for tender_id, modified in wanted.items()
+                       if modified is None or stored.get(tender_id) != modified}
+            changed.update(retry)
+            retry = {}
+            matched = []
+            for tender_id, tender_data, error in fetch_tender_details(list(changed), client, executor):
+                fetched += 1
+                if error is not None:
+                    print(f"⚠️ Error for {tender_id}: {error}")
+                    topic_state["retry"].append(tender_id)
                     continue
+                if matches_topic(tender_data, topic, matcher):
+                    matched.append(tender_data)
+            downloaded.extend(save_tenders(store, matched))
+            if progress:
+                progress({"checked": checked, "fetched": fetched, "matched": len(downloaded), "saved": len(downloaded)})
 
-            # Update offset to last tender timestamp
-            offset_time -= timedelta(minutes=10)
+            if next_offset:
+                topic_state["offset"] = next_offset
+            save_sync_state(state, state_path)
 
-        except Exception as e:
-            print(f"❌ API error: {e}")
-            break
+            if not tenders or not next_offset or next_offset == offset:
+                break
+            offset = next_offset
 
-    print(f"\n💾 Total downloaded tenders: {len(downloaded)} for topic: {topic}")
+    print(f"\n💾 Synced {len(downloaded)} changed tenders for topic: {topic} ({checked} checked, {fetched} fetched, {pages} pages)")
+    if stats is not None:
+        stats.update({"checked": checked, "fetched": fetched, "matched": len(downloaded)})
     return downloaded
@@ -3,7 +3,9 @@ from io import BytesIO
 from typing import Dict, Optional
 import os
 import json
-from core.claude_client import get_claude_client
+from core.claude_client import TEMPLATE_MODEL, get_claude_client
+from core.llm_cache import cached_completion
+from core.model_cascade import run_cascade
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TEMPLATE_FOLDER = os.path.join(BASE_DIR, "../templates")
@@ -25,14 +27,22 @@ def autofill_placeholders(template_name: str, tender_result: dict) -> dict:
     Поверніть тільки JSON-об'єкт, де ключі — це назви плейсхолдерів у шаблоні (наприклад: <Tender Title>), а значення — відповідні текстові вставки.
     """
 
-    try:
-        response = client.messages.create(
-            model="claude-3-opus-20240229",
+    def call(model, label):
+        return json.loads(cached_completion(
+            client,
+            model=model,
             max_tokens=500,
             temperature=0.2,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return json.loads(response.content[0].text)
+            prompt=prompt,
+            label=label,
+        ))
+
+    def check(values):
+        return None if isinstance(values, dict) and values else "missing:placeholders"
+
+    try:
+        # Fast model first; TEMPLATE_MODEL only when its answer is unusable
+        return run_cascade("autofill_placeholders", call, check, large_model=TEMPLATE_MODEL)
     except Exception as e:
         print("❌ Claude response parsing failed:", e)
         return {}
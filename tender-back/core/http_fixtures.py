@@ -0,0 +1,350 @@
+import io
+import os
+import json
+import time
+import base64
+import random
+import asyncio
+import hashlib
+import threading
+from http.client import responses
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3 import HTTPResponse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# "record": real calls, every exchange appended to the fixtures; "replay": no network, answers come
+# from the fixtures; unset: plain HTTP
+HTTP_FIXTURES_MODE = os.getenv("HTTP_FIXTURES_MODE", "").lower()
+HTTP_FIXTURES_DIR = os.getenv("HTTP_FIXTURES_DIR", os.path.join(BASE_DIR, "../data/http_fixtures"))
+# Replay latency: fixed seconds, or unset for the recorded time times REPLAY_LATENCY_SCALE
+REPLAY_LATENCY = os.getenv("REPLAY_LATENCY") or None
+REPLAY_LATENCY_SCALE = float(os.getenv("REPLAY_LATENCY_SCALE", "1"))
+# ± share of the latency added at random
+REPLAY_JITTER = float(os.getenv("REPLAY_JITTER", "0"))
+# Share of requests answered with REPLAY_ERROR_STATUS (0: a dropped connection) instead
+REPLAY_ERROR_RATE = float(os.getenv("REPLAY_ERROR_RATE", "0"))
+REPLAY_ERROR_STATUS = int(os.getenv("REPLAY_ERROR_STATUS", "503"))
+REPLAY_SEED = os.getenv("REPLAY_SEED", "0")
+
+# Not kept: the stored body is already decoded and sized anew on replay
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+
+class FixtureNotFound(LookupError):
+    """A replayed request that was never recorded"""
+
+
+def canonical_body(body):
+    """Request body as text, JSON with sorted keys so dict order does not matter"""
+    if body is None:
+        return ""
+    if isinstance(body, bytes):
+        try:
+            body = body.decode("utf-8")
+        except UnicodeDecodeError:
+            return "sha256:" + hashlib.sha256(body).hexdigest()
+    try:
+        return json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    except ValueError:
+        return body
+
+
+def request_target(url):
+    """Path and sorted query of url; the host is left out so fixtures replay under any base URL"""
+    parts = urlsplit(str(url))
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return parts.path + (f"?{query}" if query else "")
+
+
+def request_key(method, url, body=None):
+    text = f"{method.upper()} {request_target(url)}\n{canonical_body(body)}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def encode_body(content):
+    try:
+        return content.decode("utf-8"), "utf-8"
+    except UnicodeDecodeError:
+        return base64.b64encode(content).decode("ascii"), "base64"
+
+
+def decode_body(exchange):
+    if exchange["encoding"] == "base64":
+        return base64.b64decode(exchange["body"])
+    return exchange["body"].encode("utf-8")
+
+
+class FixtureStore:
+    """
+    Recorded HTTP exchanges of one service in a JSONL file, one line per
+    exchange: the request (method, path and query, canonical body) and the
+    response (status, headers, decoded body, seconds it took). Requests are
+    matched on sha256 of the request part; a request recorded several times
+    (a revalidated tender, a retried call) replays its answers in the
+    recorded order and then keeps repeating the last one.
+    """
+
+    def __init__(self, path, mode="replay"):
+        self.path = path
+        self.mode = mode
+        self._exchanges = {}
+        self._served = {}
+        self._lock = threading.Lock()
+        if mode == "record":
+            # A recording starts from scratch, so replays never mix two sessions
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            open(path, "w", encoding="utf-8").close()
+        elif os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        exchange = json.loads(line)
+                        self._exchanges.setdefault(exchange["key"], []).append(exchange)
+
+    def record(self, method, url, request_body, status, headers, content, seconds):
+        body, encoding = encode_body(content)
+        exchange = {
+            "key": request_key(method, url, request_body),
+            "method": method.upper(),
+            "target": request_target(url),
+            "request": canonical_body(request_body),
+            "status": status,
+            "headers": {name: value for name, value in headers.items() if name.lower() not in DROPPED_HEADERS},
+            "body": body,
+            "encoding": encoding,
+            "seconds": round(seconds, 4),
+        }
+        with self._lock:
+            self._exchanges.setdefault(exchange["key"], []).append(exchange)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(exchange, ensure_ascii=False) + "\n")
+
+    def next_call(self, key):
+        """Number of earlier requests with key (injected errors included)"""
+        with self._lock:
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+            return served
+
+    def exchange(self, key, call, method, url):
+        exchanges = self._exchanges.get(key)
+        if not exchanges:
+            raise FixtureNotFound(f"❌ No recorded response for {method.upper()} {request_target(url)} in {self.path}")
+        return exchanges[min(call, len(exchanges) - 1)]
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(exchanges) for exchanges in self._exchanges.values())
+
+
+class ReplayConditions:
+    """
+    Synthetic network for replay: latency per response (fixed, or the
+    recorded time scaled, with optional jitter) and a share of requests
+    failing with an error status or a dropped connection. Both are drawn
+    from a generator seeded by the request and its call number, so a run
+    sees the same slow and failing requests whatever the thread schedule.
+    """
+
+    def __init__(self, latency=REPLAY_LATENCY, latency_scale=REPLAY_LATENCY_SCALE, jitter=REPLAY_JITTER,
+                 error_rate=REPLAY_ERROR_RATE, error_status=REPLAY_ERROR_STATUS, seed=REPLAY_SEED):
+        self.latency = float(latency) if latency is not None else None
+        self.latency_scale = latency_scale
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.seed = seed
+
+    def _random(self, key, call):
+        return random.Random(f"{self.seed}:{key}:{call}")
+
+    def delay(self, key, call, exchange=None):
+        base = self.latency if self.latency is not None else (exchange or {}).get("seconds", 0) * self.latency_scale
+        if self.jitter:
+            base *= 1 + self.jitter * self._random(key, call).uniform(-1, 1)
+        return max(0.0, base)
+
+    def fails(self, key, call):
+        return self.error_rate > 0 and self._random(f"error:{key}", call).random() < self.error_rate
+
+
+@lru_cache(maxsize=None)
+def _fixture_store(service, directory, mode):
+    return FixtureStore(os.path.join(directory, f"{service}.jsonl"), mode)
+
+
+def get_fixture_store(service, directory=HTTP_FIXTURES_DIR, mode=None):
+    """Fixtures of service ("prozorro", "claude"), shared by every client of the process"""
+    return _fixture_store(service, directory, mode or HTTP_FIXTURES_MODE or "replay")
+
+
+class RecordingAdapter(HTTPAdapter):
+    """HTTPAdapter that appends every exchange to a FixtureStore (streamed bodies are read in full first)"""
+
+    def __init__(self, store, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        content = response.content
+        self.store.record(request.method, request.url, request.body, response.status_code,
+                          response.headers, content, time.perf_counter() - start)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """requests transport adapter answering from a FixtureStore under ReplayConditions, no sockets opened"""
+
+    def __init__(self, store, conditions=None):
+        super().__init__()
+        self.store = store
+        self.conditions = conditions or ReplayConditions()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        key = request_key(request.method, request.url, request.body)
+        call = self.store.next_call(key)
+        if self.conditions.fails(key, call):
+            time.sleep(self.conditions.delay(key, call))
+            if not self.conditions.error_status:
+                raise requests.ConnectionError(f"Injected connection error: {request.method} {request.url}",
+                                               request=request)
+            return self.build_response(request, self.conditions.error_status, {"Retry-After": "0"}, b"")
+        exchange = self.store.exchange(key, call, request.method, request.url)
+        time.sleep(self.conditions.delay(key, call, exchange))
+        return self.build_response(request, exchange["status"], exchange["headers"], decode_body(exchange))
+
+    def build_response(self, request, status, headers, content):
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response.raw = HTTPResponse(body=io.BytesIO(content), status=status, headers=headers, preload_content=False)
+        response.url = request.url
+        response.request = request
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.reason = responses.get(status, "")
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
+
+
+def mount_fixtures(session, service, mode=None, directory=HTTP_FIXTURES_DIR, conditions=None, **adapter_options):
+    """
+    Route session through the fixtures of service: recording or replaying
+    per mode (HTTP_FIXTURES_MODE by default), untouched when neither.
+    adapter_options (pool sizes) go to the recording HTTPAdapter.
+    """
+    mode = mode or HTTP_FIXTURES_MODE
+    if mode not in ("record", "replay"):
+        return session
+    store = get_fixture_store(service, directory, mode)
+    if mode == "record":
+        adapter = RecordingAdapter(store, **adapter_options)
+    else:
+        adapter = ReplayAdapter(store, conditions)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def httpx_transports(store, mode, conditions=None):
+    """
+    (sync, async) httpx transports for the Anthropic SDK, recording or
+    replaying like the requests adapters above. SDK retries apply to the
+    injected errors as they would to real ones.
+    """
+    import httpx
+
+    conditions = conditions or ReplayConditions()
+
+    def replay_exchange(request, body):
+        """(key, call, recorded exchange or None for an injected error)"""
+        key = request_key(request.method, request.url, body)
+        call = store.next_call(key)
+        if conditions.fails(key, call):
+            return key, call, None
+        return key, call, store.exchange(key, call, request.method, request.url)
+
+    def replayed(request, exchange):
+        if exchange is None:
+            if not conditions.error_status:
+                raise httpx.ConnectError("Injected connection error", request=request)
+            return httpx.Response(conditions.error_status, headers={"Retry-After": "0"}, request=request)
+        return httpx.Response(exchange["status"], headers=exchange["headers"], content=decode_body(exchange),
+                              request=request)
+
+    class Transport(httpx.BaseTransport):
+        def __init__(self):
+            self.inner = httpx.HTTPTransport() if mode == "record" else None
+
+        def handle_request(self, request):
+            body = request.read()
+            if mode == "record":
+                start = time.perf_counter()
+                response = self.inner.handle_request(request)
+                content = response.read()
+                store.record(request.method, request.url, body, response.status_code, response.headers,
+                             content, time.perf_counter() - start)
+                return httpx.Response(response.status_code, headers=response.headers, content=content,
+                                      request=request)
+            key, call, exchange = replay_exchange(request, body)
+            time.sleep(conditions.delay(key, call, exchange))
+            return replayed(request, exchange)
+
+        def close(self):
+            if self.inner is not None:
+                self.inner.close()
+
+    class AsyncTransport(httpx.AsyncBaseTransport):
+        def __init__(self):
+            self.inner = httpx.AsyncHTTPTransport() if mode == "record" else None
+
+        async def handle_async_request(self, request):
+            body = await request.aread()
+            if mode == "record":
+                start = time.perf_counter()
+                response = await self.inner.handle_async_request(request)
+                content = await response.aread()
+                store.record(request.method, request.url, body, response.status_code, response.headers,
+                             content, time.perf_counter() - start)
+                return httpx.Response(response.status_code, headers=response.headers, content=content,
+                                      request=request)
+            key, call, exchange = replay_exchange(request, body)
+            await asyncio.sleep(conditions.delay(key, call, exchange))
+            return replayed(request, exchange)
+
+        async def aclose(self):
+            if self.inner is not None:
+                await self.inner.aclose()
+
+    return Transport(), AsyncTransport()
+
+
+def fixture_transport(service="claude", mode=None, directory=HTTP_FIXTURES_DIR, conditions=None):
+    """
+    ClaudeClients transport whose SDK clients record to or replay from the
+    fixtures of service. Replay needs no API key.
+    """
+    import anthropic
+
+    mode = mode or HTTP_FIXTURES_MODE or "replay"
+    store = get_fixture_store(service, directory, mode)
+
+    def transport(is_async, api_key, base_url, timeout, max_retries):
+        sync_transport, async_transport = httpx_transports(store, mode, conditions)
+        if is_async:
+            cls, http_client = anthropic.AsyncAnthropic, anthropic.DefaultAsyncHttpxClient(transport=async_transport)
+        else:
+            cls, http_client = anthropic.Anthropic, anthropic.DefaultHttpxClient(transport=sync_transport)
+        return cls(api_key=api_key or "replay", base_url=base_url, timeout=timeout, max_retries=max_retries,
+                   http_client=http_client)
+
+    return transport
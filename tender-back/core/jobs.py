@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from core.llm_telemetry import llm_endpoint
+from core.downloader import MAX_CHECKED, download_prozorro_tenders, ingest_prozorro_topics, sync_prozorro_tenders
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(BASE_DIR, "../data/jobs.db"))
+JOB_WORKERS = int(os.getenv("CRAWL_JOB_WORKERS", "2"))
+# Progress is written to SQLite at most this often per job
+PROGRESS_INTERVAL = 1.0
+# Running jobs are stamped this often by their process; a job not stamped for
+# JOB_STALE_SECONDS was interrupted and is queued again
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "15"))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "60"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    progress    TEXT,
+    result      TEXT,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    worker      TEXT,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+"""
+
+
+def run_download(params, progress):
+    return download_prozorro_tenders(progress=progress, **params)
+
+
+def run_sync(params, progress):
+    return sync_prozorro_tenders(progress=progress, **params)
+
+
+def run_ingest(params, progress):
+    return ingest_prozorro_topics(progress=progress, **params)
+
+
+JOB_HANDLERS = {
+    "download": run_download,
+    "sync": run_sync,
+    "ingest": run_ingest,
+}
+
+
+def estimate_eta(kind, params, progress, elapsed):
+    """Seconds left for a download/ingest job, from whichever limit is closer"""
+    if kind not in ("download", "ingest") or not progress or elapsed <= 0:
+        return None
+    done = progress.get("checked", 0) / MAX_CHECKED
+    if kind == "download":
+        done = max(done, progress.get("matched", 0) / max(params.get("total_to_download", 1), 1))
+    if done <= 0:
+        return None
+    return round(elapsed * (1 - min(done, 1)) / done, 1)
+
+
+class JobQueue:
+    """
+    Persistent queue of crawl jobs run by a small worker pool.
+    Jobs live in SQLite, so queued or interrupted jobs are picked up again
+    after a restart; finished jobs keep their tender list. Several processes
+    (uvicorn workers) may share the database: a job runs in whichever one
+    claims it first, and a running job whose heartbeat stops is queued again.
+    """
+
+    def __init__(self, db_path=JOBS_DB_PATH, workers=JOB_WORKERS, handlers=None):
+        self.db_path = db_path
+        self.handlers = handlers or JOB_HANDLERS
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crawl-job")
+        # Per process and queue, so a restarted container reusing host name and pid is still a new worker
+        self.worker = uuid.uuid4().hex
+        self._stopped = threading.Event()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("worker", "TEXT"), ("heartbeat_at", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        threading.Thread(target=self._heartbeat, name="crawl-job-heartbeat", daemon=True).start()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _update(self, job_id, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def submit(self, kind, params):
+        if kind not in self.handlers:
+            raise ValueError(f"❌ Unknown job type: {kind}")
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, params, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, kind, json.dumps(params, ensure_ascii=False), time.time()),
+            )
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def recover(self):
+        """
+        Re-enqueue queued jobs and running ones whose process stopped
+        heart-beating. Every uvicorn worker calls this at startup; _run's
+        claim makes sure each job still runs only once.
+        """
+        self._requeue_stale()
+        rows = self._connect().execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at").fetchall()
+        for row in rows:
+            self._executor.submit(self._run, row["id"])
+        if rows:
+            print(f"🔁 Resumed {len(rows)} crawl jobs")
+        return len(rows)
+
+    def _requeue_stale(self):
+        """Queue running jobs not stamped for JOB_STALE_SECONDS again; returns their ids"""
+        conn = self._connect()
+        cutoff = time.time() - JOB_STALE_SECONDS
+        stale = conn.execute(
+            "SELECT id, worker FROM jobs WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (cutoff,),
+        ).fetchall()
+        requeued = []
+        for row in stale:
+            with conn:
+                # Conditional, so only one process requeues a job and a fresh stamp wins
+                if conn.execute(
+                    "UPDATE jobs SET status = 'queued', started_at = NULL, worker = NULL, heartbeat_at = NULL "
+                    "WHERE id = ? AND status = 'running' AND worker IS ? "
+                    "AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                    (row["id"], row["worker"], cutoff),
+                ).rowcount:
+                    requeued.append(row["id"])
+        return requeued
+
+    def _heartbeat(self):
+        """Stamp this queue's running jobs and pick up jobs whose process died"""
+        while not self._stopped.wait(JOB_HEARTBEAT_INTERVAL):
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "UPDATE jobs SET heartbeat_at = ? WHERE worker = ? AND status = 'running'",
+                        (time.time(), self.worker),
+                    )
+                for job_id in self._requeue_stale():
+                    print(f"🔁 Resuming interrupted crawl job {job_id}")
+                    self._executor.submit(self._run, job_id)
+            except (sqlite3.Error, RuntimeError) as e:
+                print(f"⚠️ Job heartbeat failed: {e}")
+
+    def _claim(self, job_id):
+        """Mark a queued job as running in this process; None if another one got it first"""
+        now = time.time()
+        with self._connect() as conn:
+            claimed = conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ?, progress = NULL, worker = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (now, now, self.worker, job_id),
+            ).rowcount
+        if not claimed:
+            return None
+        return self._connect().execute("SELECT kind, params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def _run(self, job_id):
+        row = self._claim(job_id)
+        if row is None:
+            return
+        kind, params = row["kind"], json.loads(row["params"])
+
+        last_write = [0.0]
+
+        def progress(counts):
+            now = time.monotonic()
+            if now - last_write[0] >= PROGRESS_INTERVAL:
+                last_write[0] = now
+                self._update(job_id, progress=json.dumps(counts))
+
+        stats = {}
+        try:
+            with llm_endpoint(f"job:{kind}"):
+                tenders = self.handlers[kind](dict(params, stats=stats), progress)
+        except Exception as e:
+            print(f"❌ Job {job_id} failed: {e}")
+            self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+            return
+        stats.setdefault("saved", len(tenders))
+        self._update(
+            job_id,
+            status="done",
+            progress=json.dumps(stats),
+            result=json.dumps(tenders, ensure_ascii=False),
+            finished_at=time.time(),
+        )
+
+    def get(self, job_id, include_result=True):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._describe(row, include_result) if row else None
+
+    def list_jobs(self, limit=20):
+        rows = self._connect().execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._describe(row, include_result=False) for row in rows]
+
+    @staticmethod
+    def _describe(row, include_result):
+        params = json.loads(row["params"])
+        progress = json.loads(row["progress"]) if row["progress"] else {}
+        elapsed = None
+        if row["started_at"]:
+            elapsed = (row["finished_at"] or time.time()) - row["started_at"]
+        job = {
+            "job_id": row["id"],
+            "type": row["kind"],
+            "params": params,
+            "status": row["status"],
+            "checked": progress.get("checked", 0),
+            "fetched": progress.get("fetched", 0),
+            "matched": progress.get("matched", 0),
+            "saved": progress.get("saved", 0),
+            "elapsed_seconds": round(elapsed, 1) if elapsed is not None else None,
+            "eta_seconds": estimate_eta(row["kind"], params, progress, elapsed or 0) if row["status"] == "running" else None,
+            "error": row["error"],
+        }
+        if include_result and row["result"]:
+            tenders = json.loads(row["result"])
+            # Ingest jobs return {topic: [tenders]}
+            count = sum(map(len, tenders.values())) if isinstance(tenders, dict) else len(tenders)
+            job.update({"count": count, "tenders": tenders})
+        return job
+
+    def shutdown(self, wait=False):
+        self._stopped.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+@lru_cache(maxsize=None)
+def get_job_queue():
+    return JobQueue()
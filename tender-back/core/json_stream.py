@@ -0,0 +1,75 @@
+import json
+
+
+class JSONFieldStream:
+    """
+    Incremental parser for a streamed JSON object answer. feed() takes the
+    next text delta and returns the (key, value) pairs of top-level fields
+    that completed with it, so each field can be used as soon as the model
+    has finished writing it. Text before the opening brace is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+
+    def feed(self, text):
+        self.buffer += text
+        completed = []
+        while self._pos < len(self.buffer) and not self.done:
+            ch = self.buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key is None and self._key_start is not None:
+                        self._key = json.loads(self.buffer[self._key_start:self._pos + 1])
+                        self._key_start = None
+            elif ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None:
+                    self._key_start = self._pos
+                elif self._depth == 1 and self._value_start is None:
+                    self._value_start = self._pos
+            elif ch in "{[":
+                if self._depth == 1 and self._value_start is None:
+                    self._value_start = self._pos
+                self._depth += 1
+            elif ch in "}]" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.extend(self._complete_field())
+                    self.done = True
+            elif self._depth == 1:
+                if ch == ",":
+                    completed.extend(self._complete_field())
+                elif ch == ":" or ch.isspace():
+                    pass
+                elif self._key is not None and self._value_start is None:
+                    # Bare value: number, true, false or null
+                    self._value_start = self._pos
+            self._pos += 1
+        return completed
+
+    def _complete_field(self):
+        key, start = self._key, self._value_start
+        self._key = self._value_start = None
+        if key is None or start is None:
+            return []
+        try:
+            value = json.loads(self.buffer[start:self._pos].strip())
+        except json.JSONDecodeError:
+            return []
+        self.fields[key] = value
+        return [(key, value)]
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from functools import lru_cache
+
+from core.llm_telemetry import create_message
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(BASE_DIR, "../data/llm_cache.db"))
+LLM_CACHE_MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "200")) * 1024 * 1024)
+# 0 keeps answers until they are evicted by size
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "0"))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key        TEXT PRIMARY KEY,
+    model      TEXT NOT NULL,
+    response   TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used);
+"""
+
+
+def cache_key(model, system, prompt, temperature, max_tokens):
+    """SHA-256 over the request fields that determine the answer"""
+    payload = json.dumps(
+        [model, system or "", prompt, float(temperature), int(max_tokens)],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def response_text(response):
+    """Concatenated text blocks of a messages.create response"""
+    return "".join(block.text for block in (response.content or []) if hasattr(block, "text"))
+
+
+class LLMCache:
+    """
+    Disk-backed cache of Claude answers keyed on (model, system, prompt,
+    temperature, max_tokens). Least recently used answers are evicted once
+    the stored text exceeds max_bytes; with a ttl, older answers are ignored
+    and dropped on read.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_bytes=LLM_CACHE_MAX_BYTES, ttl=LLM_CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        # Running total, so puts only scan the table once the budget is exceeded
+        self._bytes = self._connect().execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self.counters[key] += value
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        response, created_at = row
+        now = time.time()
+        with conn:
+            if self.ttl and now - created_at > self.ttl:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count("expired")
+                self._count("misses")
+                return None
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        self._count("hits")
+        return response
+
+    def put(self, key, model, response):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now),
+            )
+            with self._lock:
+                self._bytes += size
+                over = self._bytes > self.max_bytes
+            if over:
+                self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._bytes = total
+            self.counters["evicted"] += evicted
+
+    def stats(self):
+        entries, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = counters["hits"] + counters["misses"]
+        counters.update({
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round(counters["hits"] / lookups, 3) if lookups else None,
+        })
+        return counters
+
+
+@lru_cache(maxsize=None)
+def get_llm_cache():
+    return LLMCache()
+
+
+def cached_completion(client, model, prompt, max_tokens, temperature=0.0, system=None, cache=None, label="claude"):
+    """
+    Text of client.messages.create for a single user prompt, served from the
+    LLM cache when the same request was answered before. Empty answers and
+    errors are not cached. system may be a string or a list of text blocks
+    (e.g. with cache_control); token usage is recorded under label.
+    """
+    cache = cache or (get_llm_cache() if LLM_CACHE_ENABLED else None)
+    key = cache_key(model, system, prompt, temperature, max_tokens)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    kwargs = {"system": system} if system else {}
+    response, _ = create_message(
+        client,
+        label,
+        model=model,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        messages=[{"role": "user", "content": prompt}],
+        **kwargs,
+    )
+    text = response_text(response)
+    if cache is not None and text:
+        cache.put(key, model, text)
+    return text
@@ -0,0 +1,273 @@
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from core.llm_usage import USAGE_FIELDS, record_usage, usage_cost
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LLM_TELEMETRY_PATH = os.getenv("LLM_TELEMETRY_PATH", os.path.join(BASE_DIR, "../data/llm_telemetry.db"))
+LLM_TELEMETRY_ENABLED = os.getenv("LLM_TELEMETRY_ENABLED", "1") != "0"
+# Latency percentiles cover the calls of the last window; totals and the
+# duration _sum/_count cover everything
+LLM_TELEMETRY_WINDOW_SECONDS = float(os.getenv("LLM_TELEMETRY_WINDOW_SECONDS", "86400"))
+# Calls older than this are dropped from disk (0: kept forever)
+LLM_TELEMETRY_RETENTION_DAYS = float(os.getenv("LLM_TELEMETRY_RETENTION_DAYS", "30"))
+QUANTILES = (0.5, 0.9, 0.99)
+
+# API route (or job kind) the current Claude calls are made for
+current_endpoint = ContextVar("llm_endpoint", default="local")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id                          INTEGER PRIMARY KEY,
+    ts                          REAL NOT NULL,
+    endpoint                    TEXT NOT NULL,
+    stage                       TEXT NOT NULL,
+    model                       TEXT NOT NULL,
+    input_tokens                INTEGER NOT NULL,
+    cache_creation_input_tokens INTEGER NOT NULL,
+    cache_read_input_tokens     INTEGER NOT NULL,
+    output_tokens               INTEGER NOT NULL,
+    seconds                     REAL,
+    retries                     INTEGER NOT NULL,
+    error                       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_calls_ts ON calls(ts);
+CREATE TABLE IF NOT EXISTS pruned (
+    endpoint                    TEXT NOT NULL,
+    stage                       TEXT NOT NULL,
+    model                       TEXT NOT NULL,
+    requests                    INTEGER NOT NULL,
+    errors                      INTEGER NOT NULL,
+    retries                     INTEGER NOT NULL,
+    input_tokens                INTEGER NOT NULL,
+    cache_creation_input_tokens INTEGER NOT NULL,
+    cache_read_input_tokens     INTEGER NOT NULL,
+    output_tokens               INTEGER NOT NULL,
+    seconds_sum                 REAL NOT NULL,
+    seconds_count               INTEGER NOT NULL,
+    PRIMARY KEY (endpoint, stage, model)
+);
+"""
+# Columns of pruned after the labels, and how one calls row contributes to each
+TOTAL_COLUMNS = ("requests", "errors", "retries", *USAGE_FIELDS, "seconds_sum", "seconds_count")
+CALL_TOTALS = ("1", "error IS NOT NULL", "retries", *USAGE_FIELDS,
+               "CASE WHEN error IS NULL THEN COALESCE(seconds, 0) ELSE 0 END",
+               "CASE WHEN error IS NULL AND seconds IS NOT NULL THEN 1 ELSE 0 END")
+
+
+@contextmanager
+def llm_endpoint(name):
+    """Attribute the Claude calls made inside the block to endpoint name"""
+    token = current_endpoint.set(name)
+    try:
+        yield
+    finally:
+        current_endpoint.reset(token)
+
+
+def label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def metric_line(name, labels, value):
+    rendered = ",".join(f'{key}="{label_value(val)}"' for key, val in labels.items())
+    return f"{name}{{{rendered}}} {value}"
+
+
+def quantile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class LLMTelemetry:
+    """
+    One row per Claude call in a local SQLite file: endpoint, pipeline stage
+    (the usage label), model, token counts, wall time, SDK retries and the
+    error type of failed calls. Aggregated on read into the Prometheus text
+    format, so the numbers survive restarts and every worker writes to the
+    same file. Rows past the retention are folded into per-series totals
+    before they are dropped, so the exported counters never go down.
+    """
+
+    def __init__(self, path=LLM_TELEMETRY_PATH, window=LLM_TELEMETRY_WINDOW_SECONDS,
+                 retention_days=LLM_TELEMETRY_RETENTION_DAYS):
+        self.path = path
+        self.window = window
+        self.retention = retention_days * 86400
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        if self.retention:
+            self._prune(time.time() - self.retention)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _prune(self, cutoff):
+        """Move the calls before cutoff into the pruned totals, in one transaction"""
+        columns = ", ".join(TOTAL_COLUMNS)
+        sums = ", ".join(f"SUM({expr})" for expr in CALL_TOTALS)
+        updates = ", ".join(f"{name} = {name} + excluded.{name}" for name in TOTAL_COLUMNS)
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT INTO pruned (endpoint, stage, model, {columns}) "
+                f"SELECT endpoint, stage, model, {sums} FROM calls WHERE ts < ? GROUP BY endpoint, stage, model "
+                f"ON CONFLICT (endpoint, stage, model) DO UPDATE SET {updates}",
+                (cutoff,),
+            )
+            conn.execute("DELETE FROM calls WHERE ts < ?", (cutoff,))
+
+    def record(self, stage, model, counts, seconds=None, retries=0, error=None, endpoint=None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO calls (ts, endpoint, stage, model, input_tokens, cache_creation_input_tokens, "
+                "cache_read_input_tokens, output_tokens, seconds, retries, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), endpoint or current_endpoint.get(), stage, model,
+                 *(counts[name] for name in USAGE_FIELDS), seconds, retries, error),
+            )
+
+    def totals(self):
+        """
+        [{endpoint, stage, model, requests, errors, retries, <token fields>,
+        seconds_sum, seconds_count, cost_usd}] since the first recorded call,
+        pruned ones included; seconds_* cover the successful calls.
+        """
+        columns = ", ".join(TOTAL_COLUMNS)
+        calls = ", ".join(f"{expr} AS {name}" for expr, name in zip(CALL_TOTALS, TOTAL_COLUMNS))
+        sums = ", ".join(f"SUM({name})" for name in TOTAL_COLUMNS)
+        rows = self._connect().execute(
+            f"SELECT endpoint, stage, model, {sums} FROM ("
+            f"SELECT endpoint, stage, model, {calls} FROM calls "
+            f"UNION ALL SELECT endpoint, stage, model, {columns} FROM pruned"
+            ") GROUP BY endpoint, stage, model ORDER BY endpoint, stage, model"
+        ).fetchall()
+        totals = []
+        for endpoint, stage, model, *sums in rows:
+            row = {"endpoint": endpoint, "stage": stage, "model": model, **dict(zip(TOTAL_COLUMNS, sums))}
+            cost = usage_cost(model, {name: row[name] for name in USAGE_FIELDS})
+            row["cost_usd"] = round(cost, 6) if cost is not None else None
+            totals.append(row)
+        return totals
+
+    def latencies(self):
+        """{(endpoint, stage, model): sorted wall times} of the successful calls in the window"""
+        rows = self._connect().execute(
+            "SELECT endpoint, stage, model, seconds FROM calls WHERE seconds IS NOT NULL AND error IS NULL AND ts >= ? "
+            "ORDER BY endpoint, stage, model, seconds",
+            (time.time() - self.window,),
+        ).fetchall()
+        latencies = {}
+        for endpoint, stage, model, seconds in rows:
+            latencies.setdefault((endpoint, stage, model), []).append(seconds)
+        return latencies
+
+    def prometheus(self):
+        """Totals and latency percentiles in the Prometheus text exposition format"""
+        totals = self.totals()
+        lines = []
+
+        def counter(name, help_text, field):
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} counter"])
+            for row in totals:
+                if row[field] is not None:
+                    labels = {"endpoint": row["endpoint"], "stage": row["stage"], "model": row["model"]}
+                    lines.append(metric_line(name, labels, row[field]))
+
+        counter("claude_requests_total", "Claude messages calls.", "requests")
+        counter("claude_request_errors_total", "Claude calls that raised.", "errors")
+        counter("claude_request_retries_total", "Retries made by the SDK.", "retries")
+        lines.extend(["# HELP claude_tokens_total Tokens by kind.", "# TYPE claude_tokens_total counter"])
+        for row in totals:
+            for field in USAGE_FIELDS:
+                labels = {"endpoint": row["endpoint"], "stage": row["stage"], "model": row["model"],
+                          "kind": field.removesuffix("_tokens").removesuffix("_input")}
+                lines.append(metric_line("claude_tokens_total", labels, row[field]))
+        counter("claude_cost_usd_total", "Estimated spend at list prices.", "cost_usd")
+
+        # Quantiles over the window; _sum and _count are running totals, as rate() expects
+        lines.extend([f"# HELP claude_request_duration_seconds Wall time per successful call, "
+                      f"percentiles over the last {self.window:g}s.",
+                      "# TYPE claude_request_duration_seconds summary"])
+        latencies = self.latencies()
+        for row in totals:
+            if not row["seconds_count"]:
+                continue
+            labels = {"endpoint": row["endpoint"], "stage": row["stage"], "model": row["model"]}
+            values = latencies.get((row["endpoint"], row["stage"], row["model"]))
+            for q in QUANTILES if values else ():
+                lines.append(metric_line("claude_request_duration_seconds", {**labels, "quantile": q},
+                                         round(quantile(values, q), 4)))
+            lines.append(metric_line("claude_request_duration_seconds_sum", labels, round(row["seconds_sum"], 4)))
+            lines.append(metric_line("claude_request_duration_seconds_count", labels, row["seconds_count"]))
+        return "\n".join(lines) + "\n"
+
+
+@lru_cache(maxsize=None)
+def get_llm_telemetry():
+    return LLMTelemetry()
+
+
+def record_call(label, model, usage, seconds=None, retries=0, error=None, endpoint=None):
+    """
+    Usage counters plus a telemetry row for one Claude call; returns the token
+    counts. endpoint defaults to current_endpoint.
+    """
+    counts = record_usage(label, usage) if error is None else dict.fromkeys(USAGE_FIELDS, 0)
+    if LLM_TELEMETRY_ENABLED:
+        try:
+            get_llm_telemetry().record(label, model, counts, seconds, retries, error, endpoint)
+        except sqlite3.Error as e:
+            print(f"⚠️ LLM telemetry not recorded: {e}")
+    return counts
+
+
+def create_message(client, label, **params):
+    """
+    client.messages.create(**params) with its tokens, wall time, retries and
+    model recorded under label. Returns (message, usage counts).
+    """
+    raw_api = getattr(client.messages, "with_raw_response", None)
+    start = time.perf_counter()
+    try:
+        if raw_api is not None:
+            raw = raw_api.create(**params)
+            response, retries = raw.parse(), raw.retries_taken
+        else:
+            response, retries = client.messages.create(**params), 0
+    except Exception as e:
+        record_call(label, params["model"], None, time.perf_counter() - start, error=type(e).__name__)
+        raise
+    counts = record_call(label, params["model"], getattr(response, "usage", None),
+                         time.perf_counter() - start, retries)
+    return response, counts
+
+
+async def create_message_async(client, label, **params):
+    """create_message for the async client"""
+    raw_api = getattr(client.messages, "with_raw_response", None)
+    start = time.perf_counter()
+    try:
+        if raw_api is not None:
+            raw = await raw_api.create(**params)
+            response, retries = await raw.parse(), raw.retries_taken
+        else:
+            response, retries = await client.messages.create(**params), 0
+    except BaseException as e:
+        # Cancellation by the executor's timeout is recorded too
+        record_call(label, params["model"], None, time.perf_counter() - start, error=type(e).__name__)
+        raise
+    counts = record_call(label, params["model"], getattr(response, "usage", None),
+                         time.perf_counter() - start, retries)
+    return response, counts
@@ -0,0 +1,101 @@
+import threading
+
+USAGE_FIELDS = ("input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens", "output_tokens")
+
+# USD per million tokens: (input, output); cache writes cost 1.25x input, reads 0.1x
+MODEL_PRICES = {
+    "claude-3-5-haiku": (0.8, 4.0),
+    "claude-3-haiku": (0.25, 1.25),
+    "claude-3-5-sonnet": (3.0, 15.0),
+    "claude-3-opus": (15.0, 75.0),
+}
+
+
+# Shortest prefix the prompt cache stores, in tokens; a shorter cache_control
+# block is silently billed as uncached input on every call
+PROMPT_CACHE_MIN_TOKENS = {
+    "claude-3-5-haiku": 2048,
+    "claude-3-haiku": 2048,
+}
+DEFAULT_PROMPT_CACHE_MIN_TOKENS = 1024
+
+
+def prompt_cache_min_tokens(model):
+    return next((tokens for prefix, tokens in PROMPT_CACHE_MIN_TOKENS.items() if model.startswith(prefix)),
+                DEFAULT_PROMPT_CACHE_MIN_TOKENS)
+
+
+def prefix_tokens(client, model, system, tools=None):
+    """Tokens of the system (and tools) prefix of a request to model, measured with count_tokens"""
+    messages = [{"role": "user", "content": "."}]
+    kwargs = {"tools": tools} if tools else {}
+    with_prefix = client.messages.count_tokens(model=model, system=system, messages=messages, **kwargs)
+    without = client.messages.count_tokens(model=model, messages=messages)
+    return with_prefix.input_tokens - without.input_tokens
+
+
+def model_price(model):
+    return next((price for prefix, price in MODEL_PRICES.items() if model.startswith(prefix)), None)
+
+
+def usage_cost(model, values):
+    """USD for aggregated usage counts of model; None for models without a price"""
+    price = model_price(model)
+    if price is None:
+        return None
+    input_price, output_price = price
+    return (
+        values["input_tokens"] * input_price
+        + values["cache_creation_input_tokens"] * input_price * 1.25
+        + values["cache_read_input_tokens"] * input_price * 0.1
+        + values["output_tokens"] * output_price
+    ) / 1_000_000
+
+
+def usage_counts(usage):
+    """Token counts of a response's usage (SDK object or dict), missing fields as 0"""
+    if usage is None:
+        return dict.fromkeys(USAGE_FIELDS, 0)
+    get = usage.get if isinstance(usage, dict) else lambda name: getattr(usage, name, None)
+    return {name: get(name) or 0 for name in USAGE_FIELDS}
+
+
+class UsageStats:
+    """
+    Process-wide Claude token counters per label (call site).
+    input_tokens is what was billed uncached; cache reads are billed at a
+    fraction of it and cache writes at a premium.
+    """
+
+    def __init__(self):
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, label, usage):
+        counts = usage_counts(usage)
+        with self._lock:
+            totals = self._totals.setdefault(label, dict.fromkeys(USAGE_FIELDS + ("requests",), 0))
+            totals["requests"] += 1
+            for name, value in counts.items():
+                totals[name] += value
+        print(
+            f"🧾 {label}: {counts['cache_read_input_tokens']} cached + "
+            f"{counts['cache_creation_input_tokens']} cache-write + {counts['input_tokens']} uncached input, "
+            f"{counts['output_tokens']} output tokens"
+        )
+        return counts
+
+    def snapshot(self):
+        with self._lock:
+            totals = {label: dict(values) for label, values in self._totals.items()}
+        for values in totals.values():
+            prompt = values["input_tokens"] + values["cache_creation_input_tokens"] + values["cache_read_input_tokens"]
+            values["cache_read_ratio"] = round(values["cache_read_input_tokens"] / prompt, 3) if prompt else None
+        return totals
+
+
+usage_stats = UsageStats()
+
+
+def record_usage(label, usage):
+    return usage_stats.record(label, usage)
@@ -0,0 +1,380 @@
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.analyze_tender import ANALYSIS_MODEL, ANALYSIS_SYSTEM, analyze_tender, build_analysis_prompt
+from core.structured_output import ANALYSIS_TOOL, structured_completion
+from core.llm_telemetry import current_endpoint, llm_endpoint
+
+# Texts longer than what analyze_tender sends in one call go through map-reduce
+LONG_DOCUMENT_CHARS = 15000
+CHUNK_CHARS = 12000
+MAX_MAP_CHUNKS = int(os.getenv("LONG_DOCUMENT_MAX_CHUNKS", "24"))
+MAP_CONCURRENCY = int(os.getenv("LONG_DOCUMENT_CONCURRENCY", "8"))
+MAX_HEADING_CHARS = 120
+# Streaming: chunks per relevant section sent as soon as they are full; deeper
+# ones wait for the end of the document and share what is left of the budget
+STREAM_EAGER_CHUNKS = 2
+
+# Sections worth a map call, by the fields they feed
+RELEVANT_HEADINGS = {
+    "documents": r"перелік\s+(необхідн\w+\s+)?документ|кваліфікаційн\w+\s+(вимог|критері)|документ\w*,?\s+що\s+підтверджу",
+    "specs": r"технічн\w+\s+(специфікаці|завданн|вимог)|медико-технічн|опис\w*\s+предмет\w*\s+закупівл|обсяг\w*\s+робіт|відомість\s+(ресурсів|обсягів)",
+    "payment": r"умов\w*\s+оплат|порядок\s+(оплат|розрахунк)|про[еє]кт\w*\s+договор",
+    "estimate": r"кошторис|авк-?5",
+    "timeline": r"строк\w*\s+(виконанн|поставк)|термін\w*\s+(виконанн|поставк)",
+}
+RELEVANT_RE = {kind: re.compile(pattern, re.IGNORECASE) for kind, pattern in RELEVANT_HEADINGS.items()}
+GENERIC_HEADING_RE = re.compile(r"^(додаток|розділ|частина)\s*№?\s*[\dIVX]+\b", re.IGNORECASE)
+NUMBERING_RE = re.compile(r"^[\s\d.)IVX№-]*")
+
+# Reducer: fields whose partial answers from different chunks are all kept
+CONCAT_FIELDS = {"technical_specs", "payment_terms", "resource_requirements"}
+EMPTY_MARKERS = ("не вказано", "not specified", "not extracted", "n/a", "невідомо")
+
+
+def heading_kind(line):
+    """
+    None if line is not a heading, "other" for a heading of a section we
+    skip, else the RELEVANT_HEADINGS kind.
+    """
+    line = line.strip()
+    if not line or len(line) > MAX_HEADING_CHARS:
+        return None
+    title = NUMBERING_RE.sub("", line)
+    generic = GENERIC_HEADING_RE.match(title)
+    for kind, pattern in RELEVANT_RE.items():
+        # "Додаток 3. Технічна специфікація" is still a specification heading
+        if pattern.match(title) or (generic and pattern.search(title)):
+            return kind
+    letters = [ch for ch in title if ch.isalpha()]
+    if generic or (len(letters) >= 4 and sum(ch.isupper() for ch in letters) / len(letters) > 0.8):
+        return "other"
+    return None
+
+
+def split_sections(text):
+    """[(heading, kind, section text)] in document order; text before the first heading is "intro" """
+    sections = []
+    heading, kind, start = "", "intro", 0
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        found = heading_kind(line)
+        if found is not None:
+            if offset > start:
+                sections.append((heading, kind, text[start:offset]))
+            heading, kind, start = line.strip(), found, offset
+        offset += len(line)
+    if offset > start:
+        sections.append((heading, kind, text[start:]))
+    return sections
+
+
+def cut_point(text, size):
+    """Where to end a chunk of at most size characters: a paragraph or line break where possible"""
+    cut = text.rfind("\n\n", 0, size)
+    if cut < size // 2:
+        cut = text.rfind("\n", 0, size)
+    if cut < size // 2:
+        cut = size
+    return cut
+
+
+def chunk_text(text, size=CHUNK_CHARS):
+    """Pieces of at most size characters, cut at paragraph or line breaks where possible"""
+    chunks = []
+    while len(text) > size:
+        cut = cut_point(text, size)
+        chunks.append(text[:cut])
+        text = text[cut:]
+    if text.strip():
+        chunks.append(text)
+    return chunks
+
+
+def evenly_spaced(items, count):
+    if len(items) <= count:
+        return items
+    step = (len(items) - 1) / (count - 1)
+    return [items[round(i * step)] for i in range(count)]
+
+
+def round_robin(groups, count):
+    """Up to count items taking one from each group in turn, so every group gets its start in"""
+    picked = []
+    for depth in range(max(map(len, groups), default=0)):
+        for group in groups:
+            if depth < len(group) and len(picked) < count:
+                picked.append(group[depth])
+    return picked
+
+
+def map_chunks(text, max_chunks=MAX_MAP_CHUNKS):
+    """
+    Map-call inputs for a long document: the opening (title, issuer,
+    budget) plus the sections under relevant headings, chunked and taken
+    round-robin when there are more than max_chunks. Without any relevant
+    heading, chunks spread evenly over the whole text.
+    Short texts come back as [text].
+    """
+    if len(text) <= LONG_DOCUMENT_CHARS:
+        return [text]
+    intro = chunk_text(text)[0]
+    sections = [
+        [(heading, chunk) for chunk in chunk_text(section)]
+        for heading, kind, section in split_sections(text)
+        if kind in RELEVANT_RE
+    ]
+    if sections:
+        picked = round_robin(sections, max_chunks - 1)
+        # Back in document order, so the reducer prefers earlier answers
+        order = {id(item): i for i, item in enumerate(item for section in sections for item in section)}
+        relevant = sorted(picked, key=lambda item: order[id(item)])
+    else:
+        relevant = [("", chunk) for chunk in evenly_spaced(chunk_text(text)[1:], max_chunks - 1)]
+    picked = [("", intro)] + relevant
+    return [fragment(i, heading, chunk, len(picked)) for i, (heading, chunk) in enumerate(picked, start=1)]
+
+
+def fragment(number, heading, chunk, total=None):
+    """Map-call input: chunk under a note on where it comes from (total unknown while streaming)"""
+    return (f"[Фрагмент {number}{f'/{total}' if total else ''} документа тендеру"
+            f"{f', розділ: {heading}' if heading else ''}. "
+            f"Заповніть лише поля, дані для яких є в цьому фрагменті; решту залиште порожніми.]\n{chunk}")
+
+
+class SectionStream:
+    """
+    Incremental split_sections + chunk_text over text fed piece by piece.
+    Only the section being read and the chunks held back are kept: lines of
+    sections that are not relevant are dropped as they go by. feed() and
+    close() return the chunks completed, as (position, heading, chunk,
+    depth in its section); without any relevant section, close() returns
+    chunks spread evenly over the document instead, like map_chunks.
+    """
+
+    def __init__(self, intro_end, max_chunks=MAX_MAP_CHUNKS):
+        self.budget = max_chunks - 1
+        self.position = 0
+        self.partial = ""
+        self.heading, self.kind, self.section, self.section_start, self.depth = "", "intro", "", 0, 0
+        self.found_relevant = False
+        self.reserve = []
+        # Fallback sample of the text after the opening: every stride-th chunk, stride doubling when full
+        self.skip = intro_end
+        self.rest, self.rest_start, self.rest_index, self.stride, self.sample = "", intro_end, 0, 1, []
+
+    def feed(self, text):
+        ready = []
+        self._sample(text)
+        lines = (self.partial + text).splitlines(keepends=True)
+        self.partial = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        for line in lines:
+            ready.extend(self._line(line))
+        return ready
+
+    def close(self):
+        ready = self._line(self.partial) if self.partial else []
+        ready.extend(self._end_section())
+        if not self.found_relevant:
+            if self.rest.strip():
+                self._keep_sample(self.rest_start, self.rest)
+            return [(position, "", chunk, 0) for position, chunk in self.sample[:self.budget]]
+        # Held-back chunks, shallowest first (round-robin over the sections)
+        self.reserve.sort(key=lambda item: (item[3], item[0]))
+        return ready + self.reserve[:self.budget]
+
+    def _line(self, line):
+        ready = []
+        found = heading_kind(line)
+        if found is not None:
+            ready.extend(self._end_section())
+            self.heading, self.kind, self.section, self.section_start, self.depth = (
+                line.strip(), found, "", self.position, 0)
+        if self.kind in RELEVANT_RE:
+            self.section += line
+            if len(self.section) > CHUNK_CHARS:
+                cut = cut_point(self.section, CHUNK_CHARS)
+                ready.extend(self._chunk(self.section[:cut]))
+                self.section = self.section[cut:]
+        self.position += len(line)
+        return ready
+
+    def _end_section(self):
+        ready = self._chunk(self.section) if self.kind in RELEVANT_RE and self.section.strip() else []
+        self.section = ""
+        return ready
+
+    def _chunk(self, chunk):
+        item = (self.section_start, self.heading, chunk, self.depth)
+        self.section_start += len(chunk)
+        self.depth += 1
+        if not self.found_relevant:
+            self.found_relevant = True
+            self.sample = []
+        if item[3] < STREAM_EAGER_CHUNKS and self.budget > 0:
+            self.budget -= 1
+            return [item]
+        self.reserve.append(item)
+        if len(self.reserve) > self.budget:
+            # Deepest (then latest) chunk goes, as round_robin would never reach it
+            self.reserve.remove(max(self.reserve, key=lambda held: (held[3], held[0])))
+        return []
+
+    def _sample(self, text):
+        if self.found_relevant:
+            return
+        if self.skip:
+            skipped = min(self.skip, len(text))
+            text = text[skipped:]
+            self.skip -= skipped
+        self.rest += text
+        while len(self.rest) > CHUNK_CHARS:
+            cut = cut_point(self.rest, CHUNK_CHARS)
+            if self.rest_index % self.stride == 0:
+                self._keep_sample(self.rest_start, self.rest[:cut])
+            self.rest_index += 1
+            self.rest_start += cut
+            self.rest = self.rest[cut:]
+
+    def _keep_sample(self, position, chunk):
+        self.sample.append((position, chunk))
+        if len(self.sample) > max(1, self.budget):
+            self.sample = self.sample[::2]
+            self.stride *= 2
+
+
+def stream_map_chunks(pages, max_chunks=MAX_MAP_CHUNKS):
+    """
+    map_chunks over an iterable of page texts (iter_pdf_pages), yielding
+    each map-call input as soon as it is decided: the opening once more than
+    LONG_DOCUMENT_CHARS have been read, the first STREAM_EAGER_CHUNKS chunks
+    of every relevant section as they fill up, and the rest of the budget at
+    the end. Items are (position in the document, text); a short document
+    comes whole as a single (None, text).
+    """
+    pages = iter(pages)
+    head, size = [], 0
+    for page in pages:
+        head.append(page)
+        size += len(page) + 1
+        if size > LONG_DOCUMENT_CHARS and len("\n".join(head).strip()) > LONG_DOCUMENT_CHARS:
+            break
+    else:
+        yield None, "\n".join(head).strip()
+        return
+
+    # Pages are joined by newlines, as extract_text_from_pdf does
+    text = "\n".join(head).lstrip()
+    intro_end = cut_point(text, CHUNK_CHARS)
+    number = 1
+    yield 0, fragment(number, "", text[:intro_end])
+    sections = SectionStream(intro_end, max_chunks)
+    ready = sections.feed(text)
+    for page in pages:
+        for position, heading, chunk, _ in ready:
+            number += 1
+            yield position, fragment(number, heading, chunk)
+        ready = sections.feed("\n" + page)
+    for position, heading, chunk, _ in ready + sections.close():
+        number += 1
+        yield position, fragment(number, heading, chunk)
+
+
+def is_empty(value):
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return not value.strip() or value.strip().lower().startswith(EMPTY_MARKERS)
+    if isinstance(value, (list, dict)):
+        return not value
+    return False
+
+
+def merge_analyses(analyses):
+    """
+    Deterministic merge of partial analyses, in the order given.
+    Extends the merge_single_tender rules: lists are unioned keeping first
+    occurrence order, booleans are OR-ed, CONCAT_FIELDS keep every distinct
+    non-empty answer, other strings take the first non-empty one. Keys are
+    the union over all analyses; failed ones are skipped.
+    """
+    analyses = [a for a in analyses if isinstance(a, dict) and "error" not in a]
+    if not analyses:
+        return {}
+    merged = {}
+    keys = list(dict.fromkeys(key for a in analyses for key in a))
+    for key in keys:
+        vals = [a[key] for a in analyses if key in a]
+        present = [v for v in vals if not is_empty(v)]
+        if any(isinstance(v, list) for v in vals):
+            items = [item for v in vals if isinstance(v, list) for item in v]
+            merged[key] = list(dict.fromkeys(item for item in items if not is_empty(item)))
+        elif any(isinstance(v, bool) for v in vals):
+            merged[key] = any(v is True for v in vals)
+        elif key in CONCAT_FIELDS and len(present) > 1:
+            merged[key] = "\n".join(dict.fromkeys(str(v).strip() for v in present))
+        else:
+            merged[key] = present[0] if present else vals[0]
+    return merged
+
+
+def analyze_chunk(client, chunk, endpoint):
+    """One map call; endpoint is re-entered since pool threads do not inherit the caller's context"""
+    try:
+        with llm_endpoint(endpoint):
+            return structured_completion(
+                client,
+                model=ANALYSIS_MODEL,
+                max_tokens=1024,
+                temperature=0.0,
+                system=ANALYSIS_SYSTEM,
+                prompt=build_analysis_prompt(chunk),
+                tool=ANALYSIS_TOOL,
+                label="analyze_tender_map",
+            )
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def reduce_partials(partials):
+    merged = merge_analyses(partials)
+    return merged or next((p for p in partials if "error" in p), {"error": "Claude returned invalid JSON."})
+
+
+def analyze_long_tender(text, client, max_workers=MAP_CONCURRENCY):
+    """
+    analyze_tender for documents over LONG_DOCUMENT_CHARS: relevant chunks
+    are analysed in parallel (sharing the prompt-cached instructions) and
+    the partial JSONs merged with merge_analyses.
+    """
+    chunks = map_chunks(text)
+    print(f"📚 Long document ({len(text)} chars): {len(chunks)} map calls")
+    endpoint = current_endpoint.get()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        partials = list(executor.map(lambda chunk: analyze_chunk(client, chunk, endpoint), chunks))
+    return reduce_partials(partials)
+
+
+def analyze_page_stream(pages, client, max_workers=MAP_CONCURRENCY):
+    """
+    analyze_tender over page texts as they are extracted: the map calls of
+    a long document go out as stream_map_chunks decides them, while later
+    pages are still being read, and are merged in document order. A short
+    document gets the single analyze_tender call once its last page is in.
+    """
+    endpoint = current_endpoint.get()
+    start = time.perf_counter()
+    first_call = None
+    submitted = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for position, chunk in stream_map_chunks(pages):
+            if position is None:
+                return analyze_tender(chunk, client)
+            if first_call is None:
+                first_call = time.perf_counter() - start
+            submitted.append((position, executor.submit(analyze_chunk, client, chunk, endpoint)))
+        partials = [future.result() for _, future in sorted(submitted, key=lambda item: item[0])]
+    print(f"📚 Long document (streamed): {len(partials)} map calls, the first {first_call:.2f}s in")
+    return reduce_partials(partials)
@@ -0,0 +1,202 @@
+import os
+import asyncio
+import time
+import threading
+from collections import deque
+
+from core.claude_client import ANALYSIS_MODEL, FAST_MODEL
+from core.llm_usage import usage_cost, usage_stats
+from core.structured_output import invalid_fields, streamed_structured_completion, structured_completion
+
+CASCADE_ENABLED = os.getenv("CLAUDE_CASCADE", "1") != "0"
+# Prompts longer than this skip the fast tier
+CASCADE_FAST_MAX_CHARS = int(os.getenv("CLAUDE_CASCADE_FAST_MAX_CHARS", "8000"))
+# Fields the fast tier must fill for its answer to be kept
+CONFIDENCE_FIELDS = ("project_type", "required_documents", "technical_specs")
+LATENCY_WINDOW = 1000
+EMPTY_VALUES = ("", "не вказано", "not specified", "n/a")
+
+
+def is_blank(value):
+    if isinstance(value, str):
+        return value.strip().lower().rstrip(".") in EMPTY_VALUES
+    return value is None or value == []
+
+
+def low_confidence(data, tool):
+    """Why an answer from the fast tier should be escalated, or None to keep it"""
+    if not isinstance(data, dict) or "error" in data:
+        return "error"
+    invalid = invalid_fields(data, tool)
+    if invalid:
+        return "schema:" + ",".join(sorted(invalid))
+    required = tool["input_schema"]["required"]
+    blank = [field for field in CONFIDENCE_FIELDS if field in required and is_blank(data.get(field))]
+    if blank:
+        return "missing:" + ",".join(blank)
+    return None
+
+
+class CascadeStats:
+    """
+    Routing decisions per label (fast kept, escalated with the reason, sent
+    straight to the large tier) and latency and cost per tier. Calls are
+    recorded under "<label>@<tier>" usage labels, so their token counts and
+    cost come from the shared usage stats; a tier's cost includes the
+    re-asks it made ("<label>@<tier>_reask").
+    """
+
+    def __init__(self):
+        self._routes = {}
+        self._tiers = {}
+        self._lock = threading.Lock()
+
+    def record_route(self, label, route, reason=None):
+        with self._lock:
+            routes = self._routes.setdefault(label, {"fast": 0, "escalated": 0, "direct": 0, "reasons": {}})
+            routes[route] += 1
+            if reason:
+                kind = reason.split(":", 1)[0]
+                routes["reasons"][kind] = routes["reasons"].get(kind, 0) + 1
+        if route != "fast":
+            print(f"🔀 {label}: {route} to the large model ({reason})")
+
+    def record_call(self, usage_label, model, seconds):
+        with self._lock:
+            tier = self._tiers.setdefault(usage_label, {"model": model, "calls": 0,
+                                                        "latencies": deque(maxlen=LATENCY_WINDOW)})
+            tier["calls"] += 1
+            tier["latencies"].append(seconds)
+
+    def snapshot(self):
+        usage = usage_stats.snapshot()
+        with self._lock:
+            routes = {label: {**values, "reasons": dict(values["reasons"])} for label, values in self._routes.items()}
+            tiers = {label: {**values, "latencies": sorted(values["latencies"])} for label, values in self._tiers.items()}
+        for label, tier in tiers.items():
+            latencies = tier.pop("latencies")
+            tier["latency_p50"] = round(latencies[len(latencies) // 2], 3)
+            tier["latency_p95"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3)
+            costs = [usage_cost(tier["model"], usage[name]) for name in (label, f"{label}_reask") if name in usage]
+            cost = sum(costs) if costs and None not in costs else None
+            tier["cost_usd"] = round(cost, 6) if cost is not None else None
+        return {"routes": routes, "tiers": tiers}
+
+
+cascade_stats = CascadeStats()
+
+
+def run_cascade(label, call, check, fast_model=FAST_MODEL, large_model=ANALYSIS_MODEL, direct_reason=None):
+    """
+    call(model, usage_label) on the fast model, then on the large one when
+    check(result) returns a reason (or the fast call raises). direct_reason
+    skips the fast tier. Returns the result of the last tier that ran.
+    """
+    def timed(model, tier):
+        usage_label = f"{label}@{tier}"
+        start = time.perf_counter()
+        try:
+            return call(model, usage_label)
+        finally:
+            cascade_stats.record_call(usage_label, model, time.perf_counter() - start)
+
+    if not CASCADE_ENABLED or fast_model == large_model:
+        return call(large_model, label)
+    if direct_reason:
+        cascade_stats.record_route(label, "direct", direct_reason)
+        return timed(large_model, "large")
+    try:
+        result = timed(fast_model, "fast")
+        reason = check(result)
+    except Exception as e:
+        reason = f"error:{e}"
+    if reason is None:
+        cascade_stats.record_route(label, "fast")
+        return result
+    cascade_stats.record_route(label, "escalated", reason)
+    return timed(large_model, "large")
+
+
+async def run_cascade_async(label, call, check, fast_model=FAST_MODEL, large_model=ANALYSIS_MODEL, direct_reason=None):
+    """run_cascade for a coroutine function call(model, usage_label)"""
+    async def timed(model, tier):
+        usage_label = f"{label}@{tier}"
+        start = time.perf_counter()
+        try:
+            return await call(model, usage_label)
+        finally:
+            cascade_stats.record_call(usage_label, model, time.perf_counter() - start)
+
+    if not CASCADE_ENABLED or fast_model == large_model:
+        return await call(large_model, label)
+    if direct_reason:
+        cascade_stats.record_route(label, "direct", direct_reason)
+        return await timed(large_model, "large")
+    try:
+        result = await timed(fast_model, "fast")
+        reason = check(result)
+    except asyncio.TimeoutError:
+        reason = "error:timeout"
+    except Exception as e:
+        reason = f"error:{e}"
+    if reason is None:
+        cascade_stats.record_route(label, "fast")
+        return result
+    cascade_stats.record_route(label, "escalated", reason)
+    return await timed(large_model, "large")
+
+
+def run_cascade_stream(label, call, check, fast_model=FAST_MODEL, large_model=ANALYSIS_MODEL, direct_reason=None):
+    """
+    run_cascade for a generator function call(model, usage_label), for use
+    with yield from: whatever the tiers yield is passed on, so an escalated
+    answer's values follow (and replace) the fast tier's ones.
+    """
+    def timed(model, tier):
+        usage_label = f"{label}@{tier}"
+        start = time.perf_counter()
+        try:
+            return (yield from call(model, usage_label))
+        finally:
+            cascade_stats.record_call(usage_label, model, time.perf_counter() - start)
+
+    if not CASCADE_ENABLED or fast_model == large_model:
+        return (yield from call(large_model, label))
+    if direct_reason:
+        cascade_stats.record_route(label, "direct", direct_reason)
+        return (yield from timed(large_model, "large"))
+    try:
+        result = yield from timed(fast_model, "fast")
+        reason = check(result)
+    except Exception as e:
+        reason = f"error:{e}"
+    if reason is None:
+        cascade_stats.record_route(label, "fast")
+        return result
+    cascade_stats.record_route(label, "escalated", reason)
+    return (yield from timed(large_model, "large"))
+
+
+def cascade_completion(client, prompt, max_tokens, tool, temperature=0.0, system=None, cache=None, label="claude",
+                       fast_model=FAST_MODEL, large_model=ANALYSIS_MODEL):
+    """structured_completion through the fast/large model cascade"""
+    def call(model, usage_label):
+        return structured_completion(client, model=model, prompt=prompt, max_tokens=max_tokens,
+                                     temperature=temperature, system=system, tool=tool, cache=cache,
+                                     label=usage_label)
+
+    direct = "long_input" if len(prompt) > CASCADE_FAST_MAX_CHARS else None
+    return run_cascade(label, call, lambda data: low_confidence(data, tool), fast_model, large_model, direct)
+
+
+def cascade_stream(client, prompt, max_tokens, tool, temperature=0.0, system=None, cache=None, label="claude",
+                   fast_model=FAST_MODEL, large_model=ANALYSIS_MODEL, endpoint=None):
+    """cascade_completion over streamed_structured_completion: yields (key, value) pairs, returns the dict"""
+    def call(model, usage_label):
+        return streamed_structured_completion(client, model=model, prompt=prompt, max_tokens=max_tokens,
+                                              temperature=temperature, system=system, tool=tool, cache=cache,
+                                              label=usage_label, endpoint=endpoint)
+
+    direct = "long_input" if len(prompt) > CASCADE_FAST_MAX_CHARS else None
+    return (yield from run_cascade_stream(label, call, lambda data: low_confidence(data, tool),
+                                          fast_model, large_model, direct))
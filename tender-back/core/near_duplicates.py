@@ -0,0 +1,255 @@
+import os
+import re
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+from core.tender_fields import STRUCTURED_FIELDS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ANALYSIS_REUSE_PATH = os.getenv("ANALYSIS_REUSE_PATH", os.path.join(BASE_DIR, "../data/analysis_reuse.db"))
+ANALYSIS_REUSE_ENABLED = os.getenv("ANALYSIS_REUSE_ENABLED", "1") != "0"
+# Estimated Jaccard similarity of the word shingles above which an analysis is reused
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+SHINGLE_WORDS = 3
+NUM_PERM = 128
+# 16 bands of 8 rows: pairs above ~0.7 similarity become candidates (95% of those at 0.8)
+LSH_BANDS = 16
+# Relative budget change up to which the budget-dependent fields are kept
+BUDGET_TOLERANCE = float(os.getenv("NEAR_DUPLICATE_BUDGET_TOLERANCE", "0.1"))
+# Inferred fields that depend on a structured one; asked again when it changed
+DEPENDENT_FIELDS = {
+    "budget": ("profitability",),
+    "currency": ("profitability",),
+    "deadline": ("timeline_feasibility",),
+}
+
+# Multiply-add-shift hashes: odd 64-bit multipliers, the high 32 bits are kept
+_rng = np.random.default_rng(1)
+PERM_A = _rng.integers(1, 1 << 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+PERM_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)
+SHIFT = np.uint64(32)
+BAND_MULTIPLIERS = _rng.integers(1, 1 << 63, NUM_PERM // LSH_BANDS, dtype=np.uint64)
+
+WORD_RE = re.compile(r"\w+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    tender_id  TEXT PRIMARY KEY,
+    signature  BLOB NOT NULL,
+    analysis   TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+def signature_text(tender_json):
+    """
+    What a tender is signed on: title, description and items. Budget and
+    deadline are re-derived anyway, and the criteria are mostly ProZorro's
+    standard exclusion grounds, identical across unrelated tenders.
+    """
+    items = [
+        f"{item.get('description', '')} {(item.get('classification') or {}).get('description', '')}"
+        for item in tender_json.get("items") or []
+    ]
+    return "\n".join([tender_json.get("title", ""), tender_json.get("description", ""), *items])
+
+
+def normalize_text(text):
+    """Lowercased words of text, plain numbers collapsed"""
+    words = WORD_RE.findall(text.lower())
+    return " ".join("0" if word.isdigit() else word for word in words)
+
+
+def shingles(text):
+    """CRC32 of every SHINGLE_WORDS-word window of the normalized text"""
+    words = normalize_text(text).split()
+    if len(words) < SHINGLE_WORDS:
+        words = words or [""]
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"))
+            for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def minhash(text):
+    """NUM_PERM-value MinHash signature (uint32) of text's shingles"""
+    hashes = np.fromiter(shingles(text), dtype=np.uint64)
+    # uint64 arithmetic wraps, which is the "mod 2**64" of the hash family
+    return ((np.outer(hashes, PERM_A) + PERM_B) >> SHIFT).min(axis=0).astype(np.uint32)
+
+
+def similarity(a, b):
+    """Jaccard similarity estimated from two signatures"""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+class MinHashLSH:
+    """
+    In-memory LSH index over MinHash signatures: each signature is cut into
+    LSH_BANDS bands and a key is a candidate when any band matches exactly.
+    Candidates are verified against the signature estimate of the Jaccard
+    similarity, so a query costs a few dict lookups instead of a scan.
+    """
+
+    def __init__(self, threshold=NEAR_DUPLICATE_THRESHOLD, bands=LSH_BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.keys = []
+        self.signatures = []
+        self._rows = {}
+        self._buckets = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+
+    def band_keys(self, signature):
+        bands = signature.astype(np.uint64).reshape(self.bands, -1)
+        return (bands * BAND_MULTIPLIERS).sum(axis=1).tolist()
+
+    def add(self, key, signature):
+        with self._lock:
+            row = self._rows.get(key)
+            if row is not None:
+                # Re-analysed tender: the newer signature replaces the old one
+                self.signatures[row] = signature
+            else:
+                row = len(self.keys)
+                self._rows[key] = row
+                self.keys.append(key)
+                self.signatures.append(signature)
+            for bucket, band in zip(self._buckets, self.band_keys(signature)):
+                rows = bucket.setdefault(band, [])
+                if row not in rows[-1:]:
+                    rows.append(row)
+
+    def matches(self, signature):
+        """[(key, similarity)] of the indexed signatures above the threshold, most similar first"""
+        with self._lock:
+            candidates = set()
+            for bucket, band in zip(self._buckets, self.band_keys(signature)):
+                candidates.update(bucket.get(band, ()))
+            scored = [(self.keys[row], similarity(signature, self.signatures[row])) for row in candidates]
+        return sorted((match for match in scored if match[1] >= self.threshold), key=lambda match: -match[1])
+
+    def query(self, signature):
+        """(key, similarity) of the most similar indexed signature above the threshold, or None"""
+        matches = self.matches(signature)
+        return matches[0] if matches else None
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class AnalysisReuse:
+    """
+    Analyses of ProZorro tenders with the MinHash of their signature_text,
+    in SQLite and in an LSH index loaded at start-up. A tender whose text is
+    a near duplicate of an analysed one gets that analysis back; the caller
+    takes the structured fields from its own JSON and asks Claude only for
+    the fields that depend on values that changed.
+    """
+
+    def __init__(self, path=ANALYSIS_REUSE_PATH, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.path = path
+        self.index = MinHashLSH(threshold)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.counters = {"lookups": 0, "reused": 0, "stored": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+        for tender_id, signature in self._connect().execute("SELECT tender_id, signature FROM analyses"):
+            self.index.add(tender_id, np.frombuffer(signature, dtype=np.uint32))
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def remember(self, tender_json, analysis):
+        """Store a fresh analysis of tender_json for later near duplicates"""
+        if not analysis or "error" in analysis or not tender_json.get("id"):
+            return
+        signature = minhash(signature_text(tender_json))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analyses (tender_id, signature, analysis, created_at) VALUES (?, ?, ?, ?)",
+                (tender_json["id"], signature.tobytes(), json.dumps(analysis, ensure_ascii=False), time.time()),
+            )
+        self.index.add(tender_json["id"], signature)
+        self._count("stored")
+
+    def find(self, tender_json):
+        """(tender_id, analysis, similarity) of the closest analysed near duplicate, or None"""
+        self._count("lookups")
+        match = self.index.query(minhash(signature_text(tender_json)))
+        if match is None:
+            return None
+        row = self._connect().execute("SELECT analysis FROM analyses WHERE tender_id = ?", (match[0],)).fetchone()
+        if row is None:
+            return None
+        self._count("reused")
+        return match[0], json.loads(row[0]), match[1]
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        counters["indexed"] = len(self.index)
+        counters["reuse_rate"] = round(counters["reused"] / counters["lookups"], 3) if counters["lookups"] else None
+        return counters
+
+
+@lru_cache(maxsize=None)
+def get_analysis_reuse():
+    return AnalysisReuse()
+
+
+def has_changed(field, old, new):
+    if field == "budget" and isinstance(old, (int, float)) and isinstance(new, (int, float)) and old:
+        return abs(new - old) / abs(old) > BUDGET_TOLERANCE
+    if field == "deadline" and old and new:
+        # Same day, same feasibility
+        return str(old)[:10] != str(new)[:10]
+    return old != new
+
+
+def rederived_fields(previous, known):
+    """Inferred fields of previous that depend on a structured value known has changed"""
+    changed = [field for field in STRUCTURED_FIELDS if field in known and has_changed(field, previous.get(field), known[field])]
+    return sorted({dependent for field in changed for dependent in DEPENDENT_FIELDS.get(field, ())})
+
+
+def reused_fields(tender_json, known):
+    """
+    Fields to take from an analysed near duplicate of tender_json, with
+    known (its own structured fields) winning; the dependent fields of
+    changed values are left out, so only they are inferred again.
+    Empty when reuse is off or there is no near duplicate.
+    """
+    if not ANALYSIS_REUSE_ENABLED:
+        return {}
+    match = get_analysis_reuse().find(tender_json)
+    if match is None:
+        return {}
+    tender_id, previous, score = match
+    stale = rederived_fields(previous, known)
+    print(f"♻️ Tender {tender_json.get('id')} is a near duplicate of {tender_id} ({score:.0%})"
+          + (f", re-deriving {', '.join(stale)}" if stale else ""))
+    reused = {key: value for key, value in previous.items() if key not in STRUCTURED_FIELDS and key not in stale}
+    return {**reused, **known}
+
+
+def remember_analysis(tender_json, analysis):
+    if ANALYSIS_REUSE_ENABLED:
+        get_analysis_reuse().remember(tender_json, analysis)
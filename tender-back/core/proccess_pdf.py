@@ -2,47 +2,84 @@ import os
 from openpyxl import Workbook
 from core.extract_to_excel import format_excel
 from core.data_extractor import extract_text_from_pdf
-from core.analyze_tender import analyze_tender
+from core.analyze_tender import ANALYSIS_MODEL, ANALYSIS_SYSTEM, build_analysis_prompt
+from core.claude_batches import batch_request, run_structured_batch
+from core.long_document import map_chunks, reduce_partials
+from core.structured_output import ANALYSIS_TOOL
+from core.tender_fields import ANALYSIS_FIELDS
+from core.analysis_executor import run_analysis
 import streamlit as st
 
 UPLOAD_DIR = "../uploaded/"
 TEXT_DIR = "../extracted/"
+FILENAME_COLUMN = len(ANALYSIS_FIELDS) + 1
 
-def process_all_pdfs(client):
+
+def write_result_row(ws, row, result, filename):
+    for col_index, key in enumerate(ANALYSIS_FIELDS, start=1):
+        value = result.get(key, "")
+        if isinstance(value, list):
+            value = ", ".join(value)
+        elif isinstance(value, bool):
+            value = str(value)
+        ws.cell(row=row, column=col_index, value=value)
+    ws.cell(row=row, column=FILENAME_COLUMN, value=filename)
+
+
+def analyze_pdfs_in_batch(client, pdf_texts):
+    """
+    {filename: analysis} for {filename: text}, submitted as one Message Batch
+    of forced tool calls. Long texts go in as their map chunks (as in
+    analyze_long_tender) and the partial answers are merged per file.
+    """
+    chunk_ids = {}
+    requests = []
+    for i, filename in enumerate(pdf_texts):
+        chunk_ids[filename] = []
+        for j, chunk in enumerate(map_chunks(pdf_texts[filename])):
+            custom_id = f"pdf-{i}-{j}"
+            chunk_ids[filename].append(custom_id)
+            requests.append(batch_request(custom_id, ANALYSIS_MODEL, build_analysis_prompt(chunk),
+                                          max_tokens=1024, system=ANALYSIS_SYSTEM, tool=ANALYSIS_TOOL))
+    answers = run_structured_batch(client, requests, label="analyze_pdf_batch")
+    return {
+        filename: reduce_partials([answers.get(custom_id) or {"error": "Claude returned no analysis."}
+                                   for custom_id in custom_ids])
+        for filename, custom_ids in chunk_ids.items()
+    }
+
+
+def process_all_pdfs(client, use_batch=False, async_client=None):
     wb = Workbook()
     ws = wb.active
     if ws is None:
         ws = wb.create_sheet("Аналіз тендерів")
     else:
         ws.title = "Аналіз тендерів"
-    ws, columns = format_excel(ws)
+    ws = format_excel(ws)
 
-    row = 2
+    pdf_texts = {}
     for filename in os.listdir(UPLOAD_DIR):
         if filename.endswith(".pdf"):
             pdf_path = os.path.join(UPLOAD_DIR, filename)
             try:
-                text = extract_text_from_pdf(pdf_path)
-                result = analyze_tender(text, client)
-
-                if result:
-                    for col_index, key in enumerate([
-                        "title", "issuer", "deadline", "budget", "location",
-                        "project_type", "required_documents", "avk5_required",
-                        "technical_specs", "payment_terms", "resource_requirements",
-                        "timeline_feasibility", "profitability"
-                    ], start=1):
-                        value = result.get(key, "")
-                        if isinstance(value, list):
-                            value = ", ".join(value)
-                        elif isinstance(value, bool):
-                            value = str(value)
-                        ws.cell(row=row, column=col_index, value=value)
-                    ws.cell(row=row, column=len(columns), value=filename)
-                    row += 1
+                pdf_texts[filename] = extract_text_from_pdf(pdf_path)
             except Exception as e:
                 st.warning(f"⚠️ Error processing {filename}: {e}")
 
+    if use_batch:
+        results = analyze_pdfs_in_batch(client, pdf_texts)
+    else:
+        results = run_analysis(pdf_texts.items(), client=async_client)
+
+    row = 2
+    for filename, result in results.items():
+        if result and "error" not in result:
+            write_result_row(ws, row, result, filename)
+            row += 1
+        elif result:
+            st.warning(f"⚠️ Error processing {filename}: {result['error']}")
+
     output_path = os.path.join(TEXT_DIR, "tender_analysis.xlsx")
     wb.save(output_path)
-    return output_path
\ No newline at end of file
+    return output_path
@@ -0,0 +1,230 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+load_dotenv()
+
+from core.http_fixtures import mount_fixtures  # noqa: E402
+
+PROZORRO_API_URL = os.getenv("PROZORRO_API_URL", "https://public-api.prozorro.gov.ua/api/2.5")
+POOL_SIZE = int(os.getenv("PROZORRO_MAX_WORKERS", "8"))
+# Shared budget of all requests to the public API, which rate-limits with 429s; the
+# detail pool only pays off while the cap is above the sequential (1 / latency) rate
+REQUESTS_PER_SECOND = float(os.getenv("PROZORRO_REQUESTS_PER_SECOND", "10"))
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+LATENCY_WINDOW = 1000
+
+
+class TokenBucket:
+    """
+    Process-wide request budget with adaptive rate.
+    A 429 halves the refill rate (never below min_rate); every success
+    then nudges it back up towards the configured rate.
+    """
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, capacity=None, min_rate=0.5):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate) if rate > 0 else 0
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.max_rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+    def throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def recover(self):
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class EndpointStats:
+    """Request/error/retry counters and a latency window for one endpoint"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.status_counts = {}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, latency, status=None, error=False, retried=False):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(latency)
+            if status is not None:
+                self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            if error:
+                self.errors += 1
+            if retried:
+                self.retries += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            snapshot = {
+                "requests": self.requests,
+                "errors": self.errors,
+                "retries": self.retries,
+                "status_counts": dict(self.status_counts),
+            }
+        if latencies:
+            def pct(p):
+                return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+            snapshot.update({"p50_ms": pct(0.5), "p95_ms": pct(0.95), "max_ms": round(latencies[-1] * 1000, 1)})
+        return snapshot
+
+
+def retry_after_seconds(response):
+    """Retry-After as seconds (delta or HTTP date), None if absent"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class ProzorroClient:
+    """
+    Shared ProZorro public API client: pooled keep-alive session, connect/read
+    timeouts, jittered exponential backoff on 429/5xx that honours
+    Retry-After, a token-bucket limiter and per-endpoint counters.
+    """
+
+    def __init__(self, base_url=PROZORRO_API_URL, pool_size=POOL_SIZE, requests_per_second=REQUESTS_PER_SECOND,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), max_retries=MAX_RETRIES, limiter=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.limiter = limiter or TokenBucket(requests_per_second)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # HTTP_FIXTURES_MODE=record/replay: captured to or served from the fixtures
+        mount_fixtures(self.session, "prozorro", pool_connections=pool_size, pool_maxsize=pool_size)
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def _endpoint_stats(self, endpoint):
+        with self._stats_lock:
+            return self._stats.setdefault(endpoint, EndpointStats())
+
+    def get(self, path, params=None, endpoint=None):
+        """GET {base_url}/{path} and return the decoded JSON body"""
+        return self.request("GET", path, params=params, endpoint=endpoint).json()
+
+    def request(self, method, path, endpoint=None, **kwargs):
+        """path is relative to base_url, or an absolute url (document downloads)"""
+        if path.startswith(("http://", "https://")):
+            url = path
+        else:
+            url = f"{self.base_url}/{path.lstrip('/')}"
+        stats = self._endpoint_stats(endpoint or path.split("/")[0])
+        kwargs.setdefault("timeout", self.timeout)
+
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                stats.record(time.perf_counter() - start, error=True, retried=attempt < self.max_retries)
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+
+            latency = time.perf_counter() - start
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                stats.record(latency, response.status_code, error=True, retried=True)
+                if response.status_code == 429:
+                    self.limiter.throttle()
+                delay = retry_after_seconds(response)
+                response.close()
+                time.sleep(min(BACKOFF_MAX, delay) if delay is not None else self._backoff(attempt))
+                continue
+
+            stats.record(latency, response.status_code, error=response.status_code >= 400)
+            response.raise_for_status()
+            self.limiter.recover()
+            return response
+
+    @staticmethod
+    def _backoff(attempt):
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    def get_tender(self, tender_id):
+        return self.get(f"tenders/{tender_id}", endpoint="tenders/{id}").get("data", {})
+
+    def feed_page(self, offset=None, descending=False, opt_fields=None, limit=100):
+        """
+        One page of the tenders feed.
+        Returns (entries, next_offset); next_offset is the server-issued cursor
+        from next_page.offset and must be passed back verbatim.
+        """
+        params = {"limit": limit}
+        if opt_fields:
+            params["opt_fields"] = ",".join(opt_fields)
+        if descending:
+            params["descending"] = 1
+        if offset is not None:
+            params["offset"] = offset
+        payload = self.get("tenders", params=params, endpoint="tenders")
+        return payload.get("data", []), payload.get("next_page", {}).get("offset")
+
+    def stats(self):
+        with self._stats_lock:
+            endpoints = dict(self._stats)
+        return {
+            "base_url": self.base_url,
+            "rate_limit": {"configured_rps": self.limiter.max_rate, "current_rps": round(self.limiter.rate, 2)},
+            "endpoints": {name: s.snapshot() for name, s in endpoints.items()},
+        }
+
+    def close(self):
+        self.session.close()
+
+
+@lru_cache(maxsize=None)
+def get_prozorro_client():
+    """Process-wide client, so the pool and the rate budget are shared"""
+    return ProzorroClient()
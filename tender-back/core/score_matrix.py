@@ -6,6 +6,7 @@ import pandas as pd
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill
 from openpyxl.utils import get_column_letter
+from core.topic_matcher import get_topic_matcher
 
 # Ukrainian construction standards database (sample data)
 AVK5_STANDARDS = {
@@ -317,10 +318,11 @@ class ProfitabilityAnalyzer:
 
         # Extract tender value safely
         tender_value = tender_data.get("budget", 0)
-        try:
-            tender_value = float(str(tender_value).replace(",", "").split()[0])
-        except:
-            tender_value = 0.0
+        if not isinstance(tender_value, (int, float)):
+            try:
+                tender_value = float(str(tender_value).replace(",", "").split()[0])
+            except:
+                tender_value = 0.0
 
         gross_profit = tender_value - estimated_cost
         profit_margin = gross_profit / tender_value if tender_value else 0
@@ -340,6 +342,11 @@ class ProfitabilityAnalyzer:
         # Risk scoring
         risk_factors = self.assess_risks(tender_data)
 
+        # Topic classification (same matcher as the downloader)
+        topic_hits = get_topic_matcher().classify(
+            f"{tender_data.get('title', '')} {tender_data.get('technical_specs', '')}"
+        )
+
         # ROI Score
         roi_score = self.calculate_roi_score(
             profit_margin,
@@ -358,6 +365,7 @@ class ProfitabilityAnalyzer:
             "timeline_feasibility": timeline_feasibility,
             "risk_factors": risk_factors,
             "roi_score": roi_score,
+            "topic_hits": topic_hits,
             "recommendation": "BID" if roi_score >= 70 else "NO-BID"
         }
 
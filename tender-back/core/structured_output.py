@@ -0,0 +1,335 @@
+import json
+import time
+import threading
+
+from core.json_stream import JSONFieldStream
+from core.llm_cache import LLM_CACHE_ENABLED, cache_key, get_llm_cache
+from core.llm_telemetry import create_message, current_endpoint, llm_endpoint, record_call
+from core.tender_fields import ANALYSIS_FIELDS
+
+ANALYSIS_TOOL_NAME = "record_tender_analysis"
+REASK_MAX_TOKENS = 512
+# invalid_fields reason for every field of an answer that did not call the tool
+NO_TOOL_CALL = "no tool call"
+# Keys written by older prompts, still found in cached answers
+LEGACY_FIELDS = {"pyment_terms": "payment_terms"}
+
+STRING = {"type": "string"}
+FIELD_SCHEMAS = {
+    "title": STRING,
+    "issuer": STRING,
+    "deadline": STRING,
+    "budget": {"type": ["string", "number"]},
+    "location": STRING,
+    "project_type": STRING,
+    "required_documents": {"type": "array", "items": STRING},
+    "avk5_required": {"type": "boolean"},
+    "technical_specs": STRING,
+    "payment_terms": STRING,
+    "resource_requirements": STRING,
+    "timeline_feasibility": STRING,
+    "profitability": STRING,
+}
+# Per-field rules, sent as the descriptions in the tool's input schema; the tool is part of
+# the cached prefix of every analysis request (see ANALYSIS_INSTRUCTIONS)
+FIELD_DESCRIPTIONS = {
+    "title": "Повна офіційна назва предмета закупівлі з оголошення, без службових префіксів на кшталт "
+             "«Оголошення про проведення відкритих торгів». Код ДК 021:2015, якщо він є в назві, залишайте.",
+    "issuer": "Повна назва замовника або організатора закупівлі так, як її наведено в документації, без коду ЄДРПОУ.",
+    "deadline": "Кінцевий строк подання тендерних пропозицій у форматі ISO 8601 зі зміщенням від UTC, як у "
+                "структурованих даних ProZorro (наприклад «2025-03-14T18:00:00+02:00»); час у документації — "
+                "київський. Не плутайте його зі строком виконання робіт, строком дії договору чи періодом уточнень.",
+    "budget": "Очікувана вартість закупівлі або гранична сума контракту: число й валюта з позначкою, чи враховано "
+              "ПДВ (наприклад «1 250 000 UAH з ПДВ»). Якщо закупівлю поділено на лоти, вкажіть загальну суму й "
+              "суми лотів.",
+    "location": "Місце реалізації або виконання робіт: населений пункт, область і, якщо є, адреса об'єкта або місце "
+                "поставки. Адреса замовника підходить лише тоді, коли іншого місця не вказано.",
+    "project_type": "Тип проєкту одним-двома словами: будівництво, капітальний ремонт, поточний ремонт, "
+                    "реконструкція, постачання товарів, IT‑послуги, проєктні роботи або послуги; за потреби "
+                    "уточніть у дужках.",
+    "required_documents": "Усі документи, які вимагаються для участі або кваліфікації, — з основного тексту та всіх "
+                          "завантажених файлів: кваліфікаційних критеріїв, підстав для відмови за статтею 17 Закону "
+                          "«Про публічні закупівлі» (або пунктом 47 Особливостей), технічної специфікації й "
+                          "додатків. Кожен документ окремим елементом, стислою назвою без нумерації, пояснень і "
+                          "повторів. Документи, які подає лише переможець, позначайте «(переможець)».",
+    "avk5_required": "true лише тоді, коли документація прямо вимагає кошторис, договірну ціну чи розрахунки, "
+                     "складені в програмному комплексі АВК‑5 (або в сумісному з ним). Вимога подати кошторис без "
+                     "згадки АВК‑5 — це false.",
+    "technical_specs": "Стисле резюме технічних вимог у 3–7 реченнях: що саме закуповується або які роботи "
+                       "виконуються, ключові обсяги й кількості, матеріали, стандарти, гарантійні строки, вимоги до "
+                       "обладнання. Орієнтуйтесь на розділи та вкладені файли «Технічна специфікація», «Технічне "
+                       "завдання», «Опис предмету закупівлі» тощо.",
+    "payment_terms": "Умови оплати: форма (аванс із розміром у відсотках, поетапна, за фактом виконання), строк "
+                     "оплати в календарних чи банківських днях, підстава (акти КБ‑2в і довідки КБ‑3, видаткові "
+                     "накладні) і джерело фінансування, якщо його вказано.",
+    "resource_requirements": "Ресурси, які повинен надати підрядник: персонал (кваліфікація, кількість), техніка й "
+                             "обладнання (власні чи орендовані), будматеріали, ПММ, досвід виконання аналогічних "
+                             "договорів. Беріть дані з розділів «Обсяг робіт», «Вимоги до ресурсів» і доданих "
+                             "файлів «Відомість ресурсів» тощо.",
+    "timeline_feasibility": "Чи реалістичні строки виконання («реалістичні», «обмежені, але можливі», "
+                            "«нереалістичні») з коротким поясненням: зіставте строк з обсягом робіт, сезонністю "
+                            "(зовнішні роботи взимку), часом на поставку матеріалів і тривалістю процедури до "
+                            "підписання договору.",
+    "profitability": "«прибутковий», «ризикований» або «збитковий» з поясненням в одне-два речення: чи покриває "
+                     "бюджет обсяг робіт за поточними цінами, чи є аванс, наскільки штрафні санкції та забезпечення "
+                     "пропозиції й виконання договору зменшують маржу.",
+}
+JSON_TYPES = {"string": str, "number": (int, float), "boolean": bool, "array": list, "object": dict}
+
+
+def analysis_tool(fields=ANALYSIS_FIELDS):
+    """Tool whose input schema is the analysis JSON, restricted to fields"""
+    return {
+        "name": ANALYSIS_TOOL_NAME,
+        "description": "Записати результат аналізу тендеру за схемою з інструкцій.",
+        "input_schema": {
+            "type": "object",
+            "properties": {field: {**FIELD_SCHEMAS[field], "description": FIELD_DESCRIPTIONS[field]} for field in fields},
+            "required": list(fields),
+        },
+    }
+
+
+ANALYSIS_TOOL = analysis_tool()
+
+
+def normalize_analysis(data):
+    """Legacy key names mapped to the current schema"""
+    if not isinstance(data, dict):
+        return data
+    normalized = {key: value for key, value in data.items() if key not in LEGACY_FIELDS}
+    for legacy, current in LEGACY_FIELDS.items():
+        if legacy in data:
+            normalized.setdefault(current, data[legacy])
+    return normalized
+
+
+def matches_schema(value, schema):
+    types = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+    for name in types:
+        # bool is an int subclass, but not a JSON number
+        if isinstance(value, JSON_TYPES[name]) and not (name == "number" and isinstance(value, bool)):
+            if name == "array" and "items" in schema:
+                return all(matches_schema(item, schema["items"]) for item in value)
+            return True
+    return False
+
+
+def invalid_fields(data, tool):
+    """{field: reason} for the tool's required fields that are missing or of the wrong type"""
+    schema = tool["input_schema"]
+    invalid = {}
+    for field in schema["required"]:
+        if field not in data:
+            invalid[field] = "missing"
+        elif not matches_schema(data[field], schema["properties"][field]):
+            invalid[field] = f"expected {schema['properties'][field]['type']}, got {type(data[field]).__name__}"
+    return invalid
+
+
+def tool_input(response, name=ANALYSIS_TOOL_NAME):
+    """Input of the response's tool_use block, None when there is none (prose is not scraped)"""
+    for block in response.content or []:
+        if getattr(block, "type", None) == "tool_use" and getattr(block, "name", None) == name:
+            return dict(block.input)
+    return None
+
+
+def missing_tool_call(tool):
+    """invalid_fields for an answer without a tool call: every field, so all of them are re-asked"""
+    return dict.fromkeys(tool["input_schema"]["required"], NO_TOOL_CALL)
+
+
+def tool_choice(tool):
+    return {"tools": [tool], "tool_choice": {"type": "tool", "name": tool["name"]}}
+
+
+def reask_prompt(prompt, invalid):
+    """Follow-up asking only for the fields that failed validation"""
+    problems = "\n".join(f"- {field}: {reason}" for field, reason in invalid.items())
+    return f"""{prompt}
+Попередня відповідь містила некоректні поля:
+{problems}
+Поверніть лише ці поля відповідно до схеми.
+"""
+
+
+def reask_request(request, invalid):
+    """Executor request dict for the follow-up on invalid fields of request's answer"""
+    return {
+        **request,
+        "prompt": reask_prompt(request["prompt"], invalid),
+        "tool": analysis_tool(list(invalid)),
+        "max_tokens": REASK_MAX_TOKENS,
+        "label": f"{request.get('label', 'claude')}_reask",
+    }
+
+
+def merge_repaired(data, invalid, fixed):
+    """data with the invalid fields replaced by the re-asked values that validate"""
+    for field in invalid:
+        if isinstance(fixed, dict) and field in fixed and matches_schema(fixed[field], FIELD_SCHEMAS[field]):
+            data[field] = fixed[field]
+    return data
+
+
+class OutputStats:
+    """Schema-validation counters per label: failures (answers without a tool call among them), re-asks and their token cost"""
+
+    def __init__(self):
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, label, invalid, reask_counts=None, repaired=False):
+        with self._lock:
+            totals = self._totals.setdefault(label, dict.fromkeys(
+                ("responses", "parse_failures", "no_tool_calls", "invalid_fields", "reasks", "repaired",
+                 "reask_input_tokens", "reask_output_tokens"), 0))
+            totals["responses"] += 1
+            if invalid:
+                totals["parse_failures"] += 1
+                totals["invalid_fields"] += len(invalid)
+                totals["no_tool_calls"] += NO_TOOL_CALL in invalid.values()
+            if reask_counts is not None:
+                totals["reasks"] += 1
+                totals["repaired"] += int(repaired)
+                totals["reask_input_tokens"] += (reask_counts["input_tokens"] + reask_counts["cache_creation_input_tokens"]
+                                                 + reask_counts["cache_read_input_tokens"])
+                totals["reask_output_tokens"] += reask_counts["output_tokens"]
+        if invalid:
+            print(f"⚠️ {label}: invalid fields {sorted(invalid)}"
+                  + (f", re-ask {'repaired them' if repaired else 'did not repair them'}" if reask_counts else ""))
+
+    def snapshot(self):
+        with self._lock:
+            totals = {label: dict(values) for label, values in self._totals.items()}
+        for values in totals.values():
+            values["parse_failure_rate"] = round(values["parse_failures"] / values["responses"], 3)
+        return totals
+
+
+output_stats = OutputStats()
+
+
+def tool_asker(client, model, temperature=0.0, system=None):
+    """ask(tool, prompt, max_tokens, label) -> (tool input or None, usage counts), one forced tool call to model"""
+    def ask(tool, prompt, max_tokens, label):
+        kwargs = {"system": system} if system else {}
+        response, counts = create_message(
+            client,
+            label,
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            messages=[{"role": "user", "content": prompt}],
+            **tool_choice(tool),
+            **kwargs,
+        )
+        return normalize_analysis(tool_input(response, tool["name"])), counts
+
+    return ask
+
+
+def repair_answer(data, tool, prompt, label, ask):
+    """
+    (data, invalid, still_invalid) for a tool answer (data None: no tool
+    call): the invalid fields are re-asked once with ask (see tool_asker)
+    and the outcome recorded in output_stats. Raises ValueError when there
+    is still no answer at all.
+    """
+    invalid = invalid_fields(data, tool) if data is not None else missing_tool_call(tool)
+    data = data or {}
+    reask_counts = None
+    if invalid:
+        fixed, reask_counts = ask(analysis_tool(list(invalid)), reask_prompt(prompt, invalid),
+                                  REASK_MAX_TOKENS, f"{label}_reask")
+        merge_repaired(data, invalid, fixed)
+    still_invalid = invalid_fields(data, tool)
+    output_stats.record(label, invalid, reask_counts, repaired=bool(invalid) and not still_invalid)
+    if not data and invalid:
+        raise ValueError("Claude returned no tool call.")
+    return data, invalid, still_invalid
+
+
+def structured_completion(client, model, prompt, max_tokens, temperature=0.0, system=None, tool=ANALYSIS_TOOL,
+                          cache=None, label="claude"):
+    """
+    Analysis dict from a forced tool call whose input schema is the output
+    schema. Fields that still fail validation are re-asked once in a small
+    follow-up restricted to them, instead of rerunning the whole prompt.
+    An answer without a tool call counts as a parse failure and is re-asked
+    whole. Validated answers go through the LLM cache like cached_completion.
+    Raises ValueError when no tool call came back even then.
+    """
+    cache = cache or (get_llm_cache() if LLM_CACHE_ENABLED else None)
+    # The tool is part of the request, so it is part of the key
+    key = cache_key(model, [system or "", tool], prompt, temperature, max_tokens)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return normalize_analysis(json.loads(cached))
+
+    ask = tool_asker(client, model, temperature, system)
+    data, _ = ask(tool, prompt, max_tokens, label)
+    data, _, still_invalid = repair_answer(data, tool, prompt, label, ask)
+    if cache is not None and not still_invalid:
+        cache.put(key, model, json.dumps(data, ensure_ascii=False))
+    return data
+
+
+def streamed_structured_completion(client, model, prompt, max_tokens, temperature=0.0, system=None,
+                                   tool=ANALYSIS_TOOL, cache=None, label="claude", endpoint=None):
+    """
+    structured_completion over the streaming messages API, for use with
+    yield from: yields (key, value) for each field of the tool input as soon
+    as Claude has finished writing it, and returns the validated dict. Fields
+    changed by the re-ask are yielded again; a cached answer is yielded
+    whole. Calls are recorded under endpoint when given, since the generator
+    may outlive the caller's context.
+    """
+    cache = cache or (get_llm_cache() if LLM_CACHE_ENABLED else None)
+    key = cache_key(model, [system or "", tool], prompt, temperature, max_tokens)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            data = normalize_analysis(json.loads(cached))
+            yield from data.items()
+            return data
+
+    kwargs = {"system": system} if system else {}
+    parser = JSONFieldStream()
+    start = time.perf_counter()
+    try:
+        with client.messages.stream(
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            messages=[{"role": "user", "content": prompt}],
+            **tool_choice(tool),
+            **kwargs,
+        ) as stream:
+            for event in stream:
+                delta = getattr(event, "delta", None)
+                if event.type == "content_block_delta" and getattr(delta, "type", None) == "input_json_delta":
+                    for field, value in parser.feed(delta.partial_json):
+                        yield LEGACY_FIELDS.get(field, field), value
+            response = stream.get_final_message()
+    except Exception as e:
+        record_call(label, model, None, time.perf_counter() - start, error=type(e).__name__, endpoint=endpoint)
+        raise
+    record_call(label, model, getattr(response, "usage", None), time.perf_counter() - start, endpoint=endpoint)
+
+    ask = tool_asker(client, model, temperature, system)
+
+    def ask_under_endpoint(*args):
+        with llm_endpoint(endpoint or current_endpoint.get()):
+            return ask(*args)
+
+    data = normalize_analysis(tool_input(response, tool["name"]))
+    data, invalid, still_invalid = repair_answer(data, tool, prompt, label, ask_under_endpoint)
+    for field in invalid:
+        if field in data:
+            yield field, data[field]
+    if cache is not None and not still_invalid:
+        cache.put(key, model, json.dumps(data, ensure_ascii=False))
+    return data
@@ -0,0 +1,162 @@
+import os
+import json
+import zlib
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from core.prozorro_client import get_prozorro_client
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.getenv("TENDER_CACHE_PATH", os.path.join(BASE_DIR, "../data/tender_cache.db"))
+# Served without asking ProZorro at all while younger than this
+FRESH_SECONDS = float(os.getenv("TENDER_CACHE_FRESH_SECONDS", "300"))
+MEMORY_ITEMS = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS http_cache (
+    hash          TEXT PRIMARY KEY,
+    etag          TEXT,
+    last_modified TEXT,
+    date_modified TEXT,
+    fetched_at    REAL NOT NULL,
+    body          BLOB NOT NULL
+)
+"""
+
+
+class TenderCache:
+    """
+    Local HTTP cache for GET /tenders/{hash}.
+    Keeps the body with its ETag, Last-Modified and dateModified; fresh or
+    dateModified-confirmed entries are served from memory/disk, stale ones
+    are revalidated with a conditional GET and a 304 costs no body transfer.
+    Returned tenders are shared with the cache: treat them as read-only.
+    """
+
+    def __init__(self, path=CACHE_PATH, client=None, fresh_seconds=FRESH_SECONDS, memory_items=MEMORY_ITEMS):
+        self.path = path
+        self.client = client
+        self.fresh_seconds = fresh_seconds
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.counters = {"fresh_hits": 0, "revalidated": 0, "misses": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def _remember(self, tender_hash, entry):
+        with self._lock:
+            self._memory[tender_hash] = entry
+            self._memory.move_to_end(tender_hash)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def lookup(self, tender_hash):
+        with self._lock:
+            entry = self._memory.get(tender_hash)
+            if entry is not None:
+                self._memory.move_to_end(tender_hash)
+                return entry
+        row = self._connect().execute(
+            "SELECT etag, last_modified, date_modified, fetched_at, body FROM http_cache WHERE hash = ?",
+            (tender_hash,),
+        ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, date_modified, fetched_at, body = row
+        entry = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "date_modified": date_modified,
+            "fetched_at": fetched_at,
+            "data": json.loads(zlib.decompress(body).decode("utf-8")),
+        }
+        self._remember(tender_hash, entry)
+        return entry
+
+    def store(self, tender_hash, data, etag=None, last_modified=None):
+        entry = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "date_modified": data.get("dateModified"),
+            "fetched_at": time.time(),
+            "data": data,
+        }
+        body = zlib.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO http_cache (hash, etag, last_modified, date_modified, fetched_at, body) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (tender_hash, etag, last_modified, entry["date_modified"], entry["fetched_at"], body),
+            )
+        self._remember(tender_hash, entry)
+        return entry
+
+    def touch(self, tender_hash, entry):
+        entry["fetched_at"] = time.time()
+        with self._connect() as conn:
+            conn.execute("UPDATE http_cache SET fetched_at = ? WHERE hash = ?", (entry["fetched_at"], tender_hash))
+
+    def get_tender(self, tender_hash, date_modified=None):
+        """
+        Tender by hash. Pass the dateModified from a feed listing when known:
+        a matching cached revision is then served without any request.
+        """
+        entry = self.lookup(tender_hash)
+        if entry is not None:
+            fresh = time.time() - entry["fetched_at"] < self.fresh_seconds
+            if fresh or (date_modified and entry["date_modified"] == date_modified):
+                self._count("fresh_hits")
+                return entry["data"]
+
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        client = self.client or get_prozorro_client()
+        response = client.request("GET", f"tenders/{tender_hash}", endpoint="tenders/{id}", headers=headers)
+        if response.status_code == 304 and entry is not None:
+            self._count("revalidated")
+            self.touch(tender_hash, entry)
+            return entry["data"]
+
+        self._count("misses")
+        data = response.json().get("data", {})
+        entry = self.store(
+            tender_hash,
+            data,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        return entry["data"]
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        counters["memory_items"] = len(self._memory)
+        return counters
+
+
+@lru_cache(maxsize=None)
+def get_tender_cache():
+    return TenderCache()
@@ -0,0 +1,108 @@
+from datetime import datetime
+
+# Fields read straight from the ProZorro JSON instead of asking Claude
+STRUCTURED_FIELDS = ("title", "issuer", "budget", "currency", "deadline", "location")
+# Full analysis schema, in ANALYSIS_INSTRUCTIONS order
+ANALYSIS_FIELDS = (
+    "title", "issuer", "deadline", "budget", "location",
+    "project_type", "required_documents", "avk5_required",
+    "technical_specs", "payment_terms", "resource_requirements",
+    "timeline_feasibility", "profitability",
+)
+
+
+def parse_amount(value):
+    """value.amount as a float; None when missing or not a number"""
+    if isinstance(value, bool) or value in (None, ""):
+        return None
+    try:
+        return float(str(value).replace(" ", "").replace(" ", "").replace(",", "."))
+    except ValueError:
+        return None
+
+
+def iso_deadline(value):
+    """ProZorro timestamp normalized to ISO 8601 with its UTC offset; None when unparseable"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).isoformat()
+    except ValueError:
+        return None
+
+
+def structured_fields(tender_json):
+    """
+    Typed values of STRUCTURED_FIELDS from a ProZorro tender: numeric
+    budget, ISO deadline, "locality, region" location. Fields the tender
+    does not have are left out, so the LLM can still be asked for them.
+    """
+    entity = tender_json.get("procuringEntity") or {}
+    address = entity.get("address") or {}
+    value = tender_json.get("value") or {}
+    fields = {
+        "title": (tender_json.get("title") or "").strip(),
+        "issuer": (entity.get("name") or "").strip(),
+        "budget": parse_amount(value.get("amount")),
+        "currency": value.get("currency") or ("UAH" if value.get("amount") is not None else None),
+        "deadline": iso_deadline((tender_json.get("tenderPeriod") or {}).get("endDate")),
+        "location": ", ".join(part for part in (address.get("locality"), address.get("region")) if part),
+    }
+    return {key: value for key, value in fields.items() if value not in (None, "")}
+
+
+def inference_fields(known, fields=ANALYSIS_FIELDS):
+    """Fields of the schema the LLM still has to fill"""
+    return [field for field in fields if field not in known]
+
+
+def with_structured_fields(analysis, known):
+    """LLM analysis with the structured values taking precedence, in schema order"""
+    if analysis and "error" in analysis:
+        return analysis
+    merged = {**(analysis or {}), **known}
+    rank = {key: i for i, key in enumerate(ANALYSIS_FIELDS)}
+    return {key: merged[key] for key in sorted(merged, key=lambda key: rank.get(key, len(rank)))}
+
+
+def build_tender_text(tender_json):
+    title = tender_json.get("title", "")
+    description = tender_json.get("description", "")
+    issuer = tender_json.get("procuringEntity", {}).get("name", "")
+    address = tender_json.get("procuringEntity", {}).get("address", {})
+    location = f"{address.get('locality', '')}, {address.get('region', '')}".strip(", ")
+    budget = tender_json.get("value", {}).get("amount", "N/A")
+    currency = tender_json.get("value", {}).get("currency", "UAH")
+    deadline = tender_json.get("tenderPeriod", {}).get("endDate", "Not specified")
+
+    items = tender_json.get("items", [])
+    item_descriptions = [
+        f"- {item.get('description', '')} ({item.get('classification', {}).get('description', '')})"
+        for item in items
+    ]
+
+    tech_specs = []
+    for criterion in tender_json.get("criteria", []):
+        for group in criterion.get("requirementGroups", []):
+            for req in group.get("requirements", []):
+                req_title = req.get("title", "")
+                expected = req.get("expectedValues", []) or [req.get("expectedValue", "")]
+                if req_title:
+                    tech_specs.append(f"{req_title}: {', '.join(str(v) for v in expected if v)}")
+
+    return f"""
+Tender Title: {title}
+Issuer: {issuer}
+Location: {location}
+Budget: {budget} {currency}
+Deadline: {deadline}
+
+Goods/Services:
+{chr(10).join(item_descriptions)}
+
+Description:
+{description}
+
+Technical Requirements:
+{chr(10).join(tech_specs)}
+""".strip()
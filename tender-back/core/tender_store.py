@@ -0,0 +1,253 @@
+import os
+import json
+import zlib
+import sqlite3
+import threading
+from functools import lru_cache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.getenv("TENDER_DB_PATH", os.path.join(BASE_DIR, "../data/tenders.db"))
+# Where the downloader used to write ProZorro_{id}.json files (relative to tender-back)
+LEGACY_TENDER_DIR = os.path.join(BASE_DIR, "../../tenders")
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tenders (
+    id            TEXT PRIMARY KEY,
+    tender_id     TEXT,
+    date_modified TEXT,
+    cpv           TEXT,
+    region        TEXT,
+    budget        REAL,
+    currency      TEXT,
+    title         TEXT,
+    data          BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tenders_tender_id ON tenders(tender_id);
+CREATE INDEX IF NOT EXISTS idx_tenders_date_modified ON tenders(date_modified);
+CREATE INDEX IF NOT EXISTS idx_tenders_cpv ON tenders(cpv);
+CREATE INDEX IF NOT EXISTS idx_tenders_region ON tenders(region, budget);
+CREATE INDEX IF NOT EXISTS idx_tenders_budget ON tenders(budget);
+"""
+
+UPSERT_SQL = """
+INSERT INTO tenders (id, tender_id, date_modified, cpv, region, budget, currency, title, data)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    tender_id = excluded.tender_id,
+    date_modified = excluded.date_modified,
+    cpv = excluded.cpv,
+    region = excluded.region,
+    budget = excluded.budget,
+    currency = excluded.currency,
+    title = excluded.title,
+    data = excluded.data
+WHERE excluded.date_modified IS NULL
+   OR tenders.date_modified IS NULL
+   OR excluded.date_modified >= tenders.date_modified
+"""
+
+SUMMARY_COLUMNS = "id, tender_id, title, date_modified, budget, currency, cpv, region"
+
+
+def compress(tender_data):
+    return zlib.compress(json.dumps(tender_data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def decompress(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def index_row(tender_data):
+    """Indexed columns + compressed body for one ProZorro tender"""
+    items = tender_data.get("items") or [{}]
+    cpv = (items[0].get("classification") or {}).get("id")
+    address = (tender_data.get("procuringEntity") or {}).get("address") or {}
+    value = tender_data.get("value") or {}
+    budget = value.get("amount")
+    return (
+        tender_data["id"],
+        tender_data.get("tenderID"),
+        tender_data.get("dateModified"),
+        cpv,
+        address.get("region"),
+        float(budget) if isinstance(budget, (int, float)) else None,
+        value.get("currency"),
+        tender_data.get("title"),
+        compress(tender_data),
+    )
+
+
+def summary_from_row(row):
+    """Same shape the downloader and UI have always used for tender lists"""
+    tender_hash, tender_id, title, date_modified, budget, currency, cpv, region = row
+    return {
+        "id": tender_hash,
+        "tender_id": tender_id,
+        "title": title or "Без назви",
+        "date": date_modified or "",
+        "budget": budget or 0,
+        "currency": currency or "UAH",
+        "cpv": cpv,
+        "region": region,
+        "file": f"ProZorro_{tender_hash}.json",
+    }
+
+
+class TenderStore:
+    """
+    SQLite store for downloaded ProZorro tenders.
+    Bodies are kept as zlib-compressed compact JSON; the columns used for
+    filtering and listing are indexed so listings never touch the bodies.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # One connection per thread: FastAPI runs sync endpoints in a thread pool
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def upsert_many(self, tenders):
+        """Insert or update tenders in one transaction; older revisions never overwrite newer ones"""
+        rows = [index_row(t) for t in tenders]
+        if not rows:
+            return 0
+        with self._connect() as conn:
+            conn.executemany(UPSERT_SQL, rows)
+        return len(rows)
+
+    def upsert(self, tender_data):
+        return self.upsert_many([tender_data])
+
+    def get(self, tender_id):
+        """Full tender by ProZorro hash (id) or by tenderID (UA-...)"""
+        column = "tender_id" if tender_id.startswith("UA-") else "id"
+        row = self._connect().execute(
+            f"SELECT data FROM tenders WHERE {column} = ? ORDER BY date_modified DESC LIMIT 1", (tender_id,)
+        ).fetchone()
+        return decompress(row[0]) if row else None
+
+    def date_modified(self, tender_ids):
+        """{id: dateModified} for the given hashes that are stored"""
+        result = {}
+        ids = list(tender_ids)
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            result.update(self._connect().execute(
+                f"SELECT id, date_modified FROM tenders WHERE id IN ({placeholders})", chunk
+            ).fetchall())
+        return result
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM tenders").fetchone()[0]
+
+    def _where(self, cpv=None, region=None, min_budget=None, max_budget=None, modified_since=None):
+        clauses, params = [], []
+        if cpv:
+            # CPV codes are hierarchical: "45" matches every construction code
+            # (range scan instead of LIKE so the cpv index is used); the
+            # two-digit division is kept, "30000000" must not match "33..."
+            code = cpv.split("-")[0]
+            prefix = code[:max(2, len(code.rstrip("0")))]
+            clauses.append("cpv >= ? AND cpv < ?")
+            params.extend([prefix, prefix + "\uffff"])
+        if region:
+            clauses.append("region = ?")
+            params.append(region)
+        if min_budget is not None:
+            clauses.append("budget >= ?")
+            params.append(min_budget)
+        if max_budget is not None:
+            clauses.append("budget <= ?")
+            params.append(max_budget)
+        if modified_since:
+            clauses.append("date_modified >= ?")
+            params.append(modified_since)
+        return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+    def list_tenders(self, page=1, page_size=DEFAULT_PAGE_SIZE, **filters):
+        """
+        One page of tender summaries, newest dateModified first.
+        Filters: cpv, region, min_budget, max_budget, modified_since.
+        """
+        page = max(int(page), 1)
+        page_size = min(max(int(page_size), 1), MAX_PAGE_SIZE)
+        where, params = self._where(**filters)
+        conn = self._connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM tenders {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT {SUMMARY_COLUMNS} FROM tenders {where} ORDER BY date_modified DESC LIMIT ? OFFSET ?",
+            params + [page_size, (page - 1) * page_size],
+        ).fetchall()
+        return {
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "tenders": [summary_from_row(row) for row in rows],
+        }
+
+    def iter_tenders(self, limit=None, batch_size=200, **filters):
+        """Full tenders, newest first, decompressed lazily in batches"""
+        where, params = self._where(**filters)
+        query = f"SELECT data FROM tenders {where} ORDER BY date_modified DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params = params + [limit]
+        cursor = self._connect().execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for (blob,) in rows:
+                yield decompress(blob)
+
+    def import_json_dir(self, directory=LEGACY_TENDER_DIR, batch_size=500):
+        """One-off migration of the old ProZorro_{id}.json files"""
+        batch, imported = [], 0
+        for filename in sorted(os.listdir(directory)):
+            if not (filename.startswith("ProZorro_") and filename.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+                    tender_data = json.load(f)
+            except Exception as e:
+                print(f"⚠️ Skipping {filename}: {e}")
+                continue
+            tender_data.setdefault("id", filename[len("ProZorro_"):-len(".json")])
+            batch.append(tender_data)
+            if len(batch) >= batch_size:
+                imported += self.upsert_many(batch)
+                batch = []
+        imported += self.upsert_many(batch)
+        print(f"📦 Imported {imported} tenders from {directory}")
+        return imported
+
+
+@lru_cache(maxsize=None)
+def get_tender_store(db_path=DB_PATH):
+    """Process-wide store; a fresh database picks up the legacy JSON folder once"""
+    is_new = not os.path.exists(db_path)
+    store = TenderStore(db_path)
+    if is_new and os.path.isdir(LEGACY_TENDER_DIR):
+        store.import_json_dir(LEGACY_TENDER_DIR)
+    return store
+
+
+if __name__ == "__main__":
+    import sys
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else LEGACY_TENDER_DIR
+    get_tender_store().import_json_dir(directory)
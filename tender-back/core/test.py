@@ -1,6 +1,5 @@
 import re
-import requests
-PROZORRO_API_URL = "https://public.api.openprocurement.org/api/2.3/tender"
+from core.prozorro_client import get_prozorro_client
 
 link = "https://prozorro.gov.ua/tender/UA-2025-07-04-004169-a?oldVersion=true"
 match = re.search(r"/(UA-\d{4}-\d{2}-\d{2}-\d{5,8}-[a-z])", link)
@@ -8,6 +7,6 @@ if not match:
     raise ValueError("❌ Не вдалося розпізнати ID тендера з посилання.")
 print(match.group(1))
 
-tender_url = f"{PROZORRO_API_URL}/{match.group(1)}"
-tender_response = requests.get(tender_url)
-print(tender_response.json())
+client = get_prozorro_client()
+print(client.get_tender(match.group(1)))
+print(client.stats())
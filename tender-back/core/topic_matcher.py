@@ -0,0 +1,163 @@
+import os
+import re
+import json
+import unicodedata
+from collections import deque
+from functools import lru_cache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+KEYWORDS_PATH = os.path.join(BASE_DIR, "../data/keywords.json")
+
+# Typographic apostrophes used interchangeably in Ukrainian text (комп’ютер / комп'ютер / компʼютер)
+APOSTROPHE_RE = re.compile("[’‘ʼʹ`´′＇]")
+TOKEN_RE = re.compile(r"[\w']+")
+
+# Inflectional endings, longest first. Only one is stripped, and never below MIN_STEM letters,
+# so "будівництво/будівництва/будівництві" -> "будівництв" and "ремонт" stays "ремонт".
+SUFFIXES = sorted(
+    (
+        "ями", "ами", "ові", "еві", "єві", "ого", "ому", "ими", "іми",
+        "ій", "ий", "их", "іх", "им", "ім", "ої", "ою", "ею", "єю",
+        "ах", "ях", "ам", "ям", "ом", "ем", "ів", "їв", "ей",
+        "а", "я", "о", "е", "є", "і", "ї", "у", "ю", "и", "й", "ь",
+    ),
+    key=len,
+    reverse=True,
+)
+MIN_STEM = 4
+TOKEN_CACHE_LIMIT = 200_000
+
+
+def normalize_text(text):
+    """NFKC, lower case, one apostrophe character"""
+    # (re.sub is an order of magnitude faster than str.translate on Cyrillic text)
+    return APOSTROPHE_RE.sub("'", unicodedata.normalize("NFKC", text or "").lower())
+
+
+def stem_word(word):
+    """Light Ukrainian stemmer: strip one inflectional ending"""
+    word = word.strip("'")
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[: -len(suffix)]
+    return word
+
+
+class TopicMatcher:
+    """
+    Classifies text against every topic of keywords.json in one pass.
+
+    Each keyword word is stemmed and compiled into an Aho–Corasick
+    automaton; a text token matches a stem found anywhere inside it, so
+    inflected forms ("ремонту", "капітального") and compounds ("капремонт",
+    "електромонтажні", "відеосистема") hit, as with the old substring check.
+    Multi-word keywords match on consecutive tokens. Text tokens are run
+    through the automaton once and memoised, so the per-text cost is one
+    dict lookup per token.
+    """
+
+    def __init__(self, topic_keywords):
+        self.topic_keywords = {topic: list(keywords) for topic, keywords in topic_keywords.items()}
+        self.topics = list(self.topic_keywords)
+
+        self._stems = []         # stem id -> stem
+        self._stem_ids = {}      # stem -> stem id
+        self._goto = [{}]        # node -> {char: child node}; node 0 is the root
+        self._fail = [0]         # node -> longest proper suffix node
+        self._out = [()]         # node -> ids of stems ending here, suffix matches included
+        self._phrases = {}       # first stem id -> [(rest stem ids, topic)]
+        for topic, keywords in self.topic_keywords.items():
+            for keyword in keywords:
+                words = [stem_word(w) for w in TOKEN_RE.findall(normalize_text(keyword))]
+                ids = tuple(self._add_stem(w) for w in words if w)
+                if ids:
+                    self._phrases[ids[0]].append((ids[1:], topic))
+        self._link()
+        self._token_cache = {}
+
+    @classmethod
+    def from_file(cls, path=KEYWORDS_PATH):
+        if not os.path.exists(path):
+            raise FileNotFoundError("❌ keywords.json not found!")
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _add_stem(self, stem):
+        if stem in self._stem_ids:
+            return self._stem_ids[stem]
+        stem_id = len(self._stems)
+        self._stems.append(stem)
+        self._stem_ids[stem] = stem_id
+        self._phrases[stem_id] = []
+        node = 0
+        for ch in stem:
+            child = self._goto[node].get(ch)
+            if child is None:
+                child = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[node][ch] = child
+            node = child
+        self._out[node] += (stem_id,)
+        return stem_id
+
+    def _link(self):
+        """Failure links, breadth first, each node inheriting the stems of its suffix"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] += self._out[self._fail[child]]
+                queue.append(child)
+
+    def _walk(self, token):
+        """Ids of every compiled stem found anywhere in token (memoised)"""
+        found = {}
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for ch in token:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for stem_id in out[node]:
+                found[stem_id] = None
+        hits = tuple(found)
+        if len(self._token_cache) >= TOKEN_CACHE_LIMIT:
+            self._token_cache.clear()
+        self._token_cache[token] = hits
+        return hits
+
+    def classify(self, text):
+        """{topic: number of keyword hits} for every topic"""
+        counts = dict.fromkeys(self.topics, 0)
+        cache = self._token_cache
+        token_stems = [
+            cache[token] if token in cache else self._walk(token)
+            for token in TOKEN_RE.findall(normalize_text(text))
+        ]
+        for i, stems in enumerate(token_stems):
+            for stem_id in stems:
+                for rest, topic in self._phrases[stem_id]:
+                    if not rest or all(
+                        i + j + 1 < len(token_stems) and next_id in token_stems[i + j + 1]
+                        for j, next_id in enumerate(rest)
+                    ):
+                        counts[topic] += 1
+        return counts
+
+    def matched_topics(self, text):
+        return [topic for topic, hits in self.classify(text).items() if hits]
+
+    def matches(self, text, topic):
+        return self.classify(text).get(topic, 0) > 0
+
+
+@lru_cache(maxsize=None)
+def get_topic_matcher(path=KEYWORDS_PATH):
+    """Process-wide matcher compiled once from keywords.json"""
+    return TopicMatcher.from_file(path)
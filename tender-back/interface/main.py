@@ -18,6 +18,11 @@ from core.downloader import download_prozorro_tenders
 from core.data_extractor import extract_text_from_pdf
 from core.analyze_link import analyze_tender_from_link
 from core.claude_client import get_claude_client
+from core.analysis_executor import run_analysis, tender_analysis_request
+from core.near_duplicates import remember_analysis
+from core.extract_to_excel import format_excel
+from core.tender_store import get_tender_store
+from core.topic_matcher import get_topic_matcher
 
 
 # Initialize session state
@@ -43,10 +48,11 @@ if "document_vault" not in st.session_state:
 st.sidebar.title("🛠️ Налаштування тендера")
 tab = st.sidebar.radio("Navigation", ["📥 Завантаження даних", "🔍 Аналіз тендерів", "🏢 Профіль компанії", "📊 Оцінка тендерних пропозицій"])
 
+topic_matcher = get_topic_matcher()
 keywords_option = st.sidebar.multiselect(
     "🔍 Select Tender Topics",
-    ["IT", "Construction", "Medical Equipment", "Transport", "Education"],
-    default=["Construction"]
+    topic_matcher.topics,
+    default=[t for t in ["Construction"] if t in topic_matcher.topics]
 )
 
 days_range = st.sidebar.slider(
@@ -77,10 +83,9 @@ if tab == "📥 Завантаження даних":
 
     st.header("📥 Завантажте тендерні пропозиції з ProZorro ")
     st.write("Якщо ви хочете аналізувати велику кількість випадкових тендерів")
-    # Load topics from keywords.json dynamically
-    with open("C:/Users/tashmatov/tender/data/keywords.json", "r", encoding="utf-8") as f:
-        topic_keywords = json.load(f)
-    topic_list = list(topic_keywords.keys())
+    # Topics come from the shared keywords.json matcher
+    topic_keywords = topic_matcher.topic_keywords
+    topic_list = topic_matcher.topics
 
     topic = st.selectbox("📚 Виберіть тему тендера", topic_list)
     num_tenders = st.slider("📦 Кількість тендерів для завантаження", min_value=5, max_value=100, value=20, step=5)
@@ -118,25 +123,8 @@ elif tab == "🔍 Аналіз тендерів":
     st.header("🔍 Аналіз тендерів")
     # Check for existing tender files
     def load_existing_tenders():
-        tender_files = []
-        tenders_dir = "../tenders"
+        tender_files = get_tender_store().list_tenders(page_size=500)["tenders"]
         uploaded_dir = "../uploaded"
-        if os.path.exists(tenders_dir):
-            for filename in os.listdir(tenders_dir):
-                if filename.startswith("ProZorro_") and filename.endswith(".json"):
-                    tender_id = filename.replace("ProZorro_", "").replace(".json", "")
-                    try:
-                        with open(os.path.join(tenders_dir, filename), "r", encoding="utf-8") as f:
-                            tender_data = json.load(f)
-                            tender_files.append({
-                                "id": tender_id,
-                                "title": tender_data.get("title", "Без назви"),
-                                "date": tender_data.get("dateModified", ""),
-                                "budget": tender_data.get("value", {}).get("amount", 0),
-                                "file": filename
-                            })
-                    except Exception as e:
-                        st.warning(f"Error loading {filename}: {e}")
         if os.path.exists(uploaded_dir):
             for filename in os.listdir(uploaded_dir):
                 if filename.endswith(".pdf"):
@@ -187,6 +175,7 @@ elif tab == "🔍 Аналіз тендерів":
 
     client = get_claude_client()
     if not client:
+        st.error("❌ Ключ API Claude не знайдено у файлі .env")
         st.stop()
 
     status_text = st.empty()
@@ -197,31 +186,20 @@ elif tab == "🔍 Аналіз тендерів":
         results = []
         progress_bar = st.progress(0)
 
-        for i, tid in enumerate(selected_tenders):
+        contents, stored = {}, {}
+        for tid in selected_tenders:
             tender = next((t for t in st.session_state.tenders_downloaded if t['id'] == tid), None)
             if not tender:
                 continue
 
-            progress_bar.progress((i + 1) / len(selected_tenders))
-            status_text.text(f"Analyzing {tid}...")
-
             if tender["file"].endswith(".json"):
-                path = os.path.join("../tenders", tender["file"])
-                if os.path.exists(path):
-                    with open(path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    content = f"""
-            Tender Title: {data.get('title', '')}
-            Issuer: {data.get('procuringEntity', {}).get('name', '')}
-            Location: {data.get('procuringEntity', {}).get('address', {}).get('locality', '')}, {data.get('procuringEntity', {}).get('address', {}).get('region', '')}
-            Budget: {data.get('value', {}).get('amount', '')} {data.get('value', {}).get('currency', 'UAH')}
-            Deadline: {data.get('tenderPeriod', {}).get('endDate', '')}
-            Description: {data.get('description', '')}
-            """.strip()
+                data = get_tender_store().get(tid)
+                if data:
+                    stored[tid] = data
             elif tender["file"].endswith(".pdf"):
                 path = os.path.join("../extracted/", tender["file"].replace(".pdf", ".txt"))
                 if os.path.exists(path):
-                    content = extract_text_from_pdf(path)
+                    contents[tid] = extract_text_from_pdf(path)
                 else:
                     st.warning(f"⚠️ PDF not found: {path}")
                     continue
@@ -229,13 +207,31 @@ elif tab == "🔍 Аналіз тендерів":
                 st.warning(f"Unsupported file type: {tender['file']}")
                 continue
 
-
-            result = analyze_tender(content, client)
+        total = len(stored) + len(contents)
+        analyses = {}
+
+        def show_progress(tid, result, done, _):
+            finished = len(analyses) + done
+            progress_bar.progress(finished / total)
+            status_text.text(f"Analyzed {tid} ({finished}/{total})")
+
+        # Concurrent, rate-limited analysis; results arrive as each tender completes.
+        # ProZorro tenders get title/issuer/budget/deadline/location from their JSON,
+        # near duplicates of analysed tenders reuse those analyses, and Claude is
+        # asked only for the rest.
+        if stored:
+            analyses.update(run_analysis(stored.items(), on_result=show_progress,
+                                         build_request=tender_analysis_request, split=None))
+            for tid, data in stored.items():
+                remember_analysis(data, analyses.get(tid))
+        if contents:
+            analyses.update(run_analysis(contents.items(), on_result=show_progress))
+        for tid in [*stored, *contents]:
+            result = analyses.get(tid)
             if result:
                 result["tender_id"] = tid
                 result["Filename"] = f"{tid}.txt"
                 results.append(result)
-            time.sleep(1.5)
 
         st.session_state.analysis_results = results
         status_text.text("✅ Аналіз завершено.")
@@ -249,7 +245,7 @@ elif tab == "🔍 Аналіз тендерів":
                 ws = wb.create_sheet("Аналіз тендерів")
             else:
                 ws.title = "Аналіз тендерів"
-            ws, columns = format_excel(ws)
+            ws = format_excel(ws)
             for idx, res in enumerate(results, 2):
                 row_data = [
                     res.get("title", "N/A"),
@@ -504,6 +500,9 @@ elif tab == "📊 Оцінка тендерних пропозицій":
             return 4
 
         def safe_budget(budget_raw):
+            # ProZorro tenders carry the budget as a number (with_structured_fields)
+            if isinstance(budget_raw, (int, float)):
+                return float(budget_raw)
             try:
                 return float(budget_raw.split()[0].replace(",", ""))
             except:
@@ -522,6 +521,7 @@ elif tab == "📊 Оцінка тендерних пропозицій":
 
         tender = {
             "title": tender_data.get("title", ""),
+            "technical_specs": tender_data.get("technical_specs", ""),
             "budget": auto_budget,
             "resource_requirements": auto_resource_req,
             "estimated_cost": estimated_cost,
@@ -543,6 +543,8 @@ elif tab == "📊 Оцінка тендерних пропозицій":
         col1.metric("Рівень ROI", f"{analysis['roi_score']:.1f}/100")
         col2.metric("Рівень прибутковості", f"{analysis['profit_margin']*100:.1f}%")
         col3.metric("Рекомендація", analysis["recommendation"])
+        matched_topics = [t for t, hits in analysis["topic_hits"].items() if hits]
+        st.caption(f"🏷️ Теми: {', '.join(matched_topics) or '—'}")
 
         st.subheader("Аналіз дефіциту ресурсів")
         st.subheader("📈 Фінансовий аналіз")
@@ -10,6 +10,18 @@ export default function DownloadTender() {
   const [status, setStatus] = useState("")
   const [tenders, setTenders] = useState<any[]>([])
 
+  const pollJob = async (jobId: string) => {
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, 2000))
+      const res = await fetch(`${process.env.NEXT_PUBLIC_API_BASE}/jobs/${jobId}`)
+      if (!res.ok) throw new Error(`Job ${jobId}: HTTP ${res.status}`)
+      const job = await res.json()
+      if (job.status === "done") return job
+      if (job.status !== "queued" && job.status !== "running") throw new Error(job.error || `Job ${jobId}: ${job.status}`)
+      setStatus(t("downloader.status_progress", { checked: job.checked, saved: job.saved }))
+    }
+  }
+
   const handleDownload = async () => {
     setStatus(t("downloader.status_downloading"))
 
@@ -24,7 +36,9 @@ export default function DownloadTender() {
         })
       })
 
-      const data = await response.json()
+      if (!response.ok) throw new Error(`HTTP ${response.status}`)
+      const { job_id } = await response.json()
+      const data = await pollJob(job_id)
       setTenders(data.tenders || [])
       setStatus(t("downloader.status_success", { count: data.tenders?.length || 0 }))
     } catch (err) {
@@ -31,7 +31,7 @@ export default function InsertLink() {
 
     try {
       const res = await fetch(
-        `${process.env.NEXT_PUBLIC_API_BASE}/analyze_tender`,
+        `${process.env.NEXT_PUBLIC_API_BASE}/analyze_tender/stream`,
         {
           method: "POST",
           headers: { "Content-Type": "application/json" },
@@ -39,15 +39,39 @@ export default function InsertLink() {
         }
       )
 
-      if (!res.ok) {
+      if (!res.ok || !res.body) {
         const err = await res.json()
         throw new Error(err.detail || t("link.error.generic", { code: res.status }))
       }
 
-      const { data } = await res.json()
-
-      localStorage.setItem("tender_result", JSON.stringify(data))
-      window.dispatchEvent(new Event("tender_result_updated"))
+      // Server-Sent Events: each field is shown as soon as it arrives
+      const partial: Record<string, any> = {}
+      const publish = (data: Record<string, any>) => {
+        localStorage.setItem("tender_result", JSON.stringify(data))
+        window.dispatchEvent(new Event("tender_result_updated"))
+      }
+      const reader = res.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ""
+      while (true) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const events = buffer.split("\n\n")
+        buffer = events.pop() ?? ""
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1]
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? "null")
+          if (event === "field") {
+            partial[data.key] = data.value
+            publish(partial)
+          } else if (event === "done") {
+            publish(data)
+          } else if (event === "error") {
+            throw new Error(data.detail)
+          }
+        }
+      }
     } catch (err: any) {
       setError(err.message)
     } finally {